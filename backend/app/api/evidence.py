@@ -2,22 +2,71 @@
 证据检索相关API路由
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
+from app.core.etag import entity_etag, entity_versions, etag_matches, not_modified, page_etag, set_etag, version_etag
+from app.core.search_cache import search_cache
+from app.core.serialization import NDJSON_MEDIA_TYPE, FastJSONResponse, dump_page, iter_json_lines, iter_ndjson
 from app.schemas.evidence import (
     EvidenceCreate,
+    EvidenceUsageModel,
     EvidenceUpdate,
     EvidenceResponse,
     EvidenceList,
-    EvidenceSearchRequest
+    EvidenceSearchRequest,
+    EvidenceSearchResponse
 )
 from app.services.evidence_service import EvidenceService
+from app.services.evidence_upload import UploadError, receive_upload
 
 router = APIRouter()
 
-@router.post("/search", response_model=EvidenceList)
+@router.post("/", response_model=EvidenceResponse)
+async def create_evidence(
+    evidence: EvidenceCreate,
+    db: Session = Depends(get_db)
+):
+    """创建证据"""
+    try:
+        service = EvidenceService(db)
+        result = await service.create_evidence(evidence)
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"创建证据失败: {str(e)}")
+
+@router.post("/upload", response_model=EvidenceResponse, status_code=201)
+async def upload_evidence(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    content_length: Optional[int] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    上传证据文件（multipart/form-data）
+    
+    文件字段名为 file，可选字段 title（缺省为文件名）、plan_id、summary、license。请求体边接收边写入磁盘并计算
+    SHA-256，文件类型按内容识别；超过 MAX_FILE_SIZE 返回 413，类型不在 ALLOWED_FILE_TYPES 中返回 415。
+    正文提取在后台进行，完成后证据状态变为 processed。
+    """
+    try:
+        upload = await receive_upload(
+            request.headers.get("content-type", ""), request.stream(), content_length=content_length
+        )
+        service = EvidenceService(db)
+        return await service.upload_evidence(upload, background_tasks)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"上传证据失败: {str(e)}")
+
+@router.post("/search", response_model=EvidenceSearchResponse)
 async def search_evidence(
     search_request: EvidenceSearchRequest,
     background_tasks: BackgroundTasks,
@@ -31,20 +80,86 @@ async def search_evidence(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"搜索证据失败: {str(e)}")
 
+@router.get("/search/cache")
+async def get_search_cache_stats():
+    """搜索结果缓存的命中率和容量"""
+    return search_cache.stats()
+
+@router.get("/stream")
+async def stream_evidence(
+    plan_id: Optional[str] = Query(None, description="关联企划ID"),
+    status: Optional[str] = Query(None, description="状态过滤")
+):
+    """
+    以 NDJSON 流式返回全部匹配的证据（每行一条）
+    
+    不分页、不计总数，服务端游标逐批读取并边读边输出，适合一次取回某个企划的全部证据。
+    """
+    def rows():
+        db = SessionLocal()
+        try:
+            service = EvidenceService(db)
+            yield from iter_ndjson(service.stream_evidence(plan_id=plan_id, status=status), EvidenceResponse)
+        finally:
+            db.close()
+
+    return StreamingResponse(rows(), media_type=NDJSON_MEDIA_TYPE)
+
+@router.get("/chunks")
+async def stream_evidence_chunks(
+    plan_id: str = Query(..., description="关联企划ID")
+):
+    """
+    以 NDJSON 流式返回企划全部证据的正文片段（每行一个片段）
+    
+    每行为 {evidence_id, seq, page, span, text}，page 从 1 开始，span 为页内字符区间，可用于引用定位。
+    """
+    def rows():
+        db = SessionLocal()
+        try:
+            chunks = EvidenceService(db).stream_chunks(plan_id)
+        finally:
+            db.close()
+        yield from iter_json_lines(
+            {
+                "evidence_id": chunk.evidence_id,
+                "seq": chunk.seq,
+                "page": chunk.page,
+                "span": [chunk.start, chunk.end],
+                "text": chunk.text,
+            }
+            for chunk in chunks
+        )
+
+    return StreamingResponse(rows(), media_type=NDJSON_MEDIA_TYPE)
+
 @router.get("/{evidence_id}", response_model=EvidenceResponse)
 async def get_evidence(
     evidence_id: str,
+    response: Response,
+    expand: Optional[str] = Query(None, description="展开关联对象: plan"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """获取证据详情"""
     try:
         service = EvidenceService(db)
-        result = await service.get_evidence(evidence_id)
+        if if_none_match and not expand:
+            version = await service.get_version(evidence_id)
+            if not version:
+                raise HTTPException(status_code=404, detail="证据不存在")
+            if etag_matches(if_none_match, version_etag(version)):
+                return not_modified(version_etag(version))
+        result = await service.get_evidence(evidence_id, expand=expand)
         if not result:
             raise HTTPException(status_code=404, detail="证据不存在")
+        if not expand:
+            set_etag(response, entity_etag(result))
         return result
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取证据失败: {str(e)}")
 
@@ -63,27 +178,56 @@ async def update_evidence(
         return result
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"更新证据失败: {str(e)}")
 
 @router.get("/", response_model=EvidenceList)
 async def list_evidence(
+    response: Response,
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(20, ge=1, le=100, description="每页数量"),
     plan_id: Optional[str] = Query(None, description="关联企划ID"),
     status: Optional[str] = Query(None, description="状态过滤"),
+    expand: Optional[str] = Query(None, description="展开关联对象: plan"),
+    used_in_plan: Optional[str] = Query(None, description="引用证据的企划ID"),
+    section: Optional[str] = Query(None, description="引用证据的章节"),
+    fast: bool = Query(False, description="快速序列化：跳过响应模型校验，直接编码数据库行"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """获取证据列表"""
     try:
         service = EvidenceService(db)
+        params = ("evidence", page, size, plan_id, status, used_in_plan, section)
+        if if_none_match and not expand:
+            total, versions = await service.list_versions(
+                page=page,
+                size=size,
+                filters={"plan_id": plan_id, "status": status, "used_in_plan": used_in_plan, "section": section}
+            )
+            etag = page_etag(params, total, versions)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
         result = await service.list_evidence(
             page=page, 
             size=size, 
             plan_id=plan_id, 
-            status=status
+            status=status,
+            expand=expand,
+            used_in_plan=used_in_plan,
+            section=section
         )
+        if fast:
+            response = FastJSONResponse(dump_page(result, EvidenceResponse))
+        if not expand:
+            set_etag(response, page_etag(params, result["total"], entity_versions(result["items"])))
+        if fast:
+            return response
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取证据列表失败: {str(e)}")
 
@@ -113,7 +257,8 @@ async def download_evidence_file(
     """下载证据文件"""
     try:
         service = EvidenceService(db)
-        await service.download_evidence_file(evidence_id, background_tasks)
+        if not await service.download_evidence_file(evidence_id, background_tasks):
+            raise HTTPException(status_code=404, detail="证据不存在")
         return {"message": "文件下载任务已启动"}
     except HTTPException:
         raise
@@ -137,6 +282,23 @@ async def get_evidence_content(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取证据内容失败: {str(e)}")
 
+@router.get("/{evidence_id}/usages", response_model=List[EvidenceUsageModel])
+async def list_evidence_usages(
+    evidence_id: str,
+    db: Session = Depends(get_db)
+):
+    """引用该证据的企划及章节"""
+    try:
+        service = EvidenceService(db)
+        usages = await service.list_usages(evidence_id)
+        if usages is None:
+            raise HTTPException(status_code=404, detail="证据不存在")
+        return usages
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取证据引用失败: {str(e)}")
+
 @router.post("/{evidence_id}/evaluate")
 async def evaluate_evidence_quality(
     evidence_id: str,
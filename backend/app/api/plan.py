@@ -2,16 +2,23 @@
 企划生成相关API路由
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
+from app.core.etag import (
+    entity_etag, entity_versions, etag_matches, make_etag, not_modified, page_etag, set_etag, version_etag
+)
+from app.core.serialization import NDJSON_MEDIA_TYPE, FastJSONResponse, dump_page, iter_ndjson
 from app.schemas.plan import (
     PlanCreate,
     PlanUpdate,
     PlanResponse,
-    PlanList
+    PlanList,
+    PlanSearchResponse
 )
+from app.services.plan_outline import OUTLINE_FORMATS
 from app.services.plan_service import PlanService
 
 router = APIRouter()
@@ -30,20 +37,87 @@ async def create_plan(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"创建企划文档失败: {str(e)}")
 
+@router.get("/export")
+async def export_plans(
+    status: Optional[str] = Query(None, description="状态筛选")
+):
+    """以 NDJSON 流式导出企划文档（不含关联数据）"""
+    def rows():
+        db = SessionLocal()
+        try:
+            service = PlanService(db)
+            yield from iter_ndjson(service.export_plans(status=status), PlanResponse)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        rows(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="plans.ndjson"'}
+    )
+
+@router.post("/import")
+async def import_plans(
+    request: Request,
+    on_conflict: str = Query("skip", pattern="^(skip|fail)$", description="id 已存在时跳过(skip)或记为错误(fail)"),
+    db: Session = Depends(get_db)
+):
+    """从 NDJSON 请求体批量导入企划文档"""
+    try:
+        service = PlanService(db)
+        return await service.import_plans(request.stream(), on_conflict=on_conflict)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"导入企划文档失败: {str(e)}")
+
+@router.get("/search", response_model=PlanSearchResponse)
+async def search_plans(
+    q: str = Query(..., min_length=1, max_length=200, description="检索词"),
+    page: int = Query(1, ge=1, description="页码"),
+    size: int = Query(20, ge=1, le=100, description="每页数量"),
+    status: Optional[str] = Query(None, description="状态过滤"),
+    db: Session = Depends(get_db)
+):
+    """
+    全文检索企划的概览、范围、里程碑、任务和风险
+    
+    结果按相关性排序，每个企划附带命中章节的摘要片段（HTML 转义，命中的词以 <mark> 标出）。
+    """
+    try:
+        service = PlanService(db)
+        return await service.search_plans(q, page=page, size=size, status=status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"检索企划文档失败: {str(e)}")
+
 @router.get("/{plan_id}", response_model=PlanResponse)
 async def get_plan(
     plan_id: str,
+    response: Response,
+    expand: Optional[str] = Query(None, description="展开关联对象，逗号分隔: requirement_snapshot, evidences"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """获取企划文档详情"""
     try:
         service = PlanService(db)
-        result = await service.get_plan(plan_id)
+        # 展开的关联对象不参与 ETag 计算，只对未展开的请求做条件 GET
+        if if_none_match and not expand:
+            version = await service.get_version(plan_id)
+            if not version:
+                raise HTTPException(status_code=404, detail="企划文档不存在")
+            if etag_matches(if_none_match, version_etag(version)):
+                return not_modified(version_etag(version))
+        result = await service.get_plan(plan_id, expand=expand)
         if not result:
             raise HTTPException(status_code=404, detail="企划文档不存在")
+        if not expand:
+            set_etag(response, entity_etag(result))
         return result
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取企划文档失败: {str(e)}")
 
@@ -67,16 +141,34 @@ async def update_plan(
 
 @router.get("/", response_model=PlanList)
 async def list_plans(
+    response: Response,
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(20, ge=1, le=100, description="每页数量"),
     status: Optional[str] = Query(None, description="状态过滤"),
+    expand: Optional[str] = Query(None, description="展开关联对象，逗号分隔: requirement_snapshot, evidences"),
+    fast: bool = Query(False, description="快速序列化：跳过响应模型校验，直接编码数据库行"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """获取企划文档列表"""
     try:
         service = PlanService(db)
-        result = await service.list_plans(page=page, size=size, status=status)
+        params = ("plan", page, size, status)
+        if if_none_match and not expand:
+            total, versions = await service.list_versions(page=page, size=size, filters={"status": status})
+            etag = page_etag(params, total, versions)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        result = await service.list_plans(page=page, size=size, status=status, expand=expand)
+        if fast:
+            response = FastJSONResponse(dump_page(result, PlanResponse))
+        if not expand:
+            set_etag(response, page_etag(params, result["total"], entity_versions(result["items"])))
+        if fast:
+            return response
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取企划文档列表失败: {str(e)}")
 
@@ -128,6 +220,54 @@ async def get_plan_generation_status(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取生成状态失败: {str(e)}")
 
+@router.get("/{plan_id}/outline")
+async def get_plan_outline(
+    plan_id: str,
+    format_type: str = Query("json", description="大纲格式: json, markdown, mermaid"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """获取企划大纲（可视化用，读取写入时预先渲染的结果）"""
+    try:
+        service = PlanService(db)
+        outline = await service.get_plan_outline(plan_id, format_type)
+        if outline is None:
+            raise HTTPException(status_code=404, detail="企划不存在")
+        content, updated_at = outline
+        etag = make_etag(plan_id, format_type, updated_at)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        response = Response(content=content, media_type=OUTLINE_FORMATS[format_type][0])
+        set_etag(response, etag)
+        return response
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取企划大纲失败: {str(e)}")
+
+@router.get("/{plan_id}/context/{section}")
+async def get_plan_evidence_context(
+    plan_id: str,
+    section: str,
+    budget: Optional[int] = Query(None, ge=1, le=200000, description="token 预算，默认按章节配置"),
+    db: Session = Depends(get_db)
+):
+    """为企划章节打包证据上下文（MMR 去冗余，按 token 预算截取）"""
+    try:
+        service = PlanService(db)
+        result = await service.pack_evidence_context(plan_id, section, budget)
+        if result is None:
+            raise HTTPException(status_code=404, detail="企划不存在")
+        return FastJSONResponse(result)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"打包证据上下文失败: {str(e)}")
+
 @router.post("/{plan_id}/validate")
 async def validate_plan_completeness(
     plan_id: str,
@@ -0,0 +1,78 @@
+"""
+任务进度推送 WebSocket 路由
+"""
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from typing import List
+import asyncio
+import json
+import logging
+from app.core.pubsub import progress_hub, topic, valid_topic
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 空闲连接的心跳间隔(秒)
+PING_INTERVAL = 30.0
+
+@router.websocket("/ws")
+async def progress_socket(
+    websocket: WebSocket,
+    plan_id: List[str] = Query([], description="订阅的企划ID"),
+    export_id: List[str] = Query([], description="订阅的导出任务ID")
+):
+    """
+    订阅企划生成和导出任务的进度事件
+
+    连接时可通过查询参数订阅，连接后发送 {"action": "subscribe" | "unsubscribe", "topics": ["plan:<id>", "export:<id>"]}
+    增减订阅。服务端推送 {"topic", "type": progress | section_completed | finished | failed, "data", "ts"}。
+    """
+    await websocket.accept()
+    subscription = progress_hub.open()
+    progress_hub.subscribe(
+        subscription,
+        [topic("plan", id) for id in plan_id] + [topic("export", id) for id in export_id]
+    )
+
+    async def receive() -> None:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            action = message.get("action") if isinstance(message, dict) else None
+            topics = message.get("topics") if isinstance(message, dict) else None
+            if action not in ("subscribe", "unsubscribe") or not isinstance(topics, list):
+                await websocket.send_json({"type": "error", "error": "消息格式应为 {action, topics}"})
+                continue
+            invalid = [name for name in topics if not isinstance(name, str) or not valid_topic(name)]
+            if invalid:
+                await websocket.send_json({"type": "error", "error": f"不支持的主题: {invalid}"})
+                continue
+            if action == "subscribe":
+                progress_hub.subscribe(subscription, topics)
+            else:
+                progress_hub.unsubscribe(subscription, topics)
+            await websocket.send_json({"type": action + "d", "topics": sorted(subscription.topics)})
+
+    async def send() -> None:
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), PING_INTERVAL)
+            except asyncio.TimeoutError:
+                event = {"type": "ping"}
+            await websocket.send_json(event)
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"Progress socket closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        progress_hub.close(subscription)
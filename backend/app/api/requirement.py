@@ -2,10 +2,14 @@
 需求澄清相关API路由
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
+from typing import List, Optional
+from app.core.database import SessionLocal, get_db
+from app.core.etag import entity_etag, entity_versions, etag_matches, not_modified, page_etag, set_etag, version_etag
+from app.core.serialization import NDJSON_MEDIA_TYPE, FastJSONResponse, iter_ndjson
+from app.schemas.plan import SimilarRequirementList
 from app.schemas.requirement import (
     RequirementSnapshotCreate,
     RequirementSnapshotUpdate,
@@ -29,17 +33,98 @@ async def create_requirement_snapshot(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"创建需求快照失败: {str(e)}")
 
+@router.get("/export")
+async def export_requirement_snapshots():
+    """以 NDJSON 流式导出全部需求快照"""
+    def rows():
+        # 流式响应在依赖清理之后仍在输出，使用独立的会话
+        db = SessionLocal()
+        try:
+            service = RequirementService(db)
+            yield from iter_ndjson(service.export_requirement_snapshots(), RequirementSnapshotResponse)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        rows(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="requirement_snapshots.ndjson"'}
+    )
+
+@router.post("/import")
+async def import_requirement_snapshots(
+    request: Request,
+    on_conflict: str = Query("skip", pattern="^(skip|fail)$", description="id 已存在时跳过(skip)或记为错误(fail)"),
+    db: Session = Depends(get_db)
+):
+    """从 NDJSON 请求体批量导入需求快照"""
+    try:
+        service = RequirementService(db)
+        return await service.import_requirement_snapshots(request.stream(), on_conflict=on_conflict)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"导入需求快照失败: {str(e)}")
+
+@router.post("/similar", response_model=SimilarRequirementList)
+async def find_similar_requirements(
+    requirement: RequirementSnapshotCreate,
+    k: int = Query(5, ge=1, le=50, description="返回的相似快照数"),
+    min_score: float = Query(0.0, ge=-1.0, le=1.0, description="最低相似度"),
+    plan_status: Optional[str] = Query("completed", description="只返回该状态的企划，为空返回全部"),
+    db: Session = Depends(get_db)
+):
+    """按未保存的需求内容查找相似的历史需求及其企划"""
+    try:
+        service = RequirementService(db)
+        result = await service.find_similar(
+            requirement_in=requirement, k=k, min_score=min_score, plan_status=plan_status or None
+        )
+        return FastJSONResponse(result)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查找相似需求失败: {str(e)}")
+
+@router.get("/{requirement_id}/similar", response_model=SimilarRequirementList)
+async def get_similar_requirements(
+    requirement_id: str,
+    k: int = Query(5, ge=1, le=50, description="返回的相似快照数"),
+    min_score: float = Query(0.0, ge=-1.0, le=1.0, description="最低相似度"),
+    plan_status: Optional[str] = Query("completed", description="只返回该状态的企划，为空返回全部"),
+    db: Session = Depends(get_db)
+):
+    """查找与已保存快照相似的历史需求及其企划，用作生成模板或少样本示例"""
+    try:
+        service = RequirementService(db)
+        result = await service.find_similar(
+            requirement_id=requirement_id, k=k, min_score=min_score, plan_status=plan_status or None
+        )
+        if result is None:
+            raise HTTPException(status_code=404, detail="需求快照不存在")
+        return FastJSONResponse(result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查找相似需求失败: {str(e)}")
+
 @router.get("/{requirement_id}", response_model=RequirementSnapshotResponse)
 async def get_requirement_snapshot(
     requirement_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """获取需求快照详情"""
     try:
         service = RequirementService(db)
+        # 带 If-None-Match 时先只查询版本信息，未变化直接返回 304
+        if if_none_match:
+            version = await service.get_version(requirement_id)
+            if not version:
+                raise HTTPException(status_code=404, detail="需求快照不存在")
+            if etag_matches(if_none_match, version_etag(version)):
+                return not_modified(version_etag(version))
         result = await service.get_requirement_snapshot(requirement_id)
         if not result:
             raise HTTPException(status_code=404, detail="需求快照不存在")
+        set_etag(response, entity_etag(result))
         return result
     except HTTPException:
         raise
@@ -66,14 +151,23 @@ async def update_requirement_snapshot(
 
 @router.get("/", response_model=RequirementSnapshotList)
 async def list_requirement_snapshots(
+    response: Response,
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(20, ge=1, le=100, description="每页数量"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """获取需求快照列表"""
     try:
         service = RequirementService(db)
+        params = ("requirement", page, size)
+        if if_none_match:
+            total, versions = await service.list_versions(page=page, size=size)
+            etag = page_etag(params, total, versions)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
         result = await service.list_requirement_snapshots(page=page, size=size)
+        set_etag(response, page_etag(params, result["total"], entity_versions(result["items"])))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取需求快照列表失败: {str(e)}")
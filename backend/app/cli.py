@@ -0,0 +1,97 @@
+"""
+命令行工具
+
+批量导入导出需求快照和企划文档，数据以 NDJSON 流式传输，适合在环境之间迁移或备份大量数据:
+    python -m app.cli export plan -o plans.ndjson --base-url http://localhost:8000
+    python -m app.cli import plan plans.ndjson --base-url http://staging:8000
+"""
+
+from typing import Iterator, Optional
+import sys
+import time
+
+import click
+import httpx
+
+RESOURCES = {
+    "requirement": "/api/v1/requirement",
+    "plan": "/api/v1/plan",
+}
+
+# 上传时每次读取的字节数
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+def _read_chunks(stream) -> Iterator[bytes]:
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+@click.group()
+def cli():
+    """企划生成智能体命令行工具"""
+
+
+@cli.command("export")
+@click.argument("resource", type=click.Choice(list(RESOURCES)))
+@click.option("--base-url", default="http://localhost:8000", show_default=True, help="API 服务地址")
+@click.option("-o", "--output", type=click.File("wb"), default="-", help="输出文件，默认标准输出")
+@click.option("--status", default=None, help="企划状态筛选（仅 plan）")
+def export_command(resource: str, base_url: str, output, status: Optional[str]):
+    """以 NDJSON 流式导出 RESOURCE"""
+    params = {"status": status} if resource == "plan" and status else None
+    rows = 0
+    started = time.monotonic()
+    with httpx.Client(base_url=base_url, timeout=httpx.Timeout(30.0, read=None)) as client:
+        with client.stream("GET", f"{RESOURCES[resource]}/export", params=params) as response:
+            if response.status_code != 200:
+                response.read()
+                raise click.ClickException(f"导出失败 ({response.status_code}): {response.text}")
+            for chunk in response.iter_bytes():
+                rows += chunk.count(b"\n")
+                output.write(chunk)
+    output.flush()
+    click.echo(f"导出 {rows} 行，用时 {time.monotonic() - started:.1f}s", err=True)
+
+
+@cli.command("import")
+@click.argument("resource", type=click.Choice(list(RESOURCES)))
+@click.argument("source", type=click.File("rb"), default="-")
+@click.option("--base-url", default="http://localhost:8000", show_default=True, help="API 服务地址")
+@click.option(
+    "--on-conflict",
+    type=click.Choice(["skip", "fail"]),
+    default="skip",
+    show_default=True,
+    help="id 已存在时跳过或记为错误"
+)
+def import_command(resource: str, source, base_url: str, on_conflict: str):
+    """从 NDJSON 文件（默认标准输入）流式导入 RESOURCE"""
+    started = time.monotonic()
+    with httpx.Client(base_url=base_url, timeout=httpx.Timeout(30.0, read=None, write=None)) as client:
+        response = client.post(
+            f"{RESOURCES[resource]}/import",
+            params={"on_conflict": on_conflict},
+            content=_read_chunks(source),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+    if response.status_code != 200:
+        raise click.ClickException(f"导入失败 ({response.status_code}): {response.text}")
+
+    result = response.json()
+    for error in result.get("errors", []):
+        click.echo(f"第 {error['line']} 行: {error['error']}", err=True)
+    click.echo(
+        f"导入 {result['imported']} 行，跳过 {result['skipped']} 行，失败 {result['failed']} 行，"
+        f"用时 {time.monotonic() - started:.1f}s",
+        err=True
+    )
+    if result["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,250 @@
+"""
+响应压缩
+
+根据 Accept-Encoding 协商 zstd / brotli / gzip，小于阈值的响应不压缩，
+流式响应逐块压缩并及时 flush。较大的响应体在线程池中压缩，避免阻塞事件循环。
+brotli 和 zstandard 为可选依赖，未安装时只提供 gzip。
+"""
+
+from typing import Dict, List, Optional, Sequence
+import asyncio
+import gzip
+import zlib
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 可选依赖
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+# 压缩级别偏向速度：企划 JSON 重复度高，低级别已有很高的压缩率
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+# 不值得压缩的内容类型（本身已压缩）
+INCOMPRESSIBLE_TYPES = (
+    "image/", "video/", "audio/",
+    "application/zip", "application/gzip", "application/pdf",
+    "application/x-7z-compressed", "application/zstd",
+    "application/vnd.openxmlformats-officedocument",
+)
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def compress(encoding: str, data: bytes) -> bytes:
+    """一次性压缩完整响应体"""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def stream_compressor(encoding: str):
+    """流式压缩器"""
+    if encoding == "zstd":
+        return _ZstdStream(ZSTD_LEVEL)
+    if encoding == "br":
+        return _BrotliStream(BROTLI_QUALITY)
+    return _GzipStream(GZIP_LEVEL)
+
+
+def available_encodings() -> List[str]:
+    """服务端支持的编码，按优先级排列"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate(accept_encoding: str, supported: Sequence[str]) -> Optional[str]:
+    """根据 Accept-Encoding（含 q 值）选择编码，同等权重时按服务端优先级"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """协商式响应压缩中间件"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: Optional[int] = None,
+        offload_size: Optional[int] = None,
+        encodings: Optional[Sequence[str]] = None
+    ):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MINIMUM_SIZE if minimum_size is None else minimum_size
+        self.offload_size = settings.COMPRESSION_OFFLOAD_SIZE if offload_size is None else offload_size
+        self.encodings = list(encodings) if encodings is not None else available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope.get("headers") or []:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate(accept, self.encodings) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, encoding, self.minimum_size, self.offload_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    """拦截响应消息：首个响应体决定是否压缩以及采用整体还是流式压缩"""
+
+    def __init__(self, send, encoding: str, minimum_size: int, offload_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.start_message = None
+        self.passthrough = False
+        self.stream = None
+
+    def _should_compress(self, headers: List) -> bool:
+        status = self.start_message["status"]
+        if status < 200 or status in (204, 304):
+            return False
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+                if content_type.startswith(INCOMPRESSIBLE_TYPES) or content_type.startswith("text/event-stream"):
+                    return False
+        return True
+
+    def _compressed_headers(self, length: Optional[int]) -> List:
+        headers = []
+        for name, value in self.start_message.get("headers", []):
+            if name == b"content-length":
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                # 压缩后的表示与原表示字节不同，强 ETag 降级为弱 ETag
+                value = b"W/" + value
+            if name == b"vary":
+                continue
+            headers.append((name, value))
+        vary = [value for name, value in self.start_message.get("headers", []) if name == b"vary"]
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"]) if vary else b"Accept-Encoding"))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode("latin-1")))
+        return headers
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            data = await self._compress_chunk(body)
+            if not more_body:
+                data += self.stream.finish()
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        # 首个响应体消息
+        headers = self.start_message.get("headers", [])
+        if not self._should_compress(headers) or (not more_body and len(body) < self.minimum_size):
+            self.passthrough = True
+            await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        if not more_body:
+            if len(body) >= self.offload_size:
+                data = await asyncio.to_thread(compress, self.encoding, body)
+            else:
+                data = compress(self.encoding, body)
+            await self._send({**self.start_message, "headers": self._compressed_headers(len(data))})
+            await self._send({"type": "http.response.body", "body": data})
+            return
+
+        # 流式响应：去掉 Content-Length，逐块压缩并 flush
+        self.stream = stream_compressor(self.encoding)
+        await self._send({**self.start_message, "headers": self._compressed_headers(None)})
+        await self._send({"type": "http.response.body", "body": await self._compress_chunk(body), "more_body": True})
+
+    async def _compress_chunk(self, chunk: bytes) -> bytes:
+        if not chunk:
+            return b""
+        if len(chunk) >= self.offload_size:
+            return await asyncio.to_thread(self.stream.compress, chunk)
+        return self.stream.compress(chunk)
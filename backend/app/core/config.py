@@ -3,7 +3,7 @@
 """
 
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -21,6 +21,11 @@ class Settings(BaseSettings):
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./planning_agent.db"
     DATABASE_TEST_URL: str = "sqlite:///./planning_agent_test.db"
+    AUTO_CREATE_TABLES: bool = True  # 启动时执行 create_all，生产环境由 alembic 迁移管理时可关闭
+    DB_POOL_SIZE: int = 10  # 连接池常驻连接数（内存 SQLite 只有一个共享连接）
+    DB_MAX_OVERFLOW: int = 20  # 连接池满时允许额外创建的连接数
+    DB_POOL_TIMEOUT: float = 30.0  # 等待空闲连接的期限(秒)
+    DB_SQLITE_BUSY_TIMEOUT: float = 15.0  # SQLite 写锁被其他连接持有时的等待期限(秒)
     
     # Redis配置
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -55,6 +60,113 @@ class Settings(BaseSettings):
     # 日志配置
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/app.log"
+    LOG_FORMAT: str = "text"  # text | json
+    LOG_FILE_ROTATE: bool = True  # 日志文件按大小轮转；多 worker 时自动关闭，改由 logrotate 等外部工具轮转
+    LOG_QUEUE_SIZE: int = 10000  # 日志队列容量
+    LOG_QUEUE_OVERFLOW: str = "drop_new"  # 队列满时: drop_new | drop_oldest | block
+    LOG_SAMPLING_RATES: Dict[str, float] = {}  # 按 logger 采样 INFO 及以下日志，如 {"app.services.base_service": 0.1}
+    
+    # 准入控制与限流配置
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # memory | sqlite（同机多 worker 共享令牌桶）| redis
+    RATE_LIMIT_CLIENT_HEADER: Optional[str] = None  # 用于识别客户端的请求头，如 X-API-Key
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # 部署在反向代理后时使用 X-Forwarded-For 识别客户端
+    # 按路由类别配置: rate 每秒令牌数, burst 桶容量, max_concurrency 全局并发, max_queue 排队上限, queue_timeout 排队期限(秒)
+    RATE_LIMITS: Dict[str, Dict[str, Any]] = {
+        "generate": {"rate": 0.2, "burst": 3, "max_concurrency": 4, "max_queue": 16, "queue_timeout": 10},
+        "search": {"rate": 1.0, "burst": 10, "max_concurrency": 16, "max_queue": 64, "queue_timeout": 5},
+        "export": {"rate": 0.5, "burst": 5, "max_concurrency": 4, "max_queue": 16, "queue_timeout": 15},
+    }
+    
+    # 响应压缩配置
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # 小于该字节数的响应不压缩
+    COMPRESSION_OFFLOAD_SIZE: int = 256 * 1024  # 超过该字节数的响应体在线程池中压缩
+    
+    # 监控配置
+    METRICS_ENABLED: bool = True  # 是否采集指标并暴露 GET /metrics
+    
+    # 联合搜索配置
+    SEARCH_DEADLINE: float = 8.0  # 全部搜索源的总期限(秒)，到期返回已有的部分结果
+    SEARCH_HEDGE_DELAY: float = 1.5  # 单个源超过该时间未返回时发起对冲请求(秒)，有足够样本后改用 p95 延迟
+    SEARCH_MAX_HEDGES: int = 1  # 每个源最多额外发起的请求数
+    SEARCH_HTTP_MAX_CONNECTIONS: int = 50  # 搜索源共享连接池大小
+    
+    # 证据刷新配置
+    EVIDENCE_REFRESH_ENABLED: bool = False  # 是否在后台周期性地以条件请求刷新证据
+    EVIDENCE_REFRESH_INTERVAL: float = 300  # 调度周期(秒)
+    EVIDENCE_REFRESH_MAX_AGE: float = 7 * 24 * 3600  # 时效性评分为 0 的证据的刷新周期(秒)，评分越高周期越短
+    EVIDENCE_REFRESH_BATCH: int = 100  # 每轮最多刷新的证据数
+    EVIDENCE_REFRESH_CONCURRENCY: int = 8  # 同时进行的抓取数
+    EVIDENCE_TIMELINESS_ENABLED: bool = True  # 是否在后台重算到期的时效性评分
+    EVIDENCE_TIMELINESS_HALF_LIFE: float = 180 * 24 * 3600  # 时效性评分的半衰期(秒)
+    EVIDENCE_TIMELINESS_STEP: float = 0.05  # 评分取整的台阶，越过台阶才更新
+    EVIDENCE_TIMELINESS_BUCKET: float = 3600  # 到期时间取整的桶宽(秒)，同一桶内的证据一起重算
+    EVIDENCE_TIMELINESS_INTERVAL: float = 600  # 重算调度周期(秒)
+    EVIDENCE_TIMELINESS_BATCH: int = 1000  # 每批读取和更新的行数
+    
+    # 软删除清理配置
+    PURGE_ENABLED: bool = True  # 是否在后台清理软删除的数据
+    PURGE_INTERVAL: float = 60  # 清理周期(秒)
+    PURGE_BATCH_SIZE: int = 200  # 每批（一个事务）清理的企划/证据/快照数
+    PURGE_GRACE_PERIOD: float = 0  # 软删除后保留的时间(秒)，之后才物理删除
+    EVIDENCE_FETCH_TIMEOUT: float = 30.0  # 单次抓取超时(秒)
+    
+    # 证据搜索缓存配置
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_MAX_ENTRIES: int = 2048  # 最多缓存的查询数，超出时淘汰最久未使用的
+    SEARCH_CACHE_TTLS: Dict[str, float] = {"local": 60, "google": 3600, "bing": 3600}  # 按搜索源的 TTL(秒)
+    SEARCH_CACHE_DEFAULT_TTL: float = 600  # 未单独配置的搜索源的 TTL(秒)
+    SEARCH_CACHE_NEGATIVE_TTL: float = 60  # 空结果的 TTL(秒)
+    
+    # 相似需求检索配置
+    SIMILARITY_EMBEDDER: str = "hashing"  # hashing | sentence-transformers
+    SIMILARITY_MODEL: str = "paraphrase-multilingual-MiniLM-L12-v2"  # sentence-transformers 模型
+    SIMILARITY_HASH_DIM: int = 512  # hashing 向量维度
+    
+    # 企划全文检索配置
+    PLAN_SEARCH_SNIPPET_LENGTH: int = 120  # 摘要片段的字符数
+    PLAN_SEARCH_MAX_SNIPPETS: int = 3  # 每个企划最多返回的命中章节数
+    
+    # 证据上下文打包配置
+    CONTEXT_TOKEN_ENCODING: str = "cl100k_base"  # tiktoken 编码，不可用时按字符估算
+    CONTEXT_CHUNK_TOKENS: int = 300  # 证据片段的 token 上限
+    CONTEXT_DEFAULT_BUDGET: int = 2000  # 章节默认的 token 预算
+    CONTEXT_SECTION_BUDGETS: Dict[str, int] = {"overview": 3000, "risks": 2500, "budget": 1500}  # 按章节的 token 预算
+    CONTEXT_MMR_LAMBDA: float = 0.7  # 相关性与多样性的权衡，越大越偏向相关性
+    CONTEXT_DUPLICATE_THRESHOLD: float = 0.9  # 与已选片段的相似度达到该值视为重复，不再选入
+    CONTEXT_QUALITY_WEIGHTS: Dict[str, float] = {"relevance": 0.5, "authority": 0.3, "timeliness": 0.2}
+    CONTEXT_CHUNK_CACHE_SIZE: int = 4096  # 缓存切分和向量化结果的证据数
+    CONTEXT_CACHE_SIZE: int = 1024  # 缓存的打包结果数
+    
+    # 证据片段存储配置
+    CHUNK_STORE_DIR: str = "uploads/chunks"  # 片段数据文件和索引文件所在目录
+    CHUNK_STORE_COMPACT_RATIO: float = 0.5  # 垃圾记录占比达到该值时在刷新调度后压缩
+    
+    # 批量导入导出配置
+    BULK_BATCH_SIZE: int = 1000  # 导出时每次从游标读取的行数、导入时每批插入的行数
+    BULK_MAX_ERRORS: int = 100  # 导入结果中最多返回的错误行数
+    
+    # 多 worker 协调配置
+    COORDINATION_BACKEND: str = "memory"  # memory | sqlite（同机多 worker 共享锁、租约和广播）
+    COORDINATION_DB_PATH: str = "run/coordination.db"  # 协调数据库文件，与业务数据库分开
+    COORDINATION_POLL_INTERVAL: float = 0.5  # 轮询广播事件的间隔(秒)
+    
+    # 任务进度推送配置
+    PUBSUB_BACKEND: str = "local"  # local（经协调器在本机 worker 间转发）| redis（跨机器）
+    PUBSUB_REDIS_CHANNEL: str = "planning-agent:progress"
+    PUBSUB_QUEUE_SIZE: int = 100  # 每个 WebSocket 连接缓存的事件数，超出时丢弃最旧的
+    
+    # 生产服务配置（python -m app.server）
+    SERVER_WORKERS: int = 0  # worker 进程数，0 表示按 CPU 核数
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # 重启或退出时等待进行中请求完成的时间(秒)
+    SERVER_MAX_REQUESTS: int = 0  # 每个 worker 处理该数量的请求后滚动重启，0 表示不重启
+    SERVER_MAX_REQUESTS_JITTER: int = 0  # 滚动重启阈值的随机抖动，避免 worker 同时重启
+    SERVER_PID_FILE: Optional[str] = None  # master 进程号文件，kill -HUP 触发滚动重启
+    
+    # 启动配置
+    WARMUP_ON_STARTUP: bool = False  # 就绪后在后台预热延迟导入的重型依赖
+    WARMUP_MODULES: List[str] = []  # 额外需要预热的模块
     
     # 任务队列配置
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
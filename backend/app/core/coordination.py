@@ -0,0 +1,370 @@
+"""
+多 worker 协调
+
+多个 worker 进程之间需要共享少量协调状态：限流令牌桶、单飞锁（同一时刻只有一个 worker
+执行某项工作）、任务归属租约以及缓存失效广播。这里提供两种实现：
+
+- MemoryCoordinator：单进程使用，状态保存在进程内存中；
+- SQLiteCoordinator：同一台机器上的多个 worker 共享一个 SQLite 文件（WAL 模式），
+  不依赖 Redis。写操作使用 BEGIN IMMEDIATE 串行化，在线程池中执行，不阻塞事件循环。
+
+锁和租约带有过期时间，持有者进程崩溃后由其他 worker 接管。广播消息写入事件表，
+各 worker 定期轮询新事件并分发给本进程的订阅者。
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Subscriber = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+# 缓存失效广播频道，消息为 {"cache": 缓存名称}
+CACHE_INVALIDATE_CHANNEL = "cache.invalidate"
+
+
+def worker_id() -> str:
+    """当前 worker 的标识（主机名:进程号）"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Coordinator(ABC):
+    """协调器公共部分：本进程订阅者管理和租约上下文"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+
+    @property
+    def owner(self) -> str:
+        # fork 之后进程号会变化，每次读取
+        return worker_id()
+
+    def subscribe(self, channel: str, callback: Subscriber) -> None:
+        """订阅广播频道（回调在收到消息的每个 worker 中执行）"""
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    async def _dispatch(self, channel: str, payload: Dict[str, Any]) -> None:
+        for callback in self._subscribers.get(channel, []):
+            try:
+                result = callback(payload)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Subscriber for {channel} failed: {e}")
+
+    @abstractmethod
+    async def acquire_lock(self, name: str, ttl: float, owner: Optional[str] = None) -> bool:
+        """获取锁（已被其他持有者持有且未过期时返回 False），ttl 秒后自动过期"""
+
+    @abstractmethod
+    async def renew_lock(self, name: str, ttl: float, owner: Optional[str] = None) -> bool:
+        """延长持有中的锁，锁已过期或被他人持有时返回 False"""
+
+    @abstractmethod
+    async def release_lock(self, name: str, owner: Optional[str] = None) -> None:
+        """释放锁（只释放自己持有的）"""
+
+    @abstractmethod
+    async def lock_owner(self, name: str) -> Optional[str]:
+        """锁的当前持有者，未被持有时返回 None"""
+
+    @abstractmethod
+    async def publish(self, channel: str, payload: Dict[str, Any]) -> None:
+        """向所有 worker 广播消息"""
+
+    async def start(self) -> None:
+        """启动后台任务（如事件轮询）"""
+
+    async def stop(self) -> None:
+        """停止后台任务"""
+
+    @asynccontextmanager
+    async def lease(self, name: str, ttl: float) -> AsyncIterator[bool]:
+        """
+        获取带自动续期的租约，返回是否获取成功
+
+        持有期间每 ttl/3 秒续期一次，适合单飞执行和长时间任务的归属；
+        进程崩溃后租约在 ttl 秒内过期，其他 worker 可以接管。
+        """
+        # 每个租约使用独立的持有者标识，同一 worker 内的并发协程同样互斥
+        token = f"{self.owner}#{uuid.uuid4().hex[:8]}"
+        acquired = await self.acquire_lock(name, ttl, token)
+        if not acquired:
+            yield False
+            return
+
+        async def renew():
+            while True:
+                await asyncio.sleep(ttl / 3)
+                if not await self.renew_lock(name, ttl, token):
+                    logger.warning(f"Lost lease {name}")
+                    return
+
+        renewer = asyncio.create_task(renew())
+        try:
+            yield True
+        finally:
+            renewer.cancel()
+            await asyncio.gather(renewer, return_exceptions=True)
+            await self.release_lock(name, token)
+
+    def on_invalidate(self, cache: str, callback: Callable[[], None]) -> None:
+        """注册缓存失效回调：任一 worker 调用 invalidate(cache) 后，所有 worker 执行 callback"""
+        def handler(payload: Dict[str, Any]) -> None:
+            if payload.get("cache") == cache:
+                callback()
+
+        self.subscribe(CACHE_INVALIDATE_CHANNEL, handler)
+
+    async def invalidate(self, cache: str) -> None:
+        await self.publish(CACHE_INVALIDATE_CHANNEL, {"cache": cache})
+
+    async def claim_job(self, job_id: str, ttl: float) -> bool:
+        """声明任务归属（按 worker 归属，同一 worker 重复声明视为续期），已被其他存活的 worker 持有时返回 False"""
+        return await self.acquire_lock(f"job:{job_id}", ttl)
+
+    async def release_job(self, job_id: str) -> None:
+        await self.release_lock(f"job:{job_id}")
+
+    async def job_owner(self, job_id: str) -> Optional[str]:
+        return await self.lock_owner(f"job:{job_id}")
+
+
+class MemoryCoordinator(Coordinator):
+    """单进程协调器"""
+
+    def __init__(self):
+        super().__init__()
+        self._locks: Dict[str, Tuple[str, float]] = {}
+
+    def _current(self, name: str) -> Optional[Tuple[str, float]]:
+        entry = self._locks.get(name)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self._locks[name]
+            return None
+        return entry
+
+    async def acquire_lock(self, name: str, ttl: float, owner: Optional[str] = None) -> bool:
+        owner = owner or self.owner
+        entry = self._current(name)
+        if entry is not None and entry[0] != owner:
+            return False
+        self._locks[name] = (owner, time.monotonic() + ttl)
+        return True
+
+    async def renew_lock(self, name: str, ttl: float, owner: Optional[str] = None) -> bool:
+        owner = owner or self.owner
+        entry = self._current(name)
+        if entry is None or entry[0] != owner:
+            return False
+        self._locks[name] = (owner, time.monotonic() + ttl)
+        return True
+
+    async def release_lock(self, name: str, owner: Optional[str] = None) -> None:
+        owner = owner or self.owner
+        entry = self._current(name)
+        if entry is not None and entry[0] == owner:
+            del self._locks[name]
+
+    async def lock_owner(self, name: str) -> Optional[str]:
+        entry = self._current(name)
+        return entry[0] if entry else None
+
+    async def publish(self, channel: str, payload: Dict[str, Any]) -> None:
+        await self._dispatch(channel, payload)
+
+
+class SQLiteCoordinator(Coordinator):
+    """基于共享 SQLite 文件的多 worker 协调器"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS locks (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS token_buckets (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        ts REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        origin TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.5, event_retention: float = 300.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.event_retention = event_retention
+        self._local = threading.local()
+        self._last_event_id = 0
+        self._poller: Optional[asyncio.Task] = None
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程（以及 fork 后的每个进程）使用独立的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def _run(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        return await asyncio.to_thread(self._transaction, func)
+
+    async def acquire_lock(self, name: str, ttl: float, owner: Optional[str] = None) -> bool:
+        owner = owner or self.owner
+
+        def acquire(conn):
+            now = time.time()
+            cursor = conn.execute(
+                "INSERT INTO locks (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE locks.expires_at <= ? OR locks.owner = excluded.owner",
+                (name, owner, now + ttl, now)
+            )
+            return cursor.rowcount == 1
+
+        return await self._run(acquire)
+
+    async def renew_lock(self, name: str, ttl: float, owner: Optional[str] = None) -> bool:
+        owner = owner or self.owner
+
+        def renew(conn):
+            cursor = conn.execute(
+                "UPDATE locks SET expires_at = ? WHERE name = ? AND owner = ?",
+                (time.time() + ttl, name, owner)
+            )
+            return cursor.rowcount == 1
+
+        return await self._run(renew)
+
+    async def release_lock(self, name: str, owner: Optional[str] = None) -> None:
+        owner = owner or self.owner
+        await self._run(lambda conn: conn.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner)))
+
+    async def lock_owner(self, name: str) -> Optional[str]:
+        def owner_of(conn):
+            row = conn.execute(
+                "SELECT owner FROM locks WHERE name = ? AND expires_at > ?", (name, time.time())
+            ).fetchone()
+            return row[0] if row else None
+
+        return await self._run(owner_of)
+
+    async def consume_tokens(self, key: str, rate: float, burst: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """共享令牌桶，语义与 InMemoryTokenBuckets.consume 相同"""
+        def consume(conn):
+            now = time.time()
+            row = conn.execute("SELECT tokens, ts FROM token_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, ts = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - ts) * rate)
+            allowed, retry = tokens >= cost, 0.0
+            if allowed:
+                tokens -= cost
+            else:
+                retry = (cost - tokens) / rate
+            conn.execute(
+                "INSERT INTO token_buckets (key, tokens, ts) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, ts = excluded.ts",
+                (key, tokens, now)
+            )
+            return allowed, retry
+
+        return await self._run(consume)
+
+    async def publish(self, channel: str, payload: Dict[str, Any]) -> None:
+        """写入广播事件；本进程的订阅者立即收到，其他 worker 在下次轮询时收到"""
+        data = json.dumps(payload, ensure_ascii=False)
+        origin = self.owner
+        await self._run(lambda conn: conn.execute(
+            "INSERT INTO events (channel, payload, origin, created_at) VALUES (?, ?, ?, ?)",
+            (channel, data, origin, time.time())
+        ))
+        await self._dispatch(channel, payload)
+
+    def _fetch_events(self) -> List[Tuple[int, str, str, str]]:
+        conn = self._conn()
+        return conn.execute(
+            "SELECT id, channel, payload, origin FROM events WHERE id > ? ORDER BY id",
+            (self._last_event_id,)
+        ).fetchall()
+
+    async def _poll(self) -> None:
+        last_prune = 0.0
+        while True:
+            try:
+                events = await asyncio.to_thread(self._fetch_events)
+                owner = self.owner
+                for event_id, channel, payload, origin in events:
+                    self._last_event_id = event_id
+                    if origin != owner:
+                        await self._dispatch(channel, json.loads(payload))
+                if time.monotonic() - last_prune > self.event_retention:
+                    cutoff = time.time() - self.event_retention
+                    await self._run(lambda conn: conn.execute("DELETE FROM events WHERE created_at < ?", (cutoff,)))
+                    await self._run(lambda conn: conn.execute("DELETE FROM token_buckets WHERE ts < ?", (cutoff,)))
+                    last_prune = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Coordination event poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self) -> None:
+        if self._poller is None:
+            # 只接收启动之后发布的事件
+            row = await asyncio.to_thread(lambda: self._conn().execute("SELECT MAX(id) FROM events").fetchone())
+            self._last_event_id = row[0] or 0
+            self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+
+
+def create_coordinator() -> Coordinator:
+    if settings.COORDINATION_BACKEND == "sqlite":
+        return SQLiteCoordinator(settings.COORDINATION_DB_PATH, poll_interval=settings.COORDINATION_POLL_INTERVAL)
+    return MemoryCoordinator()
+
+
+coordinator = create_coordinator()
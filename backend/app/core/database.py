@@ -2,23 +2,62 @@
 数据库配置和连接管理
 """
 
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool, StaticPool
+from typing import Any, Dict
 # import redis
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def _is_memory_sqlite(url) -> bool:
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+
+def engine_options(database_url: str) -> Dict[str, Any]:
+    """
+    连接池配置：每个会话从连接池取得独立的连接，后台线程中的任务不会与请求共享事务
+
+    - 内存 SQLite 的数据只存在于一个连接中，只能使用 StaticPool 共享该连接（仅用于测试）；
+    - 文件 SQLite 和其他数据库使用 QueuePool，SQLite 写锁冲突时等待 DB_SQLITE_BUSY_TIMEOUT。
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return {
+            "poolclass": QueuePool,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_pre_ping": True,
+        }
+    connect_args = {"check_same_thread": False, "timeout": settings.DB_SQLITE_BUSY_TIMEOUT}
+    if _is_memory_sqlite(url):
+        return {"poolclass": StaticPool, "connect_args": connect_args}
+    return {
+        "poolclass": QueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "connect_args": connect_args,
+    }
+
+
 # SQLAlchemy配置
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=StaticPool,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=settings.DEBUG
-)
+engine = create_engine(settings.DATABASE_URL, echo=settings.DEBUG, **engine_options(settings.DATABASE_URL))
+
+if engine.dialect.name == "sqlite" and not _is_memory_sqlite(engine.url):
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL 下读取不阻塞写入，多个连接（请求、后台任务、多个 worker）可以并发读写
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -45,7 +84,9 @@ async def init_db():
     """初始化数据库"""
     try:
         # 创建所有表
-        Base.metadata.create_all(bind=engine)
+        if settings.AUTO_CREATE_TABLES:
+            import app.models  # noqa: F401  确保所有模型已注册到 Base.metadata
+            Base.metadata.create_all(bind=engine)
         logger.info("Database initialized successfully")
         
         # 测试Redis连接 (暂时跳过)
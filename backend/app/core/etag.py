@@ -0,0 +1,64 @@
+"""
+ETag 与条件请求
+
+单个资源的 ETag 由 (id, updated_at, created_at) 计算，带 If-None-Match 的请求
+只查询这几列即可判断是否返回 304，不需要加载和序列化整行数据。
+列表使用弱 ETag，由查询参数、总数和当前页各行的版本信息计算。
+"""
+
+from fastapi import Response
+from typing import Any, Iterable, Optional
+import hashlib
+
+
+def make_etag(*parts: Any, weak: bool = False) -> str:
+    """根据版本信息计算 ETag"""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def entity_etag(obj: Any) -> str:
+    """单个资源的强 ETag"""
+    return make_etag(obj.id, obj.updated_at, obj.created_at)
+
+
+def version_etag(version: Iterable[Any]) -> str:
+    """由 BaseService.get_version 返回的版本信息计算强 ETag"""
+    return make_etag(*version)
+
+
+def entity_versions(items: Iterable[Any]) -> list:
+    """从已加载的对象中取出版本信息，与 BaseService.list_versions 的结果一致"""
+    return [(item.id, item.updated_at, item.created_at) for item in items]
+
+
+def page_etag(params: Any, total: int, versions: Iterable[Iterable[Any]]) -> str:
+    """列表页的弱 ETag"""
+    return make_etag(params, total, [tuple(version) for version in versions], weak=True)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """按弱比较规则判断 If-None-Match 是否命中"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """304 响应"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """为 200 响应设置 ETag，并要求客户端每次使用前重新验证"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
@@ -0,0 +1,90 @@
+"""
+延迟导入与预热
+
+torch、transformers、sentence-transformers 以及文档解析库导入耗时很长，
+服务模块通过 lazy_import 引用它们，首次使用时才真正导入，
+从而缩短 worker 启动和扩容时间。开启 WARMUP_ON_STARTUP 后，
+应用就绪后会在后台线程中提前完成这些导入和注册的预热任务。
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """模块代理，首次访问属性时才导入真实模块"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self):
+        """导入并返回真实模块"""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    self._module = importlib.import_module(self._name)
+                    logger.info(f"Lazily imported {self._name} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return self._module
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self.load(), item)
+
+    def __repr__(self):
+        return f"<LazyModule({self._name}, loaded={self.loaded})>"
+
+
+_modules: Dict[str, LazyModule] = {}
+_warmup_tasks: List[Callable[[], Any]] = []
+_warmup_state: Dict[str, Any] = {"status": "disabled", "duration_ms": None, "errors": []}
+
+
+def lazy_import(name: str, warmup: bool = True) -> LazyModule:
+    """获取模块的延迟导入代理，warmup=True 时在预热阶段提前导入"""
+    module = _modules.get(name)
+    if module is None:
+        module = _modules[name] = LazyModule(name)
+        if warmup:
+            register_warmup(module.load)
+    return module
+
+
+def register_warmup(task: Callable[[], Any]) -> Callable[[], Any]:
+    """注册预热任务（如加载向量模型），可用作装饰器"""
+    _warmup_tasks.append(task)
+    return task
+
+
+def warm_up(extra_modules: Optional[List[str]] = None) -> Dict[str, Any]:
+    """依次执行预热任务，单个任务失败不影响其余任务"""
+    _warmup_state.update(status="running", errors=[])
+    start = time.perf_counter()
+
+    tasks = list(_warmup_tasks) + [lazy_import(name, warmup=False).load for name in extra_modules or []]
+    for task in tasks:
+        try:
+            task()
+        except Exception as e:
+            name = getattr(task, "__qualname__", repr(task))
+            _warmup_state["errors"].append(f"{name}: {e}")
+            logger.warning(f"Warm-up task {name} failed: {e}")
+
+    _warmup_state.update(status="done", duration_ms=round((time.perf_counter() - start) * 1000, 1))
+    logger.info(f"Warm-up finished in {_warmup_state['duration_ms']} ms")
+    return warmup_status()
+
+
+def warmup_status() -> Dict[str, Any]:
+    """预热状态"""
+    return {**_warmup_state, "errors": list(_warmup_state["errors"])}
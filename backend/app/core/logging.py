@@ -1,79 +1,236 @@
 """
 日志配置
+
+所有日志记录先进入有界队列，由独立的 QueueListener 线程写入控制台和文件，
+业务代码（包括事件循环线程）中的 logger 调用不再直接执行文件 I/O 和日志轮转。
 """
 
+import json
 import logging
 import logging.config
-import os
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, Optional
 from app.core.config import settings
 
+# 仅输出到控制台、不写入日志文件的 logger
+CONSOLE_ONLY_LOGGERS = ("uvicorn", "uvicorn.access")
+
+# 溢出策略
+OVERFLOW_POLICIES = ("drop_new", "drop_oldest", "block")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """结构化 JSON 日志格式"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "location": f"{record.filename}:{record.lineno}",
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """按 logger 采样高频日志，WARNING 及以上级别总是保留
+
+    rates 形如 {"app.services.base_service": 0.1}，对该 logger 及其子 logger 生效，
+    取最长匹配前缀的采样率。
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._cache: Dict[str, float] = {}
+
+    def _rate_for(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            matched = -1
+            for prefix, value in self.rates.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > matched:
+                    rate, matched = value, len(prefix)
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class ConsoleOnlyFilter(logging.Filter):
+    """排除只应输出到控制台的日志（用于文件处理器）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.name not in CONSOLE_ONLY_LOGGERS
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """有界队列处理器，队列满时按溢出策略处理
+
+    - drop_new: 丢弃新记录（默认，不阻塞调用方）
+    - drop_oldest: 丢弃队列中最早的记录，保留新记录
+    - block: 阻塞等待队列空位（最多 block_timeout 秒），超时后丢弃
+    """
+
+    def __init__(self, log_queue: queue.Queue, overflow: str = "drop_new", block_timeout: float = 1.0):
+        super().__init__(log_queue)
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log queue overflow policy: {overflow}")
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                pass
+        self.dropped += 1
+
+
+def _build_handlers(formatters: Dict[str, logging.Formatter]):
+    """创建由监听线程使用的实际输出处理器"""
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(formatters["default"])
+
+    if settings.LOG_FILE_ROTATE:
+        file_handler = logging.handlers.RotatingFileHandler(
+            settings.LOG_FILE,
+            maxBytes=10485760,  # 10MB
+            backupCount=5,
+            encoding="utf8"
+        )
+    else:
+        # 多个进程追加写同一个文件，不在进程内轮转（各进程会同时改名），文件被外部轮转后重新打开
+        file_handler = logging.handlers.WatchedFileHandler(settings.LOG_FILE, encoding="utf8")
+    file_handler.setFormatter(formatters["detailed"])
+    file_handler.addFilter(ConsoleOnlyFilter())
+
+    return console, file_handler
+
+
 def setup_logging():
     """设置日志配置"""
-    
+    global _listener
+
+    # 重复调用时先停止旧的监听线程
+    shutdown_logging()
+
     # 确保日志目录存在
     log_dir = Path(settings.LOG_FILE).parent
     log_dir.mkdir(parents=True, exist_ok=True)
-    
+
+    if settings.LOG_FORMAT == "json":
+        formatters = {"default": JsonFormatter(), "detailed": JsonFormatter()}
+    else:
+        formatters = {
+            "default": logging.Formatter(
+                "[{asctime}] {levelname} in {name}: {message}",
+                datefmt="%Y-%m-%d %H:%M:%S",
+                style="{"
+            ),
+            "detailed": logging.Formatter(
+                "[{asctime}] {levelname} in {name}: {message} (at {filename}:{lineno})",
+                datefmt="%Y-%m-%d %H:%M:%S",
+                style="{"
+            ),
+        }
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = BoundedQueueHandler(log_queue, overflow=settings.LOG_QUEUE_OVERFLOW)
+    queue_handler.setLevel(settings.LOG_LEVEL)
+    if settings.LOG_SAMPLING_RATES:
+        # 在入队之前采样，被丢弃的记录不占用队列和格式化开销
+        queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLING_RATES))
+
     logging_config = {
         "version": 1,
         "disable_existing_loggers": False,
-        "formatters": {
-            "default": {
-                "format": "[{asctime}] {levelname} in {name}: {message}",
-                "style": "{",
-                "datefmt": "%Y-%m-%d %H:%M:%S"
-            },
-            "detailed": {
-                "format": "[{asctime}] {levelname} in {name}: {message} (at {filename}:{lineno})",
-                "style": "{",
-                "datefmt": "%Y-%m-%d %H:%M:%S"
-            }
-        },
         "handlers": {
-            "console": {
-                "class": "logging.StreamHandler",
-                "level": settings.LOG_LEVEL,
-                "formatter": "default",
-                "stream": "ext://sys.stdout"
-            },
-            "file": {
-                "class": "logging.handlers.RotatingFileHandler",
-                "level": settings.LOG_LEVEL,
-                "formatter": "detailed",
-                "filename": settings.LOG_FILE,
-                "maxBytes": 10485760,  # 10MB
-                "backupCount": 5,
-                "encoding": "utf8"
+            "queue": {
+                "()": lambda: queue_handler
             }
         },
         "loggers": {
             "": {  # root logger
                 "level": settings.LOG_LEVEL,
-                "handlers": ["console", "file"],
+                "handlers": ["queue"],
                 "propagate": False
             },
             "uvicorn": {
                 "level": "INFO",
-                "handlers": ["console"],
+                "handlers": ["queue"],
                 "propagate": False
             },
             "uvicorn.error": {
                 "level": "INFO",
-                "handlers": ["console", "file"],
+                "handlers": ["queue"],
                 "propagate": False
             },
             "uvicorn.access": {
                 "level": "INFO",
-                "handlers": ["console"],
+                "handlers": ["queue"],
                 "propagate": False
             }
         }
     }
-    
+
     logging.config.dictConfig(logging_config)
-    
+
+    _listener = logging.handlers.QueueListener(
+        log_queue,
+        *_build_handlers(formatters),
+        respect_handler_level=True
+    )
+    _listener.start()
+
     # 设置第三方库的日志级别
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+
+def shutdown_logging():
+    """停止监听线程并输出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def dropped_log_records() -> int:
+    """因队列溢出被丢弃的日志条数"""
+    return sum(
+        getattr(handler, "dropped", 0)
+        for handler in logging.getLogger().handlers
+    )
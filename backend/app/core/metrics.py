@@ -0,0 +1,392 @@
+"""
+指标采集
+
+进程内的轻量指标注册表（Counter / Gauge / Histogram），以 Prometheus 文本格式
+通过 GET /metrics 暴露。记录操作只做一次加锁的字典更新，不依赖额外的第三方库。
+"""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import threading
+import time
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# LLM 调用耗时较长，使用更宽的分桶
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric(ABC):
+    """指标基类"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _label_str(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """导出的样本行（不含 HELP 和 TYPE）"""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._label_str(key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._callbacks: List[Callable[[], Dict[LabelValues, float]]] = []
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def set_function(self, callback: Callable[[], Dict[LabelValues, float]]) -> None:
+        """注册在导出时才计算的取值函数（如连接池状态），返回 {标签值元组: 数值}"""
+        self._callbacks.append(callback)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        for callback in self._callbacks:
+            try:
+                values.update(callback())
+            except Exception:
+                continue
+        return [f"{self.name}{self._label_str(key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    """分桶直方图"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各分桶计数..., +Inf 计数, 总和]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            data[index] += 1
+            data[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> float:
+        data = self._values.get(self._key(labels))
+        return sum(data[:-1]) if data else 0.0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(data)) for key, data in self._values.items()]
+
+        lines = []
+        bounds = self.buckets + (float("inf"),)
+        for key, data in items:
+            cumulative = 0.0
+            for bound, count in zip(bounds, data[:-1]):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{self._label_str(key, ('le', _format_value(bound)))} {_format_value(cumulative)}"
+                )
+            lines.append(f"{self.name}_sum{self._label_str(key)} {_format_value(data[-1])}")
+            lines.append(f"{self.name}_count{self._label_str(key)} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+# HTTP 请求
+http_requests_total = registry.counter(
+    "http_requests_total", "Total HTTP requests", ("method", "route", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency in seconds", ("method", "route")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("method",)
+)
+
+# 数据库连接池
+db_pool_checkouts_total = registry.counter(
+    "db_pool_checkouts_total", "Database connections checked out from the pool"
+)
+db_pool_checked_out = registry.gauge(
+    "db_pool_checked_out", "Database connections currently checked out"
+)
+db_pool_wait_seconds = registry.histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled database connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+db_pool_size = registry.gauge(
+    "db_pool_size", "Database connection pool state", ("state",)
+)
+
+# 后台任务
+background_jobs_queued = registry.gauge(
+    "background_jobs_queued", "Background jobs waiting to start", ("kind",)
+)
+background_jobs_running = registry.gauge(
+    "background_jobs_running", "Background jobs currently running", ("kind",)
+)
+background_job_duration_seconds = registry.histogram(
+    "background_job_duration_seconds", "Background job duration in seconds", ("kind", "status"),
+    buckets=LLM_BUCKETS
+)
+
+# 缓存
+cache_requests_total = registry.counter(
+    "cache_requests_total", "Cache lookups by result", ("cache", "result")
+)
+
+# LLM 调用
+llm_request_duration_seconds = registry.histogram(
+    "llm_request_duration_seconds", "LLM call latency in seconds", ("model", "operation", "status"),
+    buckets=LLM_BUCKETS
+)
+llm_tokens_total = registry.counter(
+    "llm_tokens_total", "LLM tokens consumed", ("model", "type")
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """记录一次缓存查询结果"""
+    cache_requests_total.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_call(
+    model: str,
+    operation: str,
+    duration: float,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    status: str = "ok"
+) -> None:
+    """记录一次 LLM 调用的耗时和 token 用量"""
+    llm_request_duration_seconds.observe(duration, model=model, operation=operation, status=status)
+    if prompt_tokens:
+        llm_tokens_total.inc(prompt_tokens, model=model, type="prompt")
+    if completion_tokens:
+        llm_tokens_total.inc(completion_tokens, model=model, type="completion")
+
+
+def add_background_job(background_tasks, kind: str, func: Callable, *args, **kwargs) -> None:
+    """以带指标的方式向 FastAPI BackgroundTasks 添加任务（统计排队数量、运行数量和耗时）"""
+    background_jobs_queued.inc(kind=kind)
+
+    async def _run():
+        background_jobs_queued.dec(kind=kind)
+        background_jobs_running.inc(kind=kind)
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            if asyncio.iscoroutinefunction(func):
+                await func(*args, **kwargs)
+            else:
+                await asyncio.to_thread(func, *args, **kwargs)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            background_jobs_running.dec(kind=kind)
+            background_job_duration_seconds.observe(time.perf_counter() - start, kind=kind, status=status)
+
+    background_tasks.add_task(_run)
+
+
+def instrument_engine(engine) -> None:
+    """为 SQLAlchemy 引擎注册连接池指标"""
+    from sqlalchemy import event
+
+    pool = engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checkouts_total.inc()
+        db_pool_checked_out.inc()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        db_pool_checked_out.dec()
+
+    # 连接池没有"开始等待"事件，这里包装取连接的方法来计时
+    do_get = pool._do_get
+
+    @wraps(do_get)
+    def _timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            db_pool_wait_seconds.observe(time.perf_counter() - start)
+
+    pool._do_get = _timed_do_get
+
+    # QueuePool 等支持容量查询的连接池在导出时读取实时状态；内存 SQLite 使用的 StaticPool
+    # 没有容量可查，也从不等待，不导出 db_pool_size，等待时间始终约为 0
+    if hasattr(pool, "size") and hasattr(pool, "overflow"):
+        db_pool_size.set_function(lambda: {
+            ("size",): pool.size(),
+            ("overflow",): pool.overflow(),
+            ("idle",): pool.checkedin(),
+        })
+
+
+class MetricsMiddleware:
+    """记录每个路由的请求数、延迟和并发中的请求数（纯 ASGI 实现，开销低）"""
+
+    def __init__(self, app, exclude_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_flight.dec(method=method)
+            # 使用路由模板而不是实际路径作为标签，避免标签基数爆炸
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "<unmatched>"
+            http_requests_total.inc(method=method, route=route_path, status=status_code)
+            http_request_duration_seconds.observe(duration, method=method, route=route_path)
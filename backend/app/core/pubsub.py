@@ -0,0 +1,171 @@
+"""
+任务进度推送
+
+客户端通过 WebSocket 订阅企划或导出任务的主题（plan:{id}、export:{id}），由执行任务的代码
+调用 progress_hub.publish 推送进度，取代每秒轮询状态接口。
+
+- 进程内 fan-out：每个连接一个有界队列，慢客户端只丢弃最旧的事件，不阻塞发布者；
+- 跨 worker 转发：默认经协调器广播（单进程时即进程内，多 worker 时经共享 SQLite），
+  配置 PUBSUB_BACKEND=redis 后经 Redis 发布订阅，支持多台机器；
+- 每个主题保留最近一次事件，新订阅者立即收到当前状态。
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set
+import asyncio
+import json
+import logging
+import time
+
+from app.core.config import settings
+from app.core.coordination import coordinator
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# 经协调器转发事件的频道
+PUBSUB_CHANNEL = "progress"
+
+# 事件类型
+PROGRESS = "progress"
+SECTION_COMPLETED = "section_completed"
+FINISHED = "finished"
+FAILED = "failed"
+
+TOPIC_KINDS = ("plan", "export")
+
+pubsub_events_total = registry.counter(
+    "pubsub_events_total", "Progress events published", ("kind", "type")
+)
+pubsub_dropped_total = registry.counter(
+    "pubsub_dropped_total", "Progress events dropped for slow subscribers"
+)
+
+
+def topic(kind: str, id: str) -> str:
+    return f"{kind}:{id}"
+
+
+def valid_topic(name: str) -> bool:
+    kind, _, id = name.partition(":")
+    return kind in TOPIC_KINDS and bool(id)
+
+
+class Subscription:
+    """单个连接的订阅：主题集合和有界事件队列"""
+
+    def __init__(self, max_queue: int):
+        self.topics: Set[str] = set()
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=max_queue)
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        if self.queue.full():
+            # 进度事件会被后续事件取代，丢弃最旧的
+            self.queue.get_nowait()
+            pubsub_dropped_total.inc()
+        self.queue.put_nowait(event)
+
+
+class ProgressHub:
+    """进程内订阅管理，跨 worker 的事件经转发后端送达"""
+
+    def __init__(self, max_queue: int = 100, retained_topics: int = 10000):
+        self.max_queue = max_queue
+        self.retained_topics = retained_topics
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._last: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._connections = 0
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+        coordinator.subscribe(PUBSUB_CHANNEL, self._fan_out)
+
+    def connections(self) -> int:
+        return self._connections
+
+    def open(self) -> Subscription:
+        self._connections += 1
+        return Subscription(self.max_queue)
+
+    def close(self, subscription: Subscription) -> None:
+        self.unsubscribe(subscription)
+        self._connections -= 1
+
+    def subscribe(self, subscription: Subscription, topics: Iterable[str]) -> None:
+        for name in topics:
+            subscription.topics.add(name)
+            self._subscribers.setdefault(name, set()).add(subscription)
+            last = self._last.get(name)
+            if last is not None:
+                subscription.deliver(last)
+
+    def unsubscribe(self, subscription: Subscription, topics: Optional[Iterable[str]] = None) -> None:
+        for name in list(subscription.topics if topics is None else topics):
+            subscription.topics.discard(name)
+            subscribers = self._subscribers.get(name)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[name]
+
+    def _fan_out(self, event: Dict[str, Any]) -> None:
+        name = event.get("topic")
+        if not name:
+            return
+        self._last[name] = event
+        self._last.move_to_end(name)
+        while len(self._last) > self.retained_topics:
+            self._last.popitem(last=False)
+        for subscription in list(self._subscribers.get(name, ())):
+            subscription.deliver(event)
+
+    async def publish(self, kind: str, id: str, type: str, **data: Any) -> None:
+        """发布任务事件，所有 worker 上订阅该主题的连接都会收到"""
+        event = {"topic": topic(kind, id), "type": type, "data": data, "ts": time.time()}
+        pubsub_events_total.inc(kind=kind, type=type)
+        if self._redis is not None:
+            try:
+                await self._redis.publish(settings.PUBSUB_REDIS_CHANNEL, json.dumps(event, ensure_ascii=False))
+                return
+            except Exception as e:
+                logger.warning(f"Redis publish failed, delivering locally: {e}")
+                self._fan_out(event)
+                return
+        await coordinator.publish(PUBSUB_CHANNEL, event)
+
+    async def start(self) -> None:
+        if settings.PUBSUB_BACKEND != "redis" or self._listener is not None:
+            return
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(settings.REDIS_URL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(settings.PUBSUB_REDIS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._fan_out(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis subscription lost, retrying: {e}")
+                await asyncio.sleep(1.0)
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+progress_hub = ProgressHub(max_queue=settings.PUBSUB_QUEUE_SIZE)
+
+registry.gauge(
+    "pubsub_connections", "Open progress WebSocket connections"
+).set_function(lambda: {(): float(progress_hub.connections())})
@@ -0,0 +1,302 @@
+"""
+准入控制与限流
+
+企划生成、证据搜索和导出接口的开销比普通 CRUD 高几个数量级，这里按路由类别做两层保护：
+
+1. 每个客户端、每个路由类别一个令牌桶，超出速率返回 429 和 Retry-After；
+2. 每个路由类别一个全局并发上限，超出的请求排队等待，队列已满或等待超过期限返回 503。
+
+令牌桶状态默认保存在进程内存中；配置 RATE_LIMIT_BACKEND=sqlite（同一台机器上的多个 worker，
+见 app.core.coordination）或 redis 后在多个 worker 之间共享。并发上限始终按进程计算。
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import math
+import re
+import time
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# 路由类别: (类别, HTTP 方法, 路径正则)
+ROUTE_CLASSES: List[Tuple[str, str, "re.Pattern[str]"]] = [
+    ("generate", "POST", re.compile(r"^/api/v1/plan/[^/]+/generate/?$")),
+    ("search", "POST", re.compile(r"^/api/v1/evidence/search/?$")),
+    ("export", "POST", re.compile(r"^/api/v1/export/plan/[^/]+/(pdf|docx|markdown|package)/?$")),
+]
+
+admission_rejected_total = registry.counter(
+    "admission_rejected_total", "Requests rejected by admission control", ("route_class", "reason")
+)
+admission_queue_depth = registry.gauge(
+    "admission_queue_depth", "Requests waiting for a concurrency slot", ("route_class",)
+)
+
+
+class AdmissionRejected(Exception):
+    """请求被准入控制拒绝"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class InMemoryTokenBuckets:
+    """进程内令牌桶"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, List[float]] = {}
+
+    async def consume(self, key: str, rate: float, burst: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """尝试消耗令牌，返回 (是否允许, 需要等待的秒数)"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._evict(now, rate, burst)
+            bucket = self._buckets[key] = [burst, now]
+
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return True, 0.0
+        bucket[0] = tokens
+        return False, (cost - tokens) / rate
+
+    def _evict(self, now: float, rate: float, burst: float) -> None:
+        """移除已经回满的桶（与新建桶等价），仍然过多时清空"""
+        full = [key for key, (tokens, ts) in self._buckets.items() if tokens + (now - ts) * rate >= burst]
+        for key in full:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
+
+
+class RedisTokenBuckets:
+    """基于 Redis 的令牌桶，多个 worker 共享限流状态"""
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or burst
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    local retry = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    else
+        retry = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(retry)}
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as aioredis
+
+        self.prefix = prefix
+        self.client = aioredis.from_url(url)
+        self._script = self.client.register_script(self.SCRIPT)
+
+    async def consume(self, key: str, rate: float, burst: float, cost: float = 1.0) -> Tuple[bool, float]:
+        try:
+            allowed, retry = await self._script(keys=[self.prefix + key], args=[rate, burst, cost])
+            return bool(allowed), float(retry)
+        except Exception as e:
+            # Redis 不可用时放行，避免限流组件成为单点故障
+            logger.warning(f"Redis rate limiter unavailable, allowing request: {e}")
+            return True, 0.0
+
+
+class SQLiteTokenBuckets:
+    """基于协调数据库的令牌桶，同一台机器上的多个 worker 共享限流状态"""
+
+    def __init__(self, store: Any = None):
+        from app.core.coordination import SQLiteCoordinator, coordinator
+
+        if store is None:
+            store = coordinator if isinstance(coordinator, SQLiteCoordinator) else SQLiteCoordinator(
+                settings.COORDINATION_DB_PATH
+            )
+        self.store = store
+
+    async def consume(self, key: str, rate: float, burst: float, cost: float = 1.0) -> Tuple[bool, float]:
+        try:
+            return await self.store.consume_tokens(key, rate, burst, cost)
+        except Exception as e:
+            logger.warning(f"SQLite rate limiter unavailable, allowing request: {e}")
+            return True, 0.0
+
+
+class ConcurrencyLimiter:
+    """带有界等待队列和等待期限的并发上限"""
+
+    def __init__(self, route_class: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.route_class = route_class
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected(503, "queue_full", self.queue_timeout)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        admission_queue_depth.inc(route_class=self.route_class)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # 超时的同时恰好拿到了名额
+                return
+            self._discard(future)
+            raise AdmissionRejected(503, "queue_timeout", self.queue_timeout)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._discard(future)
+            raise
+        finally:
+            admission_queue_depth.dec(route_class=self.route_class)
+
+    def _discard(self, future: asyncio.Future) -> None:
+        future.cancel()
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        """释放名额，有等待者时直接转交给最早的等待者"""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """返回请求所属的路由类别，普通请求返回 None"""
+    for route_class, route_method, pattern in ROUTE_CLASSES:
+        if method == route_method and pattern.match(path):
+            return route_class
+    return None
+
+
+class AdmissionControlMiddleware:
+    """按客户端限流并按路由类别限制全局并发的中间件"""
+
+    def __init__(self, app, limits: Optional[Dict[str, Dict[str, float]]] = None, buckets: Any = None):
+        self.app = app
+        self.limits = limits if limits is not None else settings.RATE_LIMITS
+        if buckets is not None:
+            self.buckets = buckets
+        elif settings.RATE_LIMIT_BACKEND == "redis":
+            self.buckets = RedisTokenBuckets(settings.REDIS_URL)
+        elif settings.RATE_LIMIT_BACKEND == "sqlite":
+            self.buckets = SQLiteTokenBuckets()
+        else:
+            self.buckets = InMemoryTokenBuckets()
+        self.limiters = {
+            route_class: ConcurrencyLimiter(
+                route_class,
+                int(limit.get("max_concurrency", 1)),
+                int(limit.get("max_queue", 0)),
+                float(limit.get("queue_timeout", 10.0))
+            )
+            for route_class, limit in self.limits.items()
+            if limit.get("max_concurrency")
+        }
+
+    def client_id(self, scope) -> str:
+        """客户端标识：配置的请求头 > X-Forwarded-For（需开启信任）> 连接地址"""
+        headers = dict(scope.get("headers") or [])
+        if settings.RATE_LIMIT_CLIENT_HEADER:
+            value = headers.get(settings.RATE_LIMIT_CLIENT_HEADER.lower().encode("latin-1"))
+            if value:
+                return value.decode("latin-1")
+        if settings.RATE_LIMIT_TRUST_FORWARDED:
+            forwarded = headers.get(b"x-forwarded-for")
+            if forwarded:
+                return forwarded.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify(scope["method"], scope["path"])
+        limit = self.limits.get(route_class) if route_class else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            if limit.get("rate"):
+                allowed, retry_after = await self.buckets.consume(
+                    f"{route_class}:{self.client_id(scope)}",
+                    float(limit["rate"]),
+                    float(limit.get("burst", 1))
+                )
+                if not allowed:
+                    raise AdmissionRejected(429, "rate_limited", retry_after)
+
+            limiter = self.limiters.get(route_class)
+            if limiter is not None:
+                await limiter.acquire()
+        except AdmissionRejected as e:
+            admission_rejected_total.inc(route_class=route_class, reason=e.reason)
+            await self._reject(scope, send, e)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+    async def _reject(self, scope, send, rejection: AdmissionRejected) -> None:
+        message = "请求过于频繁，请稍后重试" if rejection.status_code == 429 else "服务繁忙，请稍后重试"
+        body = json.dumps({
+            "error": message,
+            "status_code": rejection.status_code,
+            "path": scope["path"],
+        }, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": rejection.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(rejection.retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
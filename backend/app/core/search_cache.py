@@ -0,0 +1,214 @@
+"""
+证据搜索结果缓存
+
+缓存键由规范化后的查询（NFKC、大小写折叠、按空白和分隔性标点切分、中文分词、去停用词）
+组成，仅在空白、大小写、全角半角、句读或虚词上不同的查询得到同一个缓存键。词内的符号保留
+（c++、c#、node.js、at&t 互不相同），全部是停用词或符号的查询不去掉任何词。缓存键同时包含
+搜索源、最低相关性、最大结果数和企划ID。发送给搜索源的是 clean_query 的结果（只做 NFKC 和
+空白整理），规范化只用于缓存键。
+
+- 按搜索源设置 TTL，多个源组合时取最短的 TTL；
+- 空结果同样缓存（负缓存），使用较短的 TTL；
+- 按条目数限制容量，超出时淘汰最久未使用的条目；
+- 命中率通过 stats() 和 /metrics 暴露；
+- 证据变更后通过协调器广播失效，多 worker 部署时各 worker 的缓存一起清空。
+
+jieba 为可选依赖，未安装时只去掉相邻汉字之间的空白，不做分词。
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+import threading
+import time
+import unicodedata
+
+from app.core.config import settings
+from app.core.coordination import coordinator
+from app.core.metrics import record_cache, registry
+
+try:
+    import jieba
+except ImportError:  # pragma: no cover - 可选依赖
+    jieba = None
+
+CACHE_NAME = "evidence_search"
+
+# 只去掉不影响检索意图的虚词
+STOP_WORDS = frozenset({
+    "的", "了", "和", "与", "及", "或", "是", "在", "对", "把", "被", "从", "向", "于",
+    "之", "其", "而", "并", "等", "吗", "呢", "吧", "啊", "关于", "有关", "以及",
+    "a", "an", "the", "of", "and", "or", "in", "on", "for", "to", "with", "about",
+})
+
+
+def _is_cjk(char: str) -> bool:
+    return "\u4e00" <= char <= "\u9fff" or "\u3400" <= char <= "\u4dbf"
+
+
+# 分隔词的标点：括号、引号和句读；其余符号（+ # . & - / 等）在词内保留
+SEPARATORS = frozenset(",;:!?，。、；：！？…·\"'`")
+# 词首尾去掉的标点，词内保留（"node.js." -> "node.js"）
+EDGE_PUNCTUATION = ".-_/\\&*~@"
+
+
+def _is_separator(char: str) -> bool:
+    category = unicodedata.category(char)
+    return category[0] in "ZC" or category in ("Ps", "Pe", "Pi", "Pf") or char in SEPARATORS
+
+
+def _split_cjk(word: str) -> List[str]:
+    """汉字与其他字符分段，只对汉字部分分词（jieba 会把 c++ 拆成单个符号）"""
+    runs: List[str] = []
+    for char in word:
+        if runs and _is_cjk(char) == _is_cjk(runs[-1][-1]):
+            runs[-1] += char
+        else:
+            runs.append(char)
+    tokens: List[str] = []
+    for run in runs:
+        if jieba is not None and _is_cjk(run[0]):
+            tokens.extend(token for token in (t.strip() for t in jieba.lcut(run)) if token)
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def _segment(text: str) -> List[str]:
+    words = "".join(" " if _is_separator(char) else char for char in text).split()
+    tokens: List[str] = []
+    for word in words:
+        stripped = word.strip(EDGE_PUNCTUATION) or word
+        if jieba is not None:
+            tokens.extend(_split_cjk(stripped))
+        elif tokens and _is_cjk(stripped[0]) and _is_cjk(tokens[-1][-1]):
+            # 未安装 jieba 时只去掉相邻汉字之间的空白
+            tokens[-1] += stripped
+        else:
+            tokens.append(stripped)
+    return tokens
+
+
+def clean_query(query: str) -> str:
+    """发送给搜索源的查询：NFKC 规范化并整理空白，保留原有的大小写和符号"""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+def _terms(text: str) -> List[str]:
+    tokens = _segment(text)
+    # 全部是停用词时保留原词，避免不同的查询共用空的缓存键
+    return [token for token in tokens if token.casefold() not in STOP_WORDS] or tokens
+
+
+def query_terms(query: str) -> List[str]:
+    """本地检索用的词：与缓存键相同的切分，保留大小写"""
+    return _terms(clean_query(query))
+
+
+def normalize_query(query: str) -> str:
+    """规范化搜索查询（用于缓存键），返回以单个空格分隔的词"""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    return " ".join(_terms(text)) or " ".join(text.split())
+
+
+def search_cache_key(
+    query: str,
+    sources: Sequence[str],
+    min_relevance: float,
+    max_results: int,
+    plan_id: Optional[str] = None
+) -> Tuple[Hashable, ...]:
+    """由规范化后的查询和影响结果的请求参数组成缓存键"""
+    return (query, tuple(sorted(set(sources))), round(min_relevance, 4), max_results, plan_id)
+
+
+class SearchCache:
+    """带 TTL 和负缓存的 LRU 搜索结果缓存"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttls: Dict[str, float],
+        default_ttl: float,
+        negative_ttl: float
+    ):
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, bool, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, sources: Sequence[str]) -> float:
+        if not sources:
+            return self.default_ttl
+        return min(self.ttls.get(source, self.default_ttl) for source in sources)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """返回缓存的结果，未命中或已过期返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if entry[1]:
+                    self.negative_hits += 1
+        record_cache(CACHE_NAME, entry is not None)
+        return entry[2] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any, sources: Sequence[str], empty: bool = False) -> None:
+        """写入结果；empty 为 True 时按负缓存 TTL 保存"""
+        ttl = self.negative_ttl if empty else self.ttl_for(sources)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, empty, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hit_ratio(), 4),
+        }
+
+
+search_cache = SearchCache(
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES if settings.SEARCH_CACHE_ENABLED else 0,
+    ttls=settings.SEARCH_CACHE_TTLS,
+    default_ttl=settings.SEARCH_CACHE_DEFAULT_TTL,
+    negative_ttl=settings.SEARCH_CACHE_NEGATIVE_TTL
+)
+
+coordinator.on_invalidate(CACHE_NAME, search_cache.clear)
+
+registry.gauge(
+    "search_cache_hit_ratio", "Evidence search cache hit ratio since startup"
+).set_function(lambda: {(): search_cache.hit_ratio()})
+registry.gauge(
+    "search_cache_entries", "Evidence search cache entries"
+).set_function(lambda: {(): float(len(search_cache._entries))})
@@ -0,0 +1,147 @@
+"""
+快速序列化
+
+列表接口默认经过 response_model 校验：每一行 ORM 对象的 JSON 列都会被重新校验成
+嵌套的 Pydantic 模型，再由标准 json 编码。对于数据库中已经校验过的可信数据，
+快速模式按响应模型的字段直接读取 ORM 属性并用 orjson 编码，跳过重复校验。
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union, get_args, get_origin
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy import inspect as sa_inspect
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    orjson = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# (输出键名, 属性名, 嵌套模型, 是否列表)
+FieldPlan = Tuple[str, str, Optional[Type[BaseModel]], bool]
+
+
+def _nested_model(annotation: Any) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """从字段注解中解析出嵌套的响应模型（仅处理 Optional[Model] / Optional[List[Model]]）"""
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            return None, False
+        annotation = args[0]
+
+    is_list = get_origin(annotation) in (list, List)
+    if is_list:
+        annotation = get_args(annotation)[0]
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, is_list
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def _field_plan(model: Type[BaseModel]) -> Tuple[FieldPlan, ...]:
+    """预先计算响应模型的字段读取方案"""
+    plan = []
+    expandable = getattr(model, "expandable_relations", ())
+    for name, field in model.model_fields.items():
+        nested, is_list = _nested_model(field.annotation) if name in expandable else (None, False)
+        plan.append((field.alias or name, name, nested, is_list))
+    return tuple(plan)
+
+
+def dump_row(row: Any, model: Type[BaseModel]) -> Dict[str, Any]:
+    """按响应模型的字段将 ORM 行直接转换为字典，JSON 列原样输出"""
+    state = sa_inspect(row, raiseerr=False)
+    unloaded = state.unloaded if state is not None else ()
+
+    data = {}
+    for key, attr, nested, is_list in _field_plan(model):
+        if nested is not None:
+            # 未预加载的关联关系不读取，避免触发懒加载
+            if attr in unloaded:
+                data[key] = None
+                continue
+            value = getattr(row, attr)
+            if value is None:
+                data[key] = None
+            elif is_list:
+                data[key] = [dump_row(item, nested) for item in value]
+            else:
+                data[key] = dump_row(value, nested)
+        else:
+            data[key] = getattr(row, attr, None)
+    return data
+
+
+def dump_page(page: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    """转换 BaseService.list 返回的分页结果"""
+    return {
+        "items": [dump_row(item, model) for item in page["items"]],
+        "total": page["total"],
+        "page": page["page"],
+        "size": page["size"],
+    }
+
+
+def iter_ndjson(rows: Iterable[Any], model: Type[BaseModel], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """将 ORM 行逐行编码为 NDJSON（不含关联对象），按约 chunk_size 字节分块输出"""
+    expandable = getattr(model, "expandable_relations", ())
+
+    def items() -> Iterator[Dict[str, Any]]:
+        for row in rows:
+            data = dump_row(row, model)
+            for name in expandable:
+                data.pop(name, None)
+            yield data
+
+    return iter_json_lines(items(), chunk_size)
+
+
+def iter_json_lines(items: Iterable[Any], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """将可直接编码的对象逐行编码为 NDJSON，按约 chunk_size 字节分块输出"""
+    buffer: List[bytes] = []
+    buffered = 0
+    for item in items:
+        line = dumps(item) + b"\n"
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= chunk_size:
+            yield b"".join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """编码为 JSON 字节串，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=_default
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """使用 orjson 编码的 JSON 响应"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -5,27 +5,70 @@ FastAPI Main Application
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import uvicorn
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import os
 from contextlib import asynccontextmanager
 
-# from app.api import requirement, plan, evidence, export
+from app.api import requirement, plan, evidence, progress
+# from app.api import export
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
-from app.core.database import init_db
-from app.core.logging import setup_logging
-
-# 设置日志
-setup_logging()
+from app.core.coordination import coordinator
+from app.core.database import engine, init_db
+from app.core.lazy import warm_up, warmup_status
+from app.core.pubsub import progress_hub
+from app.core.metrics import MetricsMiddleware, instrument_engine, registry
+from app.core.rate_limit import AdmissionControlMiddleware
+from app.core.logging import setup_logging, shutdown_logging
+from app.services.evidence_fetcher import evidence_fetcher, refresh_scheduler
+from app.services.evidence_usage import run_usage_backfill
+from app.services.plan_search import run_search_backfill
+from app.services.similarity import run_embedding_backfill
+from app.services.purge import purge_scheduler
+from app.services.search_engine import search_engine
+from app.services.timeliness import timeliness_scheduler
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用启动和关闭时的生命周期管理"""
-    # 启动时执行
+    # 启动时执行（日志在此配置而非导入时，避免导入应用即产生文件 I/O）
+    setup_logging()
     await init_db()
+    await coordinator.start()
+    await progress_hub.start()
+    
+    # 预热在就绪之后于后台线程执行，不阻塞启动
+    warmup_task = None
+    if settings.WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, settings.WARMUP_MODULES))
+    if settings.EVIDENCE_REFRESH_ENABLED:
+        refresh_scheduler.start()
+    if settings.EVIDENCE_TIMELINESS_ENABLED:
+        timeliness_scheduler.start()
+    if settings.PURGE_ENABLED:
+        purge_scheduler.start()
+    # 补齐证据引用表和企划检索文档建立之前的数据，以及缺失或模型已更换的需求向量
+    backfill_tasks = [
+        asyncio.create_task(run_usage_backfill()),
+        asyncio.create_task(run_search_backfill()),
+        asyncio.create_task(run_embedding_backfill()),
+    ]
     yield
     # 关闭时执行
-    pass
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    for task in backfill_tasks:
+        if not task.done():
+            task.cancel()
+    await refresh_scheduler.stop()
+    await timeliness_scheduler.stop()
+    await purge_scheduler.stop()
+    await evidence_fetcher.aclose()
+    await search_engine.aclose()
+    await progress_hub.stop()
+    await coordinator.stop()
+    shutdown_logging()
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -37,6 +80,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 准入控制与限流（位于 CORS 之内，429/503 响应同样带有 CORS 头）
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
 # CORS配置 - 允许前端访问
 app.add_middleware(
     CORSMiddleware,
@@ -44,12 +91,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After"],
 )
 
-# 注册API路由 (暂时注释掉，等实现服务层后再启用)
-# app.include_router(requirement.router, prefix="/api/v1/requirement", tags=["需求澄清"])
-# app.include_router(plan.router, prefix="/api/v1/plan", tags=["企划生成"])
-# app.include_router(evidence.router, prefix="/api/v1/evidence", tags=["证据检索"])
+# 响应压缩
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# 指标采集（最外层，统计包含其他中间件在内的完整耗时）
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+
+# 注册API路由 (导出功能暂时注释掉，等实现导出服务后再启用)
+app.include_router(requirement.router, prefix="/api/v1/requirement", tags=["需求澄清"])
+app.include_router(plan.router, prefix="/api/v1/plan", tags=["企划生成"])
+app.include_router(evidence.router, prefix="/api/v1/evidence", tags=["证据检索"])
+app.include_router(progress.router, prefix="/api/v1/progress", tags=["任务进度"])
 # app.include_router(export.router, prefix="/api/v1/export", tags=["导出功能"])
 
 @app.get("/")
@@ -64,7 +122,14 @@ async def root():
 @app.get("/health")
 async def health_check():
     """健康检查端点"""
-    return {"status": "healthy", "service": "planning-agent-api"}
+    return {"status": "healthy", "service": "planning-agent-api", "warmup": warmup_status()["status"]}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标端点"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # 全局异常处理
 @app.exception_handler(HTTPException)
@@ -90,6 +155,9 @@ async def general_exception_handler(request, exc):
     )
 
 if __name__ == "__main__":
+    # 开发用单进程启动，生产环境使用 python -m app.server
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
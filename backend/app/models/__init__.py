@@ -3,13 +3,21 @@
 """
 
 from .requirement import RequirementSnapshot
+from .requirement_embedding import RequirementEmbedding
 from .plan import Plan
+from .plan_outline import PlanOutline
+from .plan_search import PlanSearchDocument
 from .evidence import Evidence
+from .evidence_usage import EvidenceUsage
 from .user import User
 
 __all__ = [
     "RequirementSnapshot",
+    "RequirementEmbedding",
     "Plan", 
+    "PlanOutline",
+    "PlanSearchDocument",
     "Evidence",
+    "EvidenceUsage",
     "User"
 ]
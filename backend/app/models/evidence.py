@@ -2,20 +2,30 @@
 证据文件数据模型
 """
 
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.soft_delete import SoftDeleteMixin
+from datetime import datetime, timezone
 import uuid
 
-class Evidence(Base):
+class Evidence(Base, SoftDeleteMixin):
     """证据文件模型"""
     
     __tablename__ = "evidences"
+    __table_args__ = (
+        # 按企划流式读取证据时的过滤和排序
+        Index("ix_evidences_plan_id_created_at", "plan_id", "created_at"),
+        # 时效性重算只读取到期的行
+        Index("ix_evidences_timeliness_due_at", "timeliness_due_at"),
+        # 刷新调度只读取到期的行
+        Index("ix_evidences_refresh_due_at", "refresh_due_at"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
     
     # 关联企划
     plan_id = Column(String, ForeignKey("plans.id"), nullable=True)
@@ -30,6 +40,14 @@ class Evidence(Base):
     file_type = Column(String(50), nullable=True, comment="文件类型")
     file_size = Column(Integer, nullable=True, comment="文件大小(字节)")
     
+    # 抓取校验信息（用于条件请求刷新）
+    etag = Column(String(500), nullable=True, comment="上次抓取的 ETag")
+    last_modified = Column(String(100), nullable=True, comment="上次抓取的 Last-Modified")
+    content_hash = Column(String(64), nullable=True, comment="文件内容 SHA-256")
+    fetched_at = Column(DateTime(timezone=True), nullable=True, comment="上次抓取时间")
+    published_at = Column(DateTime(timezone=True), nullable=True, comment="内容发布或最后修改时间，时效性评分的起算点")
+    refresh_due_at = Column(DateTime(timezone=True), nullable=True, comment="下次刷新时间，为空表示从未抓取")
+    
     # 许可信息
     license = Column(String(200), nullable=True, comment="许可信息")
     
@@ -37,8 +55,9 @@ class Evidence(Base):
     relevance_score = Column(Float, default=0.0, comment="相关性评分 0-1")
     authority_score = Column(Float, default=0.0, comment="权威度评分 0-1")
     timeliness_score = Column(Float, default=0.0, comment="时效性评分 0-1")
+    timeliness_due_at = Column(DateTime(timezone=True), nullable=True, comment="时效性评分下次变化的时间，为空时不再衰减")
     
-    # 使用情况
+    # 使用情况（由 evidence_usages 表派生，写入时整体替换对应的行）
     usage_in_plan = Column(JSON, nullable=True, comment="在企划中的使用情况")
     # usage_in_plan 结构: [
     #   {
@@ -53,6 +72,12 @@ class Evidence(Base):
     
     # 关联关系
     plan = relationship("Plan", back_populates="evidences")
+    usages = relationship(
+        "EvidenceUsage",
+        back_populates="evidence",
+        order_by="EvidenceUsage.position",
+        cascade="all, delete-orphan"
+    )
     
     def __repr__(self):
         return f"<Evidence(id={self.id}, title={self.title[:50]}...)>"
@@ -0,0 +1,31 @@
+"""
+证据使用情况数据模型
+"""
+
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+class EvidenceUsage(Base):
+    """证据在企划章节中的一次引用（Evidence.usage_in_plan 由此派生）"""
+
+    __tablename__ = "evidence_usages"
+    __table_args__ = (
+        # 某企划某章节引用的全部证据
+        Index("ix_evidence_usages_plan_id_section", "plan_id", "section"),
+        # 引用某证据的全部企划
+        Index("ix_evidence_usages_evidence_id", "evidence_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    evidence_id = Column(String, ForeignKey("evidences.id", ondelete="CASCADE"), nullable=False)
+    plan_id = Column(String, ForeignKey("plans.id", ondelete="CASCADE"), nullable=False, comment="引用证据的企划")
+    section = Column(String(200), nullable=False, comment="使用章节")
+    context = Column(Text, nullable=True, comment="使用上下文")
+    position = Column(Integer, nullable=False, default=0, comment="在 usage_in_plan 中的顺序")
+
+    # 关联关系
+    evidence = relationship("Evidence", back_populates="usages")
+
+    def __repr__(self):
+        return f"<EvidenceUsage(evidence_id={self.evidence_id}, plan_id={self.plan_id}, section={self.section})>"
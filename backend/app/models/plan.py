@@ -6,16 +6,19 @@ from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.soft_delete import SoftDeleteMixin
+from datetime import datetime, timezone
 import uuid
 
-class Plan(Base):
+class Plan(Base, SoftDeleteMixin):
     """企划文档模型"""
     
     __tablename__ = "plans"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # 应用侧生成微秒精度的更新时间（SQLite 的 CURRENT_TIMESTAMP 只精确到秒），用于计算 ETag
+    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
     
     # 关联需求快照
     requirement_snapshot_id = Column(String, ForeignKey("requirement_snapshots.id"), nullable=False)
@@ -55,10 +58,13 @@ class Plan(Base):
     # 状态信息
     status = Column(String(50), default="draft", comment="状态: draft, generating, completed, archived")
     completion_score = Column(Integer, default=0, comment="完成度评分 0-100")
+    scores_stale = Column(Boolean, default=False, comment="证据评分变化后完成度待重新计算")
     
     # 关联关系
     requirement_snapshot = relationship("RequirementSnapshot", back_populates="plans")
     evidences = relationship("Evidence", back_populates="plan", cascade="all, delete-orphan")
+    outlines = relationship("PlanOutline", back_populates="plan", cascade="all, delete-orphan")
+    search_documents = relationship("PlanSearchDocument", back_populates="plan", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Plan(id={self.id}, title={self.overview.get('title', 'Untitled') if self.overview else 'Untitled'})>"
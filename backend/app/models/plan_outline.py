@@ -0,0 +1,28 @@
+"""
+企划大纲物化数据模型
+"""
+
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+from datetime import datetime, timezone
+
+class PlanOutline(Base):
+    """企划大纲（按输出格式预先渲染，企划章节变化时随之更新）"""
+    
+    __tablename__ = "plan_outlines"
+    
+    plan_id = Column(String, ForeignKey("plans.id", ondelete="CASCADE"), primary_key=True)
+    format_type = Column(String(20), primary_key=True, comment="输出格式: json, markdown, mermaid")
+    content = Column(Text, nullable=False, comment="渲染后的大纲")
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc)
+    )
+    
+    # 关联关系
+    plan = relationship("Plan", back_populates="outlines")
+    
+    def __repr__(self):
+        return f"<PlanOutline(plan_id={self.plan_id}, format_type={self.format_type})>"
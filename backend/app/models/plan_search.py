@@ -0,0 +1,56 @@
+"""
+企划全文检索数据模型
+"""
+
+from sqlalchemy import DDL, Column, Integer, String, Text, ForeignKey, Index, event, text as sql_text
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+class PlanSearchDocument(Base):
+    """企划一个章节的检索文档（原文用于生成摘要片段，分词结果用于全文索引）"""
+
+    __tablename__ = "plan_search_documents"
+    __table_args__ = (
+        Index("ix_plan_search_documents_plan_id_section", "plan_id", "section", unique=True),
+        # Postgres：对分词结果建 GIN 表达式索引，检索条件使用相同的表达式
+        Index(
+            "ix_plan_search_documents_tsv",
+            sql_text("to_tsvector('simple', tokens)"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    plan_id = Column(String, ForeignKey("plans.id", ondelete="CASCADE"), nullable=False)
+    section = Column(String(50), nullable=False, comment="章节: overview, scope, milestones, tasks, risks")
+    text = Column(Text, nullable=False, comment="章节原文，每项一行")
+    tokens = Column(Text, nullable=False, comment="以空格分隔的分词结果")
+    tokenizer = Column(String(50), nullable=False, comment="分词方式，变化后重建索引")
+
+    # 关联关系
+    plan = relationship("Plan", back_populates="search_documents")
+
+    def __repr__(self):
+        return f"<PlanSearchDocument(plan_id={self.plan_id}, section={self.section})>"
+
+
+# SQLite：FTS5 外部内容表，由触发器随文档表同步
+FTS_TABLE = "plan_search_fts"
+
+for statement in (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "tokens, content='plan_search_documents', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS plan_search_documents_ai AFTER INSERT ON plan_search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, tokens) VALUES (new.id, new.tokens); END",
+    f"CREATE TRIGGER IF NOT EXISTS plan_search_documents_ad AFTER DELETE ON plan_search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, tokens) VALUES ('delete', old.id, old.tokens); END",
+    f"CREATE TRIGGER IF NOT EXISTS plan_search_documents_au AFTER UPDATE OF tokens ON plan_search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, tokens) VALUES ('delete', old.id, old.tokens); "
+    f"INSERT INTO {FTS_TABLE}(rowid, tokens) VALUES (new.id, new.tokens); END",
+):
+    event.listen(PlanSearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    PlanSearchDocument.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite")
+)
@@ -6,16 +6,18 @@ from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.soft_delete import SoftDeleteMixin
+from datetime import datetime, timezone
 import uuid
 
-class RequirementSnapshot(Base):
+class RequirementSnapshot(Base, SoftDeleteMixin):
     """需求快照模型"""
     
     __tablename__ = "requirement_snapshots"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
     
     # 基础信息
     problem_statement = Column(Text, nullable=False, comment="问题陈述")
@@ -45,6 +47,9 @@ class RequirementSnapshot(Base):
     
     # 关联关系
     plans = relationship("Plan", back_populates="requirement_snapshot", cascade="all, delete-orphan")
+    embedding = relationship(
+        "RequirementEmbedding", back_populates="snapshot", uselist=False, cascade="all, delete-orphan"
+    )
     
     def __repr__(self):
         return f"<RequirementSnapshot(id={self.id}, problem={self.problem_statement[:50]}...)>"
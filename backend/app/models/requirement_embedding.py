@@ -0,0 +1,30 @@
+"""
+需求快照向量数据模型
+"""
+
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+from datetime import datetime, timezone
+
+class RequirementEmbedding(Base):
+    """需求快照的文本向量（快照的问题陈述、目标、约束或受众变化时随之更新）"""
+    
+    __tablename__ = "requirement_embeddings"
+    
+    snapshot_id = Column(String, ForeignKey("requirement_snapshots.id", ondelete="CASCADE"), primary_key=True)
+    model = Column(String(200), nullable=False, comment="生成向量的模型")
+    dim = Column(Integer, nullable=False, comment="向量维度")
+    vector = Column(LargeBinary, nullable=False, comment="float32 向量（已归一化）")
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        index=True
+    )
+    
+    # 关联关系
+    snapshot = relationship("RequirementSnapshot", back_populates="embedding")
+    
+    def __repr__(self):
+        return f"<RequirementEmbedding(snapshot_id={self.snapshot_id}, model={self.model})>"
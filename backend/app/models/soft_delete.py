@@ -0,0 +1,33 @@
+"""
+软删除
+
+需求快照、企划和证据删除时只写入 deleted_at（连同下级对象一起，以集合 UPDATE 完成），
+由后台清理任务分批物理删除。会话中的 ORM 查询（包括关联关系的加载）自动排除已软删除的行；
+需要看到它们的查询设置执行选项 include_deleted=True。
+"""
+
+from sqlalchemy import Column, DateTime, event
+from sqlalchemy.orm import declared_attr, with_loader_criteria
+
+from app.core.database import SessionLocal
+
+
+class SoftDeleteMixin:
+    """带 deleted_at 列的模型"""
+
+    @declared_attr
+    def deleted_at(cls):
+        return Column(DateTime(timezone=True), nullable=True, index=True, comment="软删除时间，清理前对接口不可见")
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _exclude_deleted(execute_state) -> None:
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(SoftDeleteMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+        )
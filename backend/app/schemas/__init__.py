@@ -6,14 +6,18 @@ from .requirement import (
     RequirementSnapshotCreate,
     RequirementSnapshotUpdate,
     RequirementSnapshotResponse,
-    RequirementSnapshotList
+    RequirementSnapshotList,
+    RequirementSnapshotImport
 )
 
 from .plan import (
     PlanCreate,
     PlanUpdate,
     PlanResponse,
-    PlanList
+    PlanList,
+    PlanImport,
+    SimilarRequirement,
+    SimilarRequirementList
 )
 
 from .evidence import (
@@ -28,10 +32,14 @@ __all__ = [
     "RequirementSnapshotUpdate", 
     "RequirementSnapshotResponse",
     "RequirementSnapshotList",
+    "RequirementSnapshotImport",
     "PlanCreate",
     "PlanUpdate",
     "PlanResponse", 
     "PlanList",
+    "PlanImport",
+    "SimilarRequirement",
+    "SimilarRequirementList",
     "EvidenceCreate",
     "EvidenceUpdate",
     "EvidenceResponse",
@@ -0,0 +1,35 @@
+"""
+通用的Pydantic模式工具
+"""
+
+from pydantic import BaseModel, model_validator
+from sqlalchemy import inspect as sa_inspect
+from typing import Any, ClassVar, Tuple
+
+
+class ExpandableResponse(BaseModel):
+    """支持关联展开的响应模型基类
+
+    未通过 expand 预加载的关联关系不会被读取，避免序列化时逐行触发懒加载查询。
+    """
+
+    # 可展开的关联关系字段名
+    expandable_relations: ClassVar[Tuple[str, ...]] = ()
+
+    @model_validator(mode="before")
+    @classmethod
+    def _skip_unloaded_relations(cls, data: Any) -> Any:
+        if isinstance(data, dict) or not cls.expandable_relations:
+            return data
+
+        state = sa_inspect(data, raiseerr=False)
+        if state is None:
+            return data
+
+        unloaded = state.unloaded
+        return {
+            name: getattr(data, name)
+            for name in cls.model_fields
+            if not (name in cls.expandable_relations and name in unloaded)
+            and hasattr(data, name)
+        }
@@ -5,6 +5,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from app.schemas.common import ExpandableResponse
 
 class EvidenceUsageModel(BaseModel):
     """证据使用情况模型"""
@@ -20,6 +21,7 @@ class EvidenceBase(BaseModel):
     file_type: Optional[str] = Field(None, max_length=50, description="文件类型")
     file_size: Optional[int] = Field(None, description="文件大小(字节)")
     license: Optional[str] = Field(None, max_length=200, description="许可信息")
+    published_at: Optional[datetime] = Field(None, description="内容发布时间，时效性评分由此起算（缺省为入库时间）")
     usage_in_plan: Optional[List[EvidenceUsageModel]] = None
 
 class EvidenceCreate(EvidenceBase):
@@ -33,23 +35,44 @@ class EvidenceUpdate(BaseModel):
     file_type: Optional[str] = Field(None, max_length=50)
     file_size: Optional[int] = None
     license: Optional[str] = Field(None, max_length=200)
+    published_at: Optional[datetime] = None
     relevance_score: Optional[float] = Field(None, ge=0.0, le=1.0)
     authority_score: Optional[float] = Field(None, ge=0.0, le=1.0)
     timeliness_score: Optional[float] = Field(None, ge=0.0, le=1.0)
     usage_in_plan: Optional[List[EvidenceUsageModel]] = None
     status: Optional[str] = None
 
-class EvidenceResponse(EvidenceBase):
+class EvidencePlanBrief(BaseModel):
+    """证据关联企划的简要信息（expand=plan 时嵌入）"""
+    id: str
+    requirement_snapshot_id: str
+    overview: Dict[str, Any]
+    status: str = "draft"
+    completion_score: int = 0
+    scores_stale: bool = False
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class EvidenceResponse(EvidenceBase, ExpandableResponse):
     """证据文件响应模型"""
+    expandable_relations = ("plan",)
+
     id: str
     plan_id: Optional[str] = None
     file_key: Optional[str] = None
+    content_hash: Optional[str] = None
+    fetched_at: Optional[datetime] = None
     relevance_score: float = 0.0
     authority_score: float = 0.0
     timeliness_score: float = 0.0
+    timeliness_due_at: Optional[datetime] = None
     status: str = "pending"
     created_at: datetime
     updated_at: Optional[datetime] = None
+    plan: Optional[EvidencePlanBrief] = None
     
     class Config:
         from_attributes = True
@@ -69,6 +92,11 @@ class EvidenceSearchRequest(BaseModel):
     min_relevance: float = Field(default=0.5, ge=0.0, le=1.0, description="最低相关性")
     sources: Optional[List[str]] = Field(None, description="指定搜索源")
 
+class EvidenceSearchResponse(EvidenceList):
+    """证据搜索响应"""
+    sources: Dict[str, str] = Field(default_factory=dict, description="各搜索源状态: ok, timeout, error, unavailable")
+    partial: bool = Field(default=False, description="是否有搜索源超时或失败")
+
 class EvidenceQualityEvaluation(BaseModel):
     """证据质量评估"""
     evidence_id: str
@@ -5,6 +5,9 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from app.schemas.common import ExpandableResponse
+from app.schemas.evidence import EvidenceResponse
+from app.schemas.requirement import RequirementSnapshotResponse
 
 class OverviewModel(BaseModel):
     """概览信息模型"""
@@ -14,9 +17,13 @@ class OverviewModel(BaseModel):
 
 class ScopeModel(BaseModel):
     """项目范围模型"""
-    in: List[str] = Field(..., description="包含范围")
+    # "in" 是 Python 关键字，字段名加下划线并通过别名对外保持 "in"
+    in_: List[str] = Field(..., alias="in", description="包含范围")
     out: List[str] = Field(..., description="不包含范围")
 
+    class Config:
+        populate_by_name = True
+
 class MilestoneModel(BaseModel):
     """里程碑模型"""
     id: str = Field(..., description="里程碑ID")
@@ -89,21 +96,65 @@ class PlanUpdate(BaseModel):
     status: Optional[str] = None
     completion_score: Optional[int] = Field(None, ge=0, le=100)
 
-class PlanResponse(PlanBase):
+class PlanImport(PlanCreate):
+    """批量导入的企划文档（可保留原环境的ID、时间戳和状态）"""
+    id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    status: str = "draft"
+    completion_score: int = Field(default=0, ge=0, le=100)
+
+class PlanResponse(PlanBase, ExpandableResponse):
     """企划文档响应模型"""
+    expandable_relations = ("requirement_snapshot", "evidences")
+
     id: str
     requirement_snapshot_id: str
     created_at: datetime
     updated_at: Optional[datetime] = None
     status: str = "draft"
     completion_score: int = 0
+    scores_stale: bool = Field(default=False, description="证据评分已变化，完成度待重新计算")
+    requirement_snapshot: Optional[RequirementSnapshotResponse] = None
+    evidences: Optional[List[EvidenceResponse]] = None
     
     class Config:
         from_attributes = True
 
+class SimilarRequirement(BaseModel):
+    """相似的历史需求及其企划（可作为模板或少样本示例）"""
+    snapshot: RequirementSnapshotResponse
+    score: float = Field(..., description="余弦相似度")
+    plans: List[PlanResponse] = Field(default_factory=list)
+
+class SimilarRequirementList(BaseModel):
+    """相似需求检索结果"""
+    items: List[SimilarRequirement]
+    model: str = Field(..., description="向量模型")
+
 class PlanList(BaseModel):
     """企划文档列表响应"""
     items: List[PlanResponse]
     total: int
     page: int
     size: int
+
+class PlanSearchSnippet(BaseModel):
+    """命中章节的摘要片段"""
+    section: str = Field(..., description="章节: overview, scope, milestones, tasks, risks")
+    snippet: str = Field(..., description="HTML 转义后的片段，命中的词以 <mark> 标出")
+
+class PlanSearchHit(BaseModel):
+    """企划检索结果"""
+    plan_id: str
+    title: Optional[str] = None
+    status: Optional[str] = None
+    score: float = Field(..., description="相关性，越大越相关")
+    snippets: List[PlanSearchSnippet] = []
+
+class PlanSearchResponse(BaseModel):
+    """企划检索结果列表"""
+    items: List[PlanSearchHit]
+    total: int
+    page: int
+    size: int
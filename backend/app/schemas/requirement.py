@@ -52,6 +52,12 @@ class RequirementSnapshotResponse(RequirementSnapshotBase):
     class Config:
         from_attributes = True
 
+class RequirementSnapshotImport(RequirementSnapshotCreate):
+    """批量导入的需求快照（可保留原环境的ID和时间戳）"""
+    id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class RequirementSnapshotList(BaseModel):
     """需求快照列表响应"""
     items: List[RequirementSnapshotResponse]
@@ -0,0 +1,134 @@
+"""
+生产服务入口
+
+    python -m app.server [--workers N] [--host HOST] [--port PORT]
+
+由 gunicorn master 管理多个 uvicorn worker 进程，吞吐量随 CPU 核数扩展：
+
+- worker 数默认取 SERVER_WORKERS，0 表示按 CPU 核数；
+- 向 master 发送 HUP 信号（kill -HUP $(cat $SERVER_PID_FILE)）滚动重启：master 先启动加载新代码
+  的 worker，再在 SERVER_GRACEFUL_TIMEOUT 内等待旧 worker 处理完进行中的请求后退出；
+- SERVER_MAX_REQUESTS 让 worker 处理一定数量的请求后自动替换，配合抖动避免同时重启。
+
+master 不导入任何 app 模块（本入口模块除外）：读取配置和建表在一个 spawn 出的子进程中完成，
+fork 出的 worker 不继承已导入的配置、模型和数据库连接，HUP 后新 worker 重新导入全部代码，
+并重新读取 .env 中的配置。gunicorn 自身的参数（worker 数、监听地址、超时等）只在 master 启动时
+读取一次，修改后需要重启 master。
+
+多 worker 时进程内的限流令牌桶、锁和缓存不再可靠，协调后端和限流后端为 memory 时
+自动切换为 sqlite（见 app.core.coordination），不需要 Redis；日志文件不再由各 worker 按大小轮转，
+改由 logrotate 等外部工具轮转。数据库表只创建一次，避免多个 worker 同时执行 create_all。
+"""
+
+from typing import Any, Dict, Optional
+import argparse
+import multiprocessing
+import os
+
+WORKER_CLASS = "uvicorn.workers.UvicornWorker"
+
+
+def worker_count(settings, requested: Optional[int] = None) -> int:
+    workers = settings.SERVER_WORKERS if requested is None else requested
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def shared_state_environ(settings, workers: int) -> Dict[str, str]:
+    """多 worker 时改用进程间共享的协调和限流后端，并关闭进程内的日志轮转"""
+    if workers <= 1:
+        return {}
+    environ = {"LOG_FILE_ROTATE": "false"}
+    for name in ("COORDINATION_BACKEND", "RATE_LIMIT_BACKEND"):
+        if getattr(settings, name) == "memory":
+            environ[name] = "sqlite"
+    return environ
+
+
+def create_tables(settings) -> Dict[str, str]:
+    """建表，返回让 worker 启动时跳过建表的环境变量"""
+    if not settings.AUTO_CREATE_TABLES:
+        return {}
+    import app.models  # noqa: F401  确保所有模型已注册到 Base.metadata
+    from app.core.database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    return {"AUTO_CREATE_TABLES": "false"}
+
+
+def gunicorn_options(settings, workers: int, host: str, port: int) -> Dict[str, Any]:
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": WORKER_CLASS,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "timeout": max(settings.SERVER_GRACEFUL_TIMEOUT * 2, 60),
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "loglevel": settings.LOG_LEVEL.lower(),
+        # 不预加载应用：HUP 后新 worker 重新导入代码，滚动重启即可发布新版本
+        "preload_app": False,
+    }
+    if settings.SERVER_PID_FILE:
+        options["pidfile"] = settings.SERVER_PID_FILE
+    return options
+
+
+def prepare(workers: Optional[int] = None, host: Optional[str] = None, port: Optional[int] = None) -> Dict[str, Any]:
+    """读取配置并建表（在子进程中执行），返回 gunicorn 配置和传给 worker 的环境变量"""
+    from app.core.config import settings
+
+    workers = worker_count(settings, workers)
+    environ = shared_state_environ(settings, workers)
+    environ.update(create_tables(settings))
+    return {
+        "options": gunicorn_options(settings, workers, host or settings.HOST, port or settings.PORT),
+        "environ": environ,
+    }
+
+
+def prepare_in_subprocess(
+    workers: Optional[int] = None,
+    host: Optional[str] = None,
+    port: Optional[int] = None
+) -> Dict[str, Any]:
+    """在 spawn 出的子进程中执行 prepare，master 不导入配置、模型和数据库模块"""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(prepare, (workers, host, port))
+
+
+def run(workers: Optional[int] = None, host: Optional[str] = None, port: Optional[int] = None) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def __init__(self, options: Dict[str, Any]):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+
+            return app
+
+    prepared = prepare_in_subprocess(workers, host, port)
+    # worker 由 master fork，继承这些环境变量，被替换后重新导入配置时保持一致
+    os.environ.update(prepared["environ"])
+    Application(prepared["options"]).run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="以多 worker 模式运行 API 服务")
+    parser.add_argument("--workers", type=int, default=None, help="worker 进程数，0 表示按 CPU 核数")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+    run(args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
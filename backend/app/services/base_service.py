@@ -2,11 +2,19 @@
 基础服务类
 """
 
+from datetime import datetime, timezone
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
-from typing import Type, TypeVar, Generic, Optional, List, Any, Dict
-from pydantic import BaseModel
+from sqlalchemy.orm.interfaces import LoaderOption
+from typing import Type, TypeVar, Generic, Optional, List, Any, Dict, Callable, Sequence, Tuple, Iterator, AsyncIterator
+from pydantic import BaseModel, ValidationError
+from app.core.config import settings
 from app.core.database import get_redis
+from app.models.soft_delete import SoftDeleteMixin
+import asyncio
+import json
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +25,9 @@ UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """基础服务类"""
     
+    # 可通过 expand 参数展开的关联关系 -> 预加载策略
+    expandable: Dict[str, Callable[[], LoaderOption]] = {}
+    
     def __init__(self, model: Type[ModelType], db: Session):
         self.model = model
         self.db = db
@@ -25,7 +36,7 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     async def create(self, obj_in: CreateSchemaType) -> ModelType:
         """创建对象"""
         try:
-            obj_data = obj_in.dict() if hasattr(obj_in, 'dict') else obj_in
+            obj_data = obj_in.dict(by_alias=True) if hasattr(obj_in, 'dict') else obj_in
             db_obj = self.model(**obj_data)
             self.db.add(db_obj)
             self.db.commit()
@@ -37,10 +48,29 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             logger.error(f"Failed to create {self.model.__name__}: {e}")
             raise
     
-    async def get(self, id: str) -> Optional[ModelType]:
+    def build_expand_options(self, expand: Optional[str]) -> List[LoaderOption]:
+        """将逗号分隔的 expand 参数转换为预加载选项"""
+        if not expand:
+            return []
+        
+        options = []
+        for name in dict.fromkeys(part.strip() for part in expand.split(",")):
+            if not name:
+                continue
+            if name not in self.expandable:
+                raise ValueError(
+                    f"不支持展开的关联: {name}，可选值: {', '.join(self.expandable) or '无'}"
+                )
+            options.append(self.expandable[name]())
+        return options
+    
+    async def get(self, id: str, options: Sequence[LoaderOption] = ()) -> Optional[ModelType]:
         """获取单个对象"""
         try:
-            return self.db.query(self.model).filter(self.model.id == id).first()
+            query = self.db.query(self.model)
+            if options:
+                query = query.options(*options)
+            return query.filter(self.model.id == id).first()
         except Exception as e:
             logger.error(f"Failed to get {self.model.__name__} with id {id}: {e}")
             raise
@@ -52,7 +82,7 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if not db_obj:
                 return None
             
-            update_data = obj_in.dict(exclude_unset=True) if hasattr(obj_in, 'dict') else obj_in
+            update_data = obj_in.dict(exclude_unset=True, by_alias=True) if hasattr(obj_in, 'dict') else obj_in
             for field, value in update_data.items():
                 setattr(db_obj, field, value)
             
@@ -66,42 +96,62 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             raise
     
     async def delete(self, id: str) -> bool:
-        """删除对象"""
+        """
+        删除对象
+        
+        支持软删除的模型只写入 deleted_at（下级对象由 _soft_delete_children 以集合 UPDATE 一并标记），
+        立即对查询不可见，由后台清理任务分批物理删除；其余模型直接删除。
+        """
         try:
-            db_obj = await self.get(id)
-            if not db_obj:
-                return False
+            if not issubclass(self.model, SoftDeleteMixin):
+                db_obj = await self.get(id)
+                if not db_obj:
+                    return False
+                self.db.delete(db_obj)
+                self.db.commit()
+                logger.info(f"Deleted {self.model.__name__} with id: {id}")
+                return True
             
-            self.db.delete(db_obj)
+            now = datetime.now(timezone.utc)
+            table = self.model.__table__
+            result = self.db.execute(
+                update(table)
+                .where(table.c.id == id, table.c.deleted_at.is_(None))
+                .values(deleted_at=now)
+            )
+            if not result.rowcount:
+                self.db.rollback()
+                return False
+            self._soft_delete_children(id, now)
             self.db.commit()
-            logger.info(f"Deleted {self.model.__name__} with id: {id}")
+            logger.info(f"Soft-deleted {self.model.__name__} with id: {id}")
             return True
         except Exception as e:
             self.db.rollback()
             logger.error(f"Failed to delete {self.model.__name__} with id {id}: {e}")
             raise
     
+    def _soft_delete_children(self, id: str, deleted_at: datetime) -> None:
+        """软删除时标记下级对象的扩展点（与上级在同一事务中）"""
+    
     async def list(
         self, 
         page: int = 1, 
         size: int = 20, 
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        options: Sequence[LoaderOption] = ()
     ) -> Dict[str, Any]:
         """获取对象列表"""
         try:
-            query = self.db.query(self.model)
-            
-            # 应用过滤条件
-            if filters:
-                for field, value in filters.items():
-                    if hasattr(self.model, field) and value is not None:
-                        query = query.filter(getattr(self.model, field) == value)
+            query = self._apply_filters(self.db.query(self.model), filters)
             
             # 计算总数
             total = query.count()
             
-            # 分页
+            # 分页（预加载选项在计数之后再应用，关联数据按批次加载，查询次数与页大小无关）
             offset = (page - 1) * size
+            if options:
+                query = query.options(*options)
             items = query.offset(offset).limit(size).all()
             
             return {
@@ -113,3 +163,169 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         except Exception as e:
             logger.error(f"Failed to list {self.model.__name__}: {e}")
             raise
+    
+    def _apply_filters(self, query, filters: Optional[Dict[str, Any]]):
+        """应用等值过滤条件"""
+        if filters:
+            for field, value in filters.items():
+                if hasattr(self.model, field) and value is not None:
+                    query = query.filter(getattr(self.model, field) == value)
+        return query
+    
+    def _version_columns(self):
+        return self.model.id, self.model.updated_at, self.model.created_at
+    
+    async def get_version(self, id: str) -> Optional[Tuple[Any, ...]]:
+        """只查询 (id, updated_at, created_at)，用于计算 ETag 而不加载整行"""
+        try:
+            return self.db.query(*self._version_columns()).filter(self.model.id == id).first()
+        except Exception as e:
+            logger.error(f"Failed to get version of {self.model.__name__} with id {id}: {e}")
+            raise
+    
+    async def list_versions(
+        self,
+        page: int = 1,
+        size: int = 20,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Tuple[int, List[Tuple[Any, ...]]]:
+        """与 list 相同的过滤和分页，只返回总数和各行的版本信息"""
+        try:
+            query = self._apply_filters(self.db.query(self.model), filters)
+            total = query.count()
+            versions = (
+                query.with_entities(*self._version_columns())
+                .offset((page - 1) * size)
+                .limit(size)
+                .all()
+            )
+            return total, versions
+        except Exception as e:
+            logger.error(f"Failed to list versions of {self.model.__name__}: {e}")
+            raise
+    
+    def iter_all(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None
+    ) -> Iterator[ModelType]:
+        """按服务端游标逐批读取全部匹配行，内存占用与结果总量无关"""
+        batch_size = batch_size or settings.BULK_BATCH_SIZE
+        query = (
+            self._apply_filters(self.db.query(self.model), filters)
+            .order_by(self.model.created_at, self.model.id)
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
+        # 会话的标识映射只持有弱引用，已输出的行随后即可被回收
+        yield from query
+    
+    async def import_ndjson(
+        self,
+        stream: AsyncIterator[bytes],
+        schema: Type[BaseModel],
+        on_conflict: str = "skip",
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        从 NDJSON 字节流批量导入
+        
+        逐行解析并校验，每积累 batch_size 行批量插入一次；插入完成前不再读取请求体，
+        上游按 TCP 流控自然减速。on_conflict 为 skip 时跳过已存在的 id，为 fail 时记为错误行。
+        """
+        batch_size = batch_size or settings.BULK_BATCH_SIZE
+        result = {"imported": 0, "skipped": 0, "failed": 0, "errors": []}
+        batch: List[Tuple[int, Dict[str, Any]]] = []
+        
+        def fail(line_no: int, message: str) -> None:
+            result["failed"] += 1
+            if len(result["errors"]) < settings.BULK_MAX_ERRORS:
+                result["errors"].append({"line": line_no, "error": message})
+        
+        async def flush() -> None:
+            imported, conflicts = await asyncio.to_thread(self._insert_batch, batch)
+            result["imported"] += imported
+            for line_no in conflicts:
+                if on_conflict == "skip":
+                    result["skipped"] += 1
+                else:
+                    fail(line_no, "id 已存在")
+            batch.clear()
+        
+        line_no = 0
+        async for line in _iter_lines(stream):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                row = schema.model_validate(json.loads(line)).model_dump(by_alias=True)
+            except (ValueError, ValidationError) as e:
+                fail(line_no, str(e))
+                continue
+            batch.append((line_no, row))
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+        
+        logger.info(
+            f"Imported {result['imported']} {self.model.__name__} rows "
+            f"(skipped {result['skipped']}, failed {result['failed']})"
+        )
+        return result
+    
+    def _insert_batch(self, batch: Sequence[Tuple[int, Dict[str, Any]]]) -> Tuple[int, List[int]]:
+        """批量插入一批行，返回 (插入行数, 因 id 已存在而未插入的行号)"""
+        now = datetime.now(timezone.utc)
+        rows = []
+        for line_no, row in batch:
+            # 所有行使用相同的键集合，才能以 executemany 一次插入
+            row["id"] = row.get("id") or str(uuid.uuid4())
+            row["created_at"] = row.get("created_at") or now
+            rows.append((line_no, row))
+        
+        seen = set()
+        ids = [row["id"] for _, row in rows]
+        existing = {
+            # 已软删除但尚未清理的行同样占用 id
+            id for (id,) in self.db.query(self.model.id).filter(self.model.id.in_(ids))
+            .execution_options(include_deleted=True)
+        }
+        conflicts = []
+        values = []
+        for line_no, row in rows:
+            if row["id"] in existing or row["id"] in seen:
+                conflicts.append(line_no)
+                continue
+            seen.add(row["id"])
+            values.append(row)
+        
+        try:
+            if values:
+                self.db.execute(insert(self.model.__table__), values)
+                self._after_bulk_insert(values)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to bulk insert {self.model.__name__}: {e}")
+            raise
+        return len(values), conflicts
+
+    
+    def _after_bulk_insert(self, rows: List[Dict[str, Any]]) -> None:
+        """批量插入后、提交前的扩展点，用于写入派生数据（Core 插入不会触发 ORM 事件）"""
+
+
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """将任意切分的字节流重新切分为行"""
+    pending = b""
+    async for chunk in stream:
+        if not chunk:
+            continue
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
@@ -0,0 +1,413 @@
+"""
+证据片段存储
+
+提取出的证据正文按 token 上限切分为片段，供检索、引用上下文和提示词打包使用。片段不存入
+数据库的 Text 列，而是追加写入数据文件，以 mmap 按偏移量切片读取，取一个企划的上千个片段
+不经过 ORM：
+
+- chunks-{代}.dat：片段的 UTF-8 文本，只追加；
+- chunks-{代}.idx：每个片段一条 32 字节的定长记录（偏移量、长度、证据序号、片段序号、页码、
+  页内起止位置），加载后存放在 array 定长数组中，不为每个片段创建对象；
+- evidence_ids.txt：证据ID表，行号即记录中的证据序号；
+- CURRENT：当前代号。
+
+重新写入一条证据的片段时追加新记录（片段序号从 0 开始），原有记录成为垃圾；删除时追加墓碑记录。
+垃圾占比超过 CHUNK_STORE_COMPACT_RATIO 时，由持有刷新租约的 worker 把有效片段压缩为新的一代，
+再原子地替换 CURRENT。
+
+写入在文件锁内进行，同机的多个 worker 共享一份存储；读取前检查代号和文件长度，只增量加载
+其他进程追加的记录。
+"""
+
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 下只有进程内的锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+tiktoken = lazy_import("tiktoken")
+
+# 偏移量, 长度, 证据序号, 片段序号, 页码, 起始位置, 结束位置
+RECORD = struct.Struct("<QIIIIII")
+# 片段序号为该值的记录表示删除
+TOMBSTONE = 0xFFFFFFFF
+
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;.])\s*")
+_LINE = re.compile(r"[^\n]+")
+
+
+class TokenCounter:
+    """token 计数，tiktoken 不可用时使用估算"""
+
+    def __init__(self, encoding: str):
+        self.encoding_name = encoding
+        self._encoding = None
+        self._unavailable = False
+
+    def _load(self):
+        if self._encoding is None and not self._unavailable:
+            try:
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                # 未安装或无法下载编码文件
+                logger.info(f"tiktoken unavailable, estimating token counts: {e}")
+                self._unavailable = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._load()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        cjk = sum(1 for char in text if "\u3000" <= char <= "\u9fff" or "\uff00" <= char <= "\uffef")
+        return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+token_counter = TokenCounter(settings.CONTEXT_TOKEN_ENCODING)
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def split_spans(text: str, max_tokens: int) -> List[Tuple[int, int]]:
+    """
+    切分为不超过 max_tokens 的片段，返回各片段在原文中的 (起始, 结束) 位置
+
+    按行（段落）切分，过长的段落再按句子切分，单句仍超长时按字符截断；相邻的短片段合并到上限内。
+    """
+    pieces: List[Tuple[int, int]] = []
+    for line in _LINE.finditer(text):
+        start, end = _strip_span(text, line.start(), line.end())
+        if start == end:
+            continue
+        if token_counter.count(text[start:end]) <= max_tokens:
+            pieces.append((start, end))
+            continue
+        sentence_start = start
+        for boundary in _SENTENCE_END.finditer(text, start, end):
+            if boundary.start() <= sentence_start:
+                continue
+            pieces.extend(_cut(text, sentence_start, boundary.start(), max_tokens))
+            sentence_start = boundary.end()
+        if sentence_start < end:
+            pieces.extend(_cut(text, sentence_start, end, max_tokens))
+
+    spans: List[Tuple[int, int]] = []
+    for start, end in pieces:
+        if spans and token_counter.count(text[spans[-1][0]:end]) <= max_tokens:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def _cut(text: str, start: int, end: int, max_tokens: int) -> Iterator[Tuple[int, int]]:
+    start, end = _strip_span(text, start, end)
+    while start < end:
+        tokens = token_counter.count(text[start:end])
+        if tokens <= max_tokens:
+            yield start, end
+            return
+        # 估算下汉字约一个 token，按 token 上限截取不会超出太多
+        cut = start + max(1, (end - start) * max_tokens // tokens)
+        piece = _strip_span(text, start, cut)
+        if piece[0] < piece[1]:
+            yield piece
+        start, _ = _strip_span(text, cut, end)
+
+
+def split_chunks(text: str, max_tokens: int) -> List[str]:
+    """切分为不超过 max_tokens 的片段文本"""
+    return [text[start:end] for start, end in split_spans(text, max_tokens)]
+
+
+class Chunk(NamedTuple):
+    evidence_id: str
+    seq: int
+    page: int
+    start: int
+    end: int
+    text: str
+
+
+class ChunkStore:
+    """追加写入、mmap 读取的片段存储"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._owners: Dict[str, int] = {}
+        self._ids_size = 0
+        self._generation: Optional[int] = None
+        self._reset_index()
+
+    def _reset_index(self) -> None:
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._pages = array("I")
+        self._starts = array("I")
+        self._ends = array("I")
+        # 证据序号 -> 有效片段的 (首条记录位置, 数量)
+        self._ranges: Dict[int, Tuple[int, int]] = {}
+        self._index_size = 0
+        self._garbage = 0
+        self._mmap: Optional[mmap.mmap] = None
+
+    def _data_path(self, generation: int) -> Path:
+        return self.root / f"chunks-{generation}.dat"
+
+    def _index_path(self, generation: int) -> Path:
+        return self.root / f"chunks-{generation}.idx"
+
+    @property
+    def _ids_path(self) -> Path:
+        return self.root / "evidence_ids.txt"
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / "LOCK", "a+b") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            yield
+
+    def _current_generation(self) -> int:
+        try:
+            return int((self.root / "CURRENT").read_text().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _refresh(self) -> None:
+        """增量加载其他进程追加的证据ID和片段记录，代号变化时重新加载"""
+        generation = self._current_generation()
+        if generation != self._generation:
+            self._generation = generation
+            self._reset_index()
+        self._load_ids()
+        self._load_index()
+
+    def _read_tail(self, path: Path, position: int) -> bytes:
+        try:
+            if path.stat().st_size <= position:
+                return b""
+            with open(path, "rb") as handle:
+                handle.seek(position)
+                return handle.read()
+        except FileNotFoundError:
+            return b""
+
+    def _load_ids(self) -> None:
+        data = self._read_tail(self._ids_path, self._ids_size)
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].decode("utf-8").splitlines():
+            self._owners[line] = len(self._ids)
+            self._ids.append(line)
+        self._ids_size += complete
+
+    def _load_index(self) -> None:
+        data = self._read_tail(self._index_path(self._generation), self._index_size)
+        usable = len(data) - len(data) % RECORD.size
+        for offset, length, owner, seq, page, start, end in RECORD.iter_unpack(data[:usable]):
+            position = len(self._offsets)
+            self._offsets.append(offset)
+            self._lengths.append(length)
+            self._pages.append(page)
+            self._starts.append(start)
+            self._ends.append(end)
+            current = self._ranges.get(owner)
+            if seq == 0 or seq == TOMBSTONE:
+                if current is not None:
+                    self._garbage += current[1]
+                if seq == 0:
+                    self._ranges[owner] = (position, 1)
+                else:
+                    self._ranges.pop(owner, None)
+                    self._garbage += 1
+            elif current is not None and current[0] + current[1] == position:
+                self._ranges[owner] = (current[0], current[1] + 1)
+            else:
+                self._garbage += 1
+        self._index_size += usable
+
+    def _view(self, position: int) -> memoryview:
+        offset = self._offsets[position]
+        end = offset + self._lengths[position]
+        if end == offset:
+            return memoryview(b"")
+        if self._mmap is None or end > len(self._mmap):
+            # 数据文件变长后重新映射；旧的映射由仍在使用的切片持有，不主动关闭
+            with open(self._data_path(self._generation), "rb") as handle:
+                self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)[offset:end]
+
+    def _chunk(self, evidence_id: str, seq: int, position: int) -> Chunk:
+        return Chunk(
+            evidence_id,
+            seq,
+            self._pages[position],
+            self._starts[position],
+            self._ends[position],
+            str(self._view(position), "utf-8")
+        )
+
+    def _owner(self, evidence_id: str) -> int:
+        owner = self._owners.get(evidence_id)
+        if owner is None:
+            if self._ids_path.exists() and self._ids_path.stat().st_size > self._ids_size:
+                # 上次写入中断留下的半行（已在文件锁内加载过全部完整的行）
+                os.truncate(self._ids_path, self._ids_size)
+            with open(self._ids_path, "ab") as handle:
+                handle.write(f"{evidence_id}\n".encode("utf-8"))
+            self._load_ids()
+            owner = self._owners[evidence_id]
+        return owner
+
+    def _append(self, records: bytes, payload: bytes = b"") -> None:
+        """在文件锁内追加文本和索引记录：先写文本再写索引，读取方只会看到文本已就绪的记录"""
+        index_path = self._index_path(self._generation)
+        if index_path.exists() and index_path.stat().st_size % RECORD.size:
+            # 上次写入中断留下的半条记录
+            os.truncate(index_path, index_path.stat().st_size // RECORD.size * RECORD.size)
+        if payload:
+            with open(self._data_path(self._generation), "ab") as handle:
+                handle.write(payload)
+        with open(index_path, "ab") as handle:
+            handle.write(records)
+        self._load_index()
+
+    def write(self, evidence_id: str, chunks: Iterable[Tuple[str, int, int, int]]) -> int:
+        """写入证据的全部片段 (文本, 页码, 起始, 结束)，取代原有片段；没有片段时等同于删除"""
+        with self._lock, self._file_lock():
+            self._refresh()
+            owner = self._owner(evidence_id)
+            data_path = self._data_path(self._generation)
+            offset = data_path.stat().st_size if data_path.exists() else 0
+            payload = bytearray()
+            records = bytearray()
+            count = 0
+            for text, page, start, end in chunks:
+                encoded = text.encode("utf-8")
+                records += RECORD.pack(offset + len(payload), len(encoded), owner, count, page, start, end)
+                payload += encoded
+                count += 1
+            if not count:
+                records += RECORD.pack(0, 0, owner, TOMBSTONE, 0, 0, 0)
+            self._append(records, payload)
+            return count
+
+    def delete(self, evidence_id: str) -> None:
+        self.delete_many([evidence_id])
+
+    def delete_many(self, evidence_ids: Iterable[str]) -> int:
+        """删除多条证据的片段（一次追加全部墓碑记录），返回实际有片段的证据数"""
+        evidence_ids = list(evidence_ids)
+        with self._lock:
+            self._refresh()
+            if not any(self._owners.get(id) in self._ranges for id in evidence_ids):
+                return 0
+            with self._file_lock():
+                self._refresh()
+                owners = [self._owners[id] for id in evidence_ids if self._owners.get(id) in self._ranges]
+                if owners:
+                    self._append(b"".join(RECORD.pack(0, 0, owner, TOMBSTONE, 0, 0, 0) for owner in owners))
+                return len(owners)
+
+    def count(self, evidence_id: str) -> int:
+        with self._lock:
+            self._refresh()
+            span = self._ranges.get(self._owners.get(evidence_id, -1))
+            return span[1] if span else 0
+
+    def chunks(self, evidence_id: str) -> List[Chunk]:
+        return list(self.fetch([evidence_id]))
+
+    def fetch(self, evidence_ids: Iterable[str]) -> Iterator[Chunk]:
+        """按证据顺序返回片段；片段元数据直接取自数组，文本从映射中切片解码"""
+        with self._lock:
+            self._refresh()
+            found = []
+            for evidence_id in evidence_ids:
+                span = self._ranges.get(self._owners.get(evidence_id, -1))
+                if span is not None:
+                    found.append((evidence_id, span))
+            chunks = [
+                self._chunk(evidence_id, seq, first + seq)
+                for evidence_id, (first, count) in found
+                for seq in range(count)
+            ]
+        return iter(chunks)
+
+    def view(self, evidence_id: str, seq: int) -> Optional[memoryview]:
+        """片段的 UTF-8 字节视图（不复制）"""
+        with self._lock:
+            self._refresh()
+            span = self._ranges.get(self._owners.get(evidence_id, -1))
+            if span is None or not 0 <= seq < span[1]:
+                return None
+            return self._view(span[0] + seq)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._refresh()
+            return {
+                "generation": self._generation,
+                "evidences": len(self._ranges),
+                "chunks": sum(count for _, count in self._ranges.values()),
+                "records": len(self._offsets),
+                "garbage": self._garbage,
+                "data_bytes": sum(self._lengths[first + i] for first, count in self._ranges.values() for i in range(count)),
+            }
+
+    def compact(self, min_garbage_ratio: float = 0.0) -> bool:
+        """垃圾占比达到 min_garbage_ratio 时把有效片段写入新的一代，返回是否进行了压缩"""
+        with self._lock, self._file_lock():
+            self._refresh()
+            records = len(self._offsets)
+            if not records or not self._garbage or self._garbage / records < min_garbage_ratio:
+                return False
+            generation = self._generation + 1
+            offset = 0
+            with open(self._data_path(generation), "wb") as data_file, open(self._index_path(generation), "wb") as index_file:
+                for owner, (first, count) in sorted(self._ranges.items()):
+                    for seq in range(count):
+                        position = first + seq
+                        view = self._view(position)
+                        data_file.write(view)
+                        index_file.write(RECORD.pack(
+                            offset, len(view), owner, seq,
+                            self._pages[position], self._starts[position], self._ends[position]
+                        ))
+                        offset += len(view)
+            current = self.root / "CURRENT.tmp"
+            current.write_text(str(generation))
+            os.replace(current, self.root / "CURRENT")
+            # 上一代可能仍有其他进程在读取，到下次压缩时再删除
+            for path in (self._data_path(self._generation - 1), self._index_path(self._generation - 1)):
+                path.unlink(missing_ok=True)
+            logger.info(f"Compacted chunk store: {self._garbage}/{records} garbage records dropped")
+            self._refresh()
+            return True
+
+
+chunk_store = ChunkStore(settings.CHUNK_STORE_DIR)
@@ -0,0 +1,253 @@
+"""
+证据上下文打包
+
+生成企划章节时，需要把相关证据装进有限的 LLM 上下文。按相关性取前 N 条会在内容重复的
+来源上浪费 token，这里按章节的 token 预算挑选证据片段：
+
+1. 证据正文在提取时已切分为不超过 CONTEXT_CHUNK_TOKENS 的片段存入片段存储（未提取正文的证据
+   切分标题和摘要），片段的向量按证据内容缓存；
+2. 片段与章节查询（章节主题、企划标题、需求陈述和目标）的相似度乘以证据质量分，质量分为
+   相关性、权威度、时效性三项评分的加权和；
+3. 以最大边际相关（MMR）贪心选择：每一步选出 λ·质量相似度 − (1−λ)·与已选片段的最大相似度
+   最高且放得进剩余预算的片段。与查询无关的片段和近似重复（相似度达到 CONTEXT_DUPLICATE_THRESHOLD）
+   的片段直接排除，不用冗余内容填满预算。安装了 numpy 时每一步是一次矩阵向量乘法；
+4. 打包结果按 (企划, 章节, 预算, 证据版本) 缓存，证据或企划更新后自动失效。
+
+token 数优先用 tiktoken 计算，未安装或编码文件不可用时按汉字一个 token、其他字符约四个一个 token 估算。
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+import hashlib
+import logging
+import operator
+import threading
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.models.evidence import Evidence
+from app.models.plan import Plan
+from app.services.chunk_store import chunk_store, split_spans, token_counter
+from app.services.similarity import embedder, requirement_text
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - 可选依赖
+    numpy = None
+
+CACHE_NAME = "evidence_context"
+
+# 章节 -> 章节主题（与企划标题、需求一起组成查询）
+SECTION_TOPICS = {
+    "overview": "概览 背景 目标 现状",
+    "scope": "范围 边界 交付物",
+    "milestones": "里程碑 时间 进度 排期",
+    "tasks": "任务 工作分解 执行",
+    "raci": "职责 分工 角色 负责人",
+    "risks": "风险 合规 应对措施",
+    "budget": "预算 成本 费用 报价",
+}
+
+class _LRU:
+    """线程安全的 LRU 字典"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# (证据ID, 内容版本, 向量模型) -> [(片段文本, token 数, 向量, 页码, 起始, 结束)]
+_chunk_cache = _LRU(settings.CONTEXT_CHUNK_CACHE_SIZE)
+# (企划ID, 章节, 预算, 版本指纹) -> 打包结果
+context_cache = _LRU(settings.CONTEXT_CACHE_SIZE)
+
+ChunkEntry = Tuple[str, int, List[float], int, int, int]
+
+
+def evidence_chunks(evidence: Evidence) -> List[ChunkEntry]:
+    """证据的片段及其向量；片段存储中没有正文片段时切分标题和摘要（页码为 0）"""
+    version = evidence.content_hash or hashlib.sha1(
+        f"{evidence.title}\n{evidence.summary or ''}".encode("utf-8")
+    ).hexdigest()
+    key = (evidence.id, version, embedder.name)
+    entries = _chunk_cache.get(key)
+    if entries is None:
+        chunks = [(chunk.text, chunk.page, chunk.start, chunk.end) for chunk in chunk_store.chunks(evidence.id)]
+        if not chunks:
+            text = "\n".join(part for part in (evidence.title, evidence.summary) if part)
+            chunks = [(text[start:end], 0, start, end) for start, end in split_spans(text, settings.CONTEXT_CHUNK_TOKENS)]
+        entries = [
+            (text, token_counter.count(text), embedder.embed(text), page, start, end)
+            for text, page, start, end in chunks
+        ]
+        _chunk_cache.set(key, entries)
+    return entries
+
+
+def quality_score(evidence: Evidence) -> float:
+    """三项评分的加权和；未评分的证据按 0.25 的下限参与"""
+    weights = settings.CONTEXT_QUALITY_WEIGHTS
+    total = sum(weights.values()) or 1.0
+    weighted = sum(
+        weight * (getattr(evidence, f"{name}_score") or 0.0) for name, weight in weights.items()
+    ) / total
+    return 0.25 + 0.75 * min(max(weighted, 0.0), 1.0)
+
+
+def mmr_select(
+    vectors: Sequence[Sequence[float]],
+    query: Sequence[float],
+    qualities: Sequence[float],
+    tokens: Sequence[int],
+    budget: int,
+    mmr_lambda: float,
+    duplicate_threshold: float = 1.0
+) -> Tuple[List[int], List[float]]:
+    """
+    在 token 预算内按 MMR 贪心选择
+
+    与查询无关（相似度不为正）的片段和与已选片段的相似度达到 duplicate_threshold 的片段不参与选择。
+    返回 (所选下标（按选择顺序）, 各片段的质量加权相似度)。
+    """
+    n = len(vectors)
+    if numpy is not None and n:
+        matrix = numpy.asarray(vectors, dtype=numpy.float32)
+        gain = (matrix @ numpy.asarray(query, dtype=numpy.float32)) * numpy.asarray(qualities, dtype=numpy.float32)
+        cost = numpy.asarray(tokens)
+        redundancy = numpy.zeros(n, dtype=numpy.float32)
+        available = (cost <= budget) & (gain > 0)
+        selected = []
+        remaining = budget
+        while available.any():
+            scores = numpy.where(available, mmr_lambda * gain - (1.0 - mmr_lambda) * redundancy, -numpy.inf)
+            best = int(scores.argmax())
+            selected.append(best)
+            remaining -= int(cost[best])
+            available[best] = False
+            available &= cost <= remaining
+            numpy.maximum(redundancy, matrix @ matrix[best], out=redundancy)
+            available &= redundancy < duplicate_threshold
+        return selected, gain.tolist()
+
+    gains = [quality * sum(map(operator.mul, query, vector)) for vector, quality in zip(vectors, qualities)]
+    redundancy = [0.0] * n
+    available = [cost <= budget and gain > 0 for cost, gain in zip(tokens, gains)]
+    selected = []
+    remaining = budget
+    while any(available):
+        best = max(
+            (i for i in range(n) if available[i]),
+            key=lambda i: mmr_lambda * gains[i] - (1.0 - mmr_lambda) * redundancy[i]
+        )
+        selected.append(best)
+        remaining -= tokens[best]
+        available[best] = False
+        for i in range(n):
+            if available[i]:
+                if tokens[i] > remaining:
+                    available[i] = False
+                else:
+                    redundancy[i] = max(redundancy[i], sum(map(operator.mul, vectors[i], vectors[best])))
+                    available[i] = redundancy[i] < duplicate_threshold
+    return selected, gains
+
+
+def section_query(plan: Plan, section: str) -> str:
+    overview = plan.overview or {}
+    parts = [SECTION_TOPICS[section], overview.get("title") or "", overview.get("summary") or ""]
+    if plan.requirement_snapshot is not None:
+        snapshot = plan.requirement_snapshot
+        parts.append(requirement_text({"problem_statement": snapshot.problem_statement, "objectives": snapshot.objectives}))
+    return "\n".join(part for part in parts if part)
+
+
+def _fingerprint(plan: Plan, evidences: Sequence[Evidence]) -> str:
+    digest = hashlib.sha1(f"{plan.updated_at}".encode("utf-8"))
+    for evidence in evidences:
+        digest.update(f"|{evidence.id}:{evidence.updated_at}:{evidence.content_hash}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def pack_context(db: Session, plan: Plan, section: str, budget: int) -> Dict[str, Any]:
+    """为企划章节打包证据上下文"""
+    evidences = (
+        db.query(Evidence)
+        .filter(Evidence.plan_id == plan.id, Evidence.status != "failed")
+        .order_by(Evidence.id)
+        .all()
+    )
+    key = (plan.id, section, budget, _fingerprint(plan, evidences))
+    cached = context_cache.get(key)
+    record_cache(CACHE_NAME, cached is not None)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    candidates: List[Tuple[Evidence, ChunkEntry]] = []
+    qualities: List[float] = []
+    for evidence in evidences:
+        quality = quality_score(evidence)
+        for entry in evidence_chunks(evidence):
+            candidates.append((evidence, entry))
+            qualities.append(quality)
+
+    selected, gains = mmr_select(
+        [entry[2] for _, entry in candidates],
+        embedder.embed(section_query(plan, section)),
+        qualities,
+        [entry[1] for _, entry in candidates],
+        budget,
+        settings.CONTEXT_MMR_LAMBDA,
+        settings.CONTEXT_DUPLICATE_THRESHOLD
+    )
+    chunks = []
+    for i in selected:
+        evidence, (text, tokens, _, page, start, end) = candidates[i]
+        chunks.append({
+            "evidence_id": evidence.id,
+            "title": evidence.title,
+            "url": evidence.url,
+            "text": text,
+            "tokens": tokens,
+            # 引用位置：页码（0 表示取自标题和摘要）和页内字符区间
+            "page": page,
+            "span": [start, end],
+            "score": round(gains[i], 4),
+        })
+    result = {
+        "plan_id": plan.id,
+        "section": section,
+        "budget": budget,
+        "tokens": sum(chunk["tokens"] for chunk in chunks),
+        "candidates": len(candidates),
+        "chunks": chunks,
+    }
+    context_cache.set(key, result)
+    return {**result, "cached": False}
@@ -0,0 +1,406 @@
+"""
+证据文件抓取与条件刷新
+
+每条证据记录上次抓取时的校验信息（ETag、Last-Modified、内容 SHA-256）。刷新时发送
+If-None-Match / If-Modified-Since 条件请求：
+
+- 304：内容未变化，只更新抓取时间；
+- 200 但内容哈希与上次相同（源站不支持条件请求）：丢弃下载内容，不重新处理；
+- 内容确有变化：按内容哈希存储文件，并重新执行注册的内容处理（文本提取、索引等）。
+
+刷新调度器周期性地挑选到期的证据。时效性评分越高的证据（新闻、统计数据等）
+刷新周期越短：抓取时间或时效性评分变化时计算下次刷新时间 refresh_due_at（已建索引），
+调度器按 refresh_due_at 从早到晚只读取一批到期的行，从未抓取过的证据最优先。
+
+多 worker 部署时，每轮刷新由持有 evidence_refresh 租约的 worker 执行（随后压缩片段存储），
+同一条证据的抓取也通过租约保证同一时刻只有一个 worker 在进行。
+"""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import uuid
+
+import httpx
+from sqlalchemy import event, inspect as sa_inspect, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.coordination import coordinator
+from app.core.database import SessionLocal
+from app.core.lazy import lazy_import
+from app.core.metrics import registry
+from app.models.evidence import Evidence
+from app.services.chunk_store import chunk_store, split_spans
+
+logger = logging.getLogger(__name__)
+
+bs4 = lazy_import("bs4")
+PyPDF2 = lazy_import("PyPDF2")
+
+evidence_refresh_total = registry.counter(
+    "evidence_refresh_total", "Evidence fetch outcomes", ("result",)
+)
+
+# 抓取结果
+CHANGED = "changed"
+NOT_MODIFIED = "not_modified"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+MISSING = "missing"
+BUSY = "busy"  # 其他 worker 正在抓取同一条证据
+
+# 内容变化后执行的处理函数: (会话, 证据, 文件路径) -> None
+ContentProcessor = Callable[[Session, Evidence, Path], None]
+CONTENT_PROCESSORS: List[ContentProcessor] = []
+
+
+def register_content_processor(func: ContentProcessor) -> ContentProcessor:
+    """注册内容变化后需要重新执行的处理（可作装饰器使用）"""
+    CONTENT_PROCESSORS.append(func)
+    return func
+
+
+def storage_root() -> Path:
+    return Path(settings.UPLOAD_DIR)
+
+
+def blob_key(digest: str) -> str:
+    """按内容哈希寻址的存储键，相同内容只保存一份"""
+    return f"evidence/{digest[:2]}/{digest}"
+
+
+def text_path(digest: str) -> Path:
+    return storage_root() / "text" / digest[:2] / f"{digest}.txt"
+
+
+# 保存的正文中 PDF 各页之间的分隔符
+PAGE_BREAK = "\f"
+
+
+def refresh_period(timeliness_score: Optional[float]) -> float:
+    """证据的刷新周期（秒）：时效性评分为 1 时缩短到 EVIDENCE_REFRESH_MAX_AGE 的四分之一"""
+    return settings.EVIDENCE_REFRESH_MAX_AGE * (1.0 - 0.75 * min(max(timeliness_score or 0.0, 0.0), 1.0))
+
+
+def refresh_due_at(fetched_at: Optional[datetime], timeliness_score: Optional[float]) -> Optional[datetime]:
+    """下次刷新时间，从未抓取过时为空（最先刷新）"""
+    if fetched_at is None:
+        return None
+    if fetched_at.tzinfo is None:
+        fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+    return fetched_at + timedelta(seconds=refresh_period(timeliness_score))
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _schedule_refresh_on_flush(session, flush_context, instances) -> None:
+    """抓取时间或时效性评分变化时重新计算下次刷新时间"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Evidence):
+            continue
+        attrs = sa_inspect(obj).attrs
+        if attrs.fetched_at.history.has_changes() or attrs.timeliness_score.history.has_changes():
+            obj.refresh_due_at = refresh_due_at(obj.fetched_at, obj.timeliness_score)
+
+
+def extract_text(path: Path, file_type: Optional[str]) -> str:
+    """提取文件的纯文本，PDF 各页以 PAGE_BREAK 分隔，不支持的类型返回空字符串"""
+    if file_type == ".pdf":
+        try:
+            reader = PyPDF2.PdfReader(str(path))
+        except ImportError:
+            logger.warning("PyPDF2 not installed, skipping PDF text extraction")
+            return ""
+        return PAGE_BREAK.join(page.extract_text() or "" for page in reader.pages)
+
+    raw = path.read_bytes().decode("utf-8", errors="replace")
+    if file_type in (".html", ".htm"):
+        try:
+            return bs4.BeautifulSoup(raw, "html.parser").get_text("\n", strip=True)
+        except ImportError:
+            return re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", raw)).strip()
+    if file_type in (".txt", ".md", ".json", ".csv", ".xml"):
+        return raw
+    return ""
+
+
+def page_chunks(text: str, max_tokens: int) -> List[Tuple[str, int, int, int]]:
+    """按页切分正文，返回 (片段文本, 页码, 页内起始, 页内结束)，页码从 1 开始"""
+    return [
+        (page[start:end], number, start, end)
+        for number, page in enumerate(text.split(PAGE_BREAK), 1)
+        for start, end in split_spans(page, max_tokens)
+    ]
+
+
+@register_content_processor
+def extract_evidence_text(db: Session, evidence: Evidence, path: Path) -> None:
+    """提取文本并按内容哈希保存，切分后写入片段存储，摘要为空时用正文开头补全"""
+    target = text_path(evidence.content_hash)
+    if target.exists():
+        text = target.read_text(encoding="utf-8")
+    else:
+        text = extract_text(path, evidence.file_type)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(text, encoding="utf-8")
+    chunk_store.write(evidence.id, page_chunks(text, settings.CONTEXT_CHUNK_TOKENS))
+    if text and not evidence.summary:
+        evidence.summary = text.replace(PAGE_BREAK, "\n")[:500]
+
+
+class EvidenceFetcher:
+    """按条件请求抓取证据文件"""
+
+    def __init__(self, timeout: Optional[float] = None, max_size: Optional[int] = None):
+        self.timeout = settings.EVIDENCE_FETCH_TIMEOUT if timeout is None else timeout
+        self.max_size = settings.MAX_FILE_SIZE if max_size is None else max_size
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=settings.EVIDENCE_REFRESH_CONCURRENCY * 2),
+                follow_redirects=True
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def refresh(self, evidence_id: str) -> str:
+        """抓取单条证据，返回抓取结果"""
+        async with coordinator.lease(f"evidence_fetch:{evidence_id}", ttl=self.timeout * 2) as acquired:
+            if not acquired:
+                return BUSY
+            return await self._refresh_locked(evidence_id)
+
+    async def _refresh_locked(self, evidence_id: str) -> str:
+        db = SessionLocal()
+        try:
+            evidence = db.get(Evidence, evidence_id)
+            if evidence is None:
+                return MISSING
+            result = await self._refresh(db, evidence)
+        except Exception:
+            db.rollback()
+            evidence_refresh_total.inc(result=FAILED)
+            raise
+        finally:
+            db.close()
+        evidence_refresh_total.inc(result=result)
+        return result
+
+    async def _refresh(self, db: Session, evidence: Evidence) -> str:
+        headers = {}
+        if evidence.etag:
+            headers["If-None-Match"] = evidence.etag
+        if evidence.last_modified:
+            headers["If-Modified-Since"] = evidence.last_modified
+
+        fetched_at = datetime.now(timezone.utc)
+        try:
+            async with self.client.stream("GET", evidence.url, headers=headers) as response:
+                if response.status_code == 304:
+                    evidence.fetched_at = fetched_at
+                    db.commit()
+                    return NOT_MODIFIED
+                response.raise_for_status()
+                digest, size, temp_path = await self._download(response)
+                validators = response.headers.get("etag"), response.headers.get("last-modified")
+                content_type = response.headers.get("content-type", "")
+        except Exception as e:
+            logger.warning(f"Failed to fetch evidence {evidence.id} from {evidence.url}: {e}")
+            evidence.fetched_at = fetched_at
+            if evidence.status == "pending":
+                evidence.status = "failed"
+            db.commit()
+            return FAILED
+
+        evidence.etag, evidence.last_modified = validators
+        evidence.fetched_at = fetched_at
+        target = storage_root() / blob_key(digest)
+        if digest == evidence.content_hash and target.exists():
+            # 源站忽略了条件请求，但内容没有变化
+            temp_path.unlink(missing_ok=True)
+            db.commit()
+            return UNCHANGED
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, target)
+        previous_hash = evidence.content_hash
+        evidence.content_hash = digest
+        published_at = _http_date(validators[1])
+        if published_at is not None:
+            # 内容的最后修改时间作为时效性评分的起算点
+            evidence.published_at = published_at
+        evidence.file_key = blob_key(digest)
+        evidence.file_size = size
+        evidence.file_type = _file_type(content_type, evidence.url)
+        evidence.status = "downloaded"
+        db.commit()
+        if previous_hash and previous_hash != digest:
+            # 旧内容的文件和提取文本不再被本证据引用，其他证据仍引用时保留
+            from app.services.purge import release_blobs  # purge 依赖本模块
+            await asyncio.to_thread(release_blobs, db, [previous_hash])
+
+        await asyncio.to_thread(self._process, db, evidence, target)
+        return CHANGED
+
+    async def _download(self, response: httpx.Response) -> Tuple[str, int, Path]:
+        """流式写入临时文件并计算 SHA-256，超过大小上限时中止"""
+        temp_dir = storage_root() / "tmp"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = temp_dir / uuid.uuid4().hex
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise ValueError(f"文件超过大小上限 {self.max_size} 字节")
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return digest.hexdigest(), size, temp_path
+
+    async def process(self, evidence_id: str) -> None:
+        """对已按内容哈希存储的文件（上传的文件）执行内容处理"""
+        db = SessionLocal()
+        try:
+            evidence = db.get(Evidence, evidence_id)
+            if evidence is None or not evidence.content_hash:
+                return
+            await asyncio.to_thread(self._process, db, evidence, storage_root() / blob_key(evidence.content_hash))
+        finally:
+            db.close()
+
+    def _process(self, db: Session, evidence: Evidence, path: Path) -> None:
+        """内容变化后依次执行注册的处理函数"""
+        try:
+            for processor in CONTENT_PROCESSORS:
+                processor(db, evidence, path)
+            evidence.status = "processed"
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to process evidence {evidence.id}: {e}")
+            evidence.status = "failed"
+            db.commit()
+
+
+def _http_date(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return parsedate_to_datetime(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _file_type(content_type: str, url: str) -> Optional[str]:
+    mime = content_type.split(";")[0].strip().lower()
+    extension = mimetypes.guess_extension(mime) if mime else None
+    if extension is None:
+        extension = os.path.splitext(httpx.URL(url).path)[1].lower() or None
+    return extension
+
+
+class EvidenceRefreshScheduler:
+    """周期性刷新到期证据的调度器"""
+
+    def __init__(
+        self,
+        fetcher: EvidenceFetcher,
+        interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.fetcher = fetcher
+        self.interval = settings.EVIDENCE_REFRESH_INTERVAL if interval is None else interval
+        self.batch_size = settings.EVIDENCE_REFRESH_BATCH if batch_size is None else batch_size
+        self.concurrency = settings.EVIDENCE_REFRESH_CONCURRENCY if concurrency is None else concurrency
+        self._task: Optional[asyncio.Task] = None
+
+    def select_due(self, db: Session, now: datetime) -> List[str]:
+        """按下次刷新时间从早到晚取前 batch_size 条到期的证据（从未抓取过的在前）"""
+        rows = (
+            db.query(Evidence.id)
+            .filter(
+                Evidence.url.like("http%"),
+                or_(Evidence.refresh_due_at.is_(None), Evidence.refresh_due_at <= now)
+            )
+            .order_by(Evidence.refresh_due_at.asc().nulls_first(), Evidence.id)
+            .limit(self.batch_size)
+        )
+        return [id for id, in rows]
+
+    def _select_due(self) -> List[str]:
+        db = SessionLocal()
+        try:
+            return self.select_due(db, datetime.now(timezone.utc))
+        finally:
+            db.close()
+
+    async def run_once(self) -> Dict[str, int]:
+        """执行一轮刷新，返回各抓取结果的数量；其他 worker 正在执行本轮刷新时跳过"""
+        async with coordinator.lease("evidence_refresh", ttl=max(self.interval, self.fetcher.timeout)) as acquired:
+            if not acquired:
+                return {}
+            counts = await self._run_pass()
+            # 重新切分留下的旧片段由同一个租约持有者压缩
+            await asyncio.to_thread(chunk_store.compact, settings.CHUNK_STORE_COMPACT_RATIO)
+            return counts
+
+    async def _run_pass(self) -> Dict[str, int]:
+        due = await asyncio.to_thread(self._select_due)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        counts: Dict[str, int] = {}
+
+        async def refresh(evidence_id: str) -> None:
+            async with semaphore:
+                try:
+                    result = await self.fetcher.refresh(evidence_id)
+                except Exception as e:
+                    logger.error(f"Evidence refresh failed for {evidence_id}: {e}")
+                    result = FAILED
+            counts[result] = counts.get(result, 0) + 1
+
+        await asyncio.gather(*(refresh(evidence_id) for evidence_id in due))
+        if due:
+            logger.info(f"Evidence refresh pass: {counts}")
+        return counts
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Evidence refresh pass failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+evidence_fetcher = EvidenceFetcher()
+refresh_scheduler = EvidenceRefreshScheduler(evidence_fetcher)
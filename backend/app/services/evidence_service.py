@@ -0,0 +1,273 @@
+"""
+证据检索服务
+"""
+
+from fastapi import BackgroundTasks
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session, joinedload
+from typing import Optional, Dict, Any, Iterator, List
+from app.core.coordination import coordinator
+from app.core.metrics import add_background_job
+from app.core.search_cache import CACHE_NAME, clean_query, normalize_query, query_terms, search_cache, search_cache_key
+from app.core.serialization import dump_row
+from app.models.evidence import Evidence
+from app.models.evidence_usage import EvidenceUsage
+from app.models.plan import Plan
+from app.schemas.evidence import EvidenceCreate, EvidenceUpdate, EvidenceResponse, EvidenceSearchRequest
+from app.services.base_service import BaseService
+from app.services.chunk_store import Chunk, chunk_store
+from app.services.evidence_fetcher import evidence_fetcher
+from app.services.evidence_upload import ReceivedUpload
+from app.services.evidence_usage import check_usage_plans, usage_item
+from app.services.purge import release_blobs
+from app.services.search_engine import SearchHit, search_engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 已入库证据的检索源名称
+LOCAL_SOURCE = "local"
+
+class EvidenceService(BaseService[Evidence, EvidenceCreate, EvidenceUpdate]):
+    """证据检索服务"""
+
+    expandable = {
+        "plan": lambda: joinedload(Evidence.plan),
+    }
+
+    def __init__(self, db: Session):
+        super().__init__(Evidence, db)
+
+    async def create_evidence(self, evidence_in: EvidenceCreate) -> Evidence:
+        """创建证据，usage_in_plan 引用不存在的企划时抛出 ValueError"""
+        check_usage_plans(self.db, evidence_in.usage_in_plan)
+        evidence = await self.create(evidence_in)
+        # 新证据可能命中已缓存的（包括空的）本地检索结果
+        await coordinator.invalidate(CACHE_NAME)
+        return evidence
+
+    async def get_evidence(self, evidence_id: str, expand: Optional[str] = None) -> Optional[Evidence]:
+        """获取证据详情"""
+        return await self.get(evidence_id, options=self.build_expand_options(expand))
+
+    async def update_evidence(self, evidence_id: str, evidence_update: EvidenceUpdate) -> Optional[Evidence]:
+        """更新证据信息，usage_in_plan 引用不存在的企划时抛出 ValueError"""
+        check_usage_plans(self.db, evidence_update.usage_in_plan)
+        evidence = await self.update(evidence_id, evidence_update)
+        if evidence is not None:
+            await coordinator.invalidate(CACHE_NAME)
+        return evidence
+
+    async def list_evidence(
+        self,
+        page: int = 1,
+        size: int = 20,
+        plan_id: Optional[str] = None,
+        status: Optional[str] = None,
+        expand: Optional[str] = None,
+        used_in_plan: Optional[str] = None,
+        section: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """获取证据列表，可按引用企划和章节过滤"""
+        return await self.list(
+            page=page,
+            size=size,
+            filters={"plan_id": plan_id, "status": status, "used_in_plan": used_in_plan, "section": section},
+            options=self.build_expand_options(expand)
+        )
+
+    def _apply_filters(self, query, filters: Optional[Dict[str, Any]]):
+        """used_in_plan / section 按 evidence_usages 的 (plan_id, section) 索引过滤"""
+        filters = dict(filters or {})
+        used_in_plan = filters.pop("used_in_plan", None)
+        section = filters.pop("section", None)
+        query = super()._apply_filters(query, filters)
+        if used_in_plan is not None or section is not None:
+            usages = select(EvidenceUsage.evidence_id)
+            if used_in_plan is not None:
+                usages = usages.where(EvidenceUsage.plan_id == used_in_plan)
+            if section is not None:
+                usages = usages.where(EvidenceUsage.section == section)
+            query = query.filter(Evidence.id.in_(usages))
+        return query
+
+    async def list_usages(self, evidence_id: str) -> Optional[List[Dict[str, Any]]]:
+        """引用该证据的企划及章节（不含已删除的企划），证据不存在时返回 None"""
+        if not await self.get_version(evidence_id):
+            return None
+        usages = (
+            self.db.query(EvidenceUsage.plan_id, EvidenceUsage.section, EvidenceUsage.context)
+            .join(Plan, Plan.id == EvidenceUsage.plan_id)
+            .filter(EvidenceUsage.evidence_id == evidence_id)
+            .order_by(EvidenceUsage.position, EvidenceUsage.id)
+        )
+        return [usage_item(usage) for usage in usages]
+
+    async def delete_evidence(self, evidence_id: str) -> bool:
+        """删除证据（软删除，文件和片段由后台清理释放）"""
+        deleted = await self.delete(evidence_id)
+        if deleted:
+            await coordinator.invalidate(CACHE_NAME)
+        return deleted
+
+    async def download_evidence_file(self, evidence_id: str, background_tasks: BackgroundTasks) -> bool:
+        """在后台抓取证据文件；已抓取过的证据发送条件请求，内容未变化时不重新下载和处理"""
+        if not await self.get_version(evidence_id):
+            return False
+        add_background_job(background_tasks, "evidence_fetch", evidence_fetcher.refresh, evidence_id)
+        return True
+
+    async def upload_evidence(self, upload: ReceivedUpload, background_tasks: BackgroundTasks) -> Evidence:
+        """为已存储的上传文件创建证据（标题缺省为文件名），在后台提取正文"""
+        fields = upload.fields
+        try:
+            evidence_in = EvidenceCreate(
+                title=fields.get("title") or upload.filename or upload.content_hash,
+                url=f"upload://{upload.content_hash}",
+                summary=fields.get("summary") or None,
+                license=fields.get("license") or None,
+                file_type=upload.file_type,
+                file_size=upload.file_size,
+                plan_id=fields.get("plan_id") or None
+            )
+            evidence = Evidence(
+                **evidence_in.model_dump(),
+                file_key=upload.file_key,
+                content_hash=upload.content_hash,
+                status="downloaded"
+            )
+            self.db.add(evidence)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            # 相同内容可能已被其他证据引用，只释放无人引用的文件
+            release_blobs(self.db, [upload.content_hash])
+            raise
+        self.db.refresh(evidence)
+        logger.info(f"Uploaded evidence {evidence.id} ({upload.file_size} bytes, {upload.file_type})")
+        add_background_job(background_tasks, "evidence_process", evidence_fetcher.process, evidence.id)
+        await coordinator.invalidate(CACHE_NAME)
+        return evidence
+
+    def stream_evidence(self, plan_id: Optional[str] = None, status: Optional[str] = None) -> Iterator[Evidence]:
+        """按服务端游标逐批读取全部匹配的证据"""
+        return self.iter_all(filters={"plan_id": plan_id, "status": status})
+
+    async def get_evidence_content(self, evidence_id: str) -> Optional[Dict[str, Any]]:
+        """证据正文的片段（含页码和页内位置），证据不存在或尚未提取正文时返回 None"""
+        if not await self.get_version(evidence_id):
+            return None
+        chunks = chunk_store.chunks(evidence_id)
+        if not chunks:
+            return None
+        return {
+            "evidence_id": evidence_id,
+            "chunks": [
+                {"seq": chunk.seq, "page": chunk.page, "span": [chunk.start, chunk.end], "text": chunk.text}
+                for chunk in chunks
+            ],
+        }
+
+    def stream_chunks(self, plan_id: str) -> Iterator[Chunk]:
+        """企划全部证据的片段；只查询证据ID，片段文本和元数据取自片段存储"""
+        ids = self.db.query(Evidence.id).filter(Evidence.plan_id == plan_id).order_by(Evidence.id)
+        return chunk_store.fetch(id for id, in ids)
+
+    async def search_evidence(
+        self,
+        search_request: EvidenceSearchRequest,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> Dict[str, Any]:
+        """
+        搜索证据，结果按规范化后的查询缓存，搜索源收到的是只做过 NFKC 和空白整理的原始查询
+        
+        外部搜索源并发查询，命中结果按 URL 去重后入库为待下载的证据，再与已入库证据的
+        检索结果合并，按相关性排序。有搜索源超时或失败时返回部分结果且不写入缓存。
+        """
+        sources = tuple(search_request.sources or (LOCAL_SOURCE, *search_engine.default_sources()))
+        query = clean_query(search_request.query)
+        key = search_cache_key(
+            normalize_query(query), sources, search_request.min_relevance, search_request.max_results, search_request.plan_id
+        )
+        cached = search_cache.get(key)
+        if cached is not None:
+            return cached
+
+        items: List[Evidence] = []
+        status: Dict[str, str] = {}
+        partial = False
+        external = [source for source in sources if source != LOCAL_SOURCE]
+        if query and external:
+            federated = await search_engine.search(query, external, search_request.max_results)
+            status, partial = federated.sources, federated.partial
+            hits = [hit for hit in federated.hits if hit.score >= search_request.min_relevance]
+            items.extend(self._store_hits(hits, search_request.plan_id))
+        if query and LOCAL_SOURCE in sources:
+            items.extend(self._search_local(query, search_request))
+            status[LOCAL_SOURCE] = "ok"
+
+        unique = {item.id: item for item in items}
+        ranked = sorted(unique.values(), key=lambda item: item.relevance_score or 0.0, reverse=True)
+        ranked = ranked[:search_request.max_results]
+        result = {
+            "items": [dump_row(item, EvidenceResponse) for item in ranked],
+            "total": len(ranked),
+            "page": 1,
+            "size": search_request.max_results,
+            "sources": status,
+            "partial": partial
+        }
+        if not partial:
+            search_cache.set(key, result, sources, empty=not ranked)
+        return result
+
+    def _store_hits(self, hits: List[SearchHit], plan_id: Optional[str]) -> List[Evidence]:
+        """将外部搜索结果入库为待下载的证据，同一企划下已有相同 URL 的证据直接复用"""
+        if not hits:
+            return []
+        query = self.db.query(Evidence).filter(Evidence.url.in_([hit.url for hit in hits]))
+        if plan_id is None:
+            query = query.filter(Evidence.plan_id.is_(None))
+        else:
+            query = query.filter(Evidence.plan_id == plan_id)
+        existing = {evidence.url: evidence for evidence in query}
+        created = []
+        results = []
+        for hit in hits:
+            evidence = existing.get(hit.url)
+            if evidence is None:
+                evidence = Evidence(
+                    plan_id=plan_id,
+                    title=hit.title[:500],
+                    url=hit.url,
+                    summary=hit.snippet or None,
+                    relevance_score=hit.score,
+                    status="pending"
+                )
+                existing[hit.url] = evidence
+                created.append(evidence)
+            results.append(evidence)
+        if created:
+            try:
+                self.db.add_all(created)
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Failed to store search hits: {e}")
+                raise
+        return results
+
+    def _search_local(self, query: str, search_request: EvidenceSearchRequest) -> List[Evidence]:
+        """在已入库的证据中检索：每个词都须出现在标题或摘要中"""
+        db_query = self._apply_filters(self.db.query(Evidence), {"plan_id": search_request.plan_id})
+        for term in query_terms(query):
+            db_query = db_query.filter(or_(
+                Evidence.title.icontains(term, autoescape=True),
+                Evidence.summary.icontains(term, autoescape=True)
+            ))
+        return (
+            db_query.filter(Evidence.relevance_score >= search_request.min_relevance)
+            .order_by(Evidence.relevance_score.desc(), Evidence.created_at.desc())
+            .limit(search_request.max_results)
+            .all()
+        )
@@ -0,0 +1,278 @@
+"""
+证据文件上传
+
+multipart/form-data 请求体不经过表单解析（会把整个文件先缓存下来），而是把 request.stream()
+的数据块直接交给 python-multipart 的流式解析器：
+
+- 文件部分边解析边写入 UPLOAD_DIR/tmp 下的临时文件，同时计算 SHA-256；
+- 按文件开头的魔数识别实际类型（PDF、OLE2、ZIP/OOXML、HTML、纯文本），不在 ALLOWED_FILE_TYPES
+  中的类型在读到开头后立即拒绝；
+- 累计大小超过 MAX_FILE_SIZE 时立即中止，不再读取剩余请求体；Content-Length 已超限时不读取请求体。
+
+上传完成后与抓取的文件一样按内容哈希存储，由调用方创建证据并在后台执行内容处理。
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import hashlib
+import os
+import uuid
+
+import aiofiles
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.config import settings
+from app.services.evidence_fetcher import blob_key, storage_root
+
+# 识别类型需要的文件开头长度
+SNIFF_SIZE = 8192
+# 普通表单字段的大小上限
+MAX_FIELD_SIZE = 64 * 1024
+# 文件部分的字段名
+FILE_FIELD = "file"
+
+_MAGIC: Tuple[Tuple[bytes, str], ...] = (
+    (b"%PDF-", ".pdf"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".doc"),
+    (b"PK\x03\x04", ".docx"),
+)
+_TEXT_TYPES = (".txt", ".md", ".csv", ".json", ".xml")
+
+
+class UploadError(ValueError):
+    """上传请求格式错误"""
+
+    status_code = 400
+
+
+class UploadTooLarge(UploadError):
+    """文件超过 MAX_FILE_SIZE"""
+
+    status_code = 413
+
+
+class UnsupportedFileType(UploadError):
+    """文件实际类型不在 ALLOWED_FILE_TYPES 中"""
+
+    status_code = 415
+
+
+def sniff_file_type(head: bytes, filename: Optional[str] = None) -> Optional[str]:
+    """
+    按文件开头的字节识别类型，无法识别时返回 None
+
+    ZIP 容器按 .docx 处理；能按 UTF-8 解码且不含 NUL 的内容视为文本，扩展名是文本类型时沿用扩展名。
+    """
+    for magic, file_type in _MAGIC:
+        if head.startswith(magic):
+            return file_type
+    text = head[:1024].lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith((b"<!doctype html", b"<html")):
+        return ".html"
+    if b"\x00" in head:
+        return None
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 截断在多字节字符中间不算错误
+        if e.start < len(head) - 3:
+            return None
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".html", ".htm") or extension in _TEXT_TYPES:
+        return extension
+    return ".txt"
+
+
+@dataclass
+class ReceivedUpload:
+    """已写入按内容哈希寻址存储的上传文件"""
+
+    filename: str
+    content_hash: str
+    file_key: str
+    file_size: int
+    file_type: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class _Part:
+    name: str = ""
+    filename: Optional[str] = None
+    disposition: bytes = b""
+    data: bytearray = field(default_factory=bytearray)
+
+
+class _FileSink:
+    """文件部分的写入目标：临时文件、SHA-256、大小计数和类型识别"""
+
+    def __init__(self, filename: str, max_size: int):
+        self.filename = filename
+        self.max_size = max_size
+        temp_dir = storage_root() / "tmp"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        self.path = temp_dir / uuid.uuid4().hex
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = bytearray()
+        self.file_type: Optional[str] = None
+        self._file = None
+
+    async def open(self) -> None:
+        self._file = await aiofiles.open(self.path, "wb")
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise UploadTooLarge(f"文件超过大小上限 {self.max_size} 字节")
+        if self.file_type is None and len(self.head) < SNIFF_SIZE:
+            self.head += data[:SNIFF_SIZE - len(self.head)]
+            if len(self.head) >= SNIFF_SIZE:
+                self._check_type()
+        self.digest.update(data)
+        await self._file.write(data)
+
+    async def finish(self) -> None:
+        await self._file.close()
+        self._file = None
+        if self.size == 0:
+            raise UploadError("上传的文件为空")
+        if self.file_type is None:
+            self._check_type()
+
+    async def discard(self) -> None:
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+        self.path.unlink(missing_ok=True)
+
+    def _check_type(self) -> None:
+        file_type = sniff_file_type(bytes(self.head), self.filename)
+        if file_type not in settings.ALLOWED_FILE_TYPES:
+            raise UnsupportedFileType(
+                f"不支持的文件类型: {file_type or '未知'}，可选值: {', '.join(settings.ALLOWED_FILE_TYPES)}"
+            )
+        self.file_type = file_type
+
+
+async def receive_upload(
+    content_type: str,
+    stream: AsyncIterator[bytes],
+    content_length: Optional[int] = None,
+    max_size: Optional[int] = None
+) -> ReceivedUpload:
+    """
+    流式解析 multipart 请求体，把名为 file 的文件部分按内容哈希存储
+
+    返回文件信息和其余表单字段；格式错误、超过大小上限或类型不支持时抛出 UploadError 的子类，
+    临时文件随之删除。
+    """
+    max_size = settings.MAX_FILE_SIZE if max_size is None else max_size
+    if content_length is not None and content_length > max_size + MAX_FIELD_SIZE:
+        raise UploadTooLarge(f"文件超过大小上限 {max_size} 字节")
+    mime, params = parse_options_header(content_type)
+    if mime != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("请求体必须是 multipart/form-data")
+
+    fields: Dict[str, str] = {}
+    events: List[Tuple[str, object]] = []
+    part = _Part()
+    header_name = bytearray()
+    header_value = bytearray()
+
+    def on_part_begin() -> None:
+        nonlocal part
+        part = _Part()
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_name.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        if bytes(header_name).lower() == b"content-disposition":
+            part.disposition = bytes(header_value)
+        header_name.clear()
+        header_value.clear()
+
+    def on_headers_finished() -> None:
+        _, options = parse_options_header(part.disposition)
+        if b"name" not in options:
+            raise UploadError("表单部分缺少 name")
+        part.name = options[b"name"].decode("utf-8", errors="replace")
+        if b"filename" in options:
+            part.filename = options[b"filename"].decode("utf-8", errors="replace")
+            events.append(("file", part))
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if part.filename is not None:
+            events.append(("data", data[start:end]))
+        elif len(part.data) + end - start > MAX_FIELD_SIZE:
+            raise UploadError(f"表单字段 {part.name} 超过 {MAX_FIELD_SIZE} 字节")
+        else:
+            part.data.extend(data[start:end])
+
+    def on_part_end() -> None:
+        if part.filename is None:
+            fields[part.name] = part.data.decode("utf-8", errors="replace")
+        else:
+            events.append(("end", part))
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    sink: Optional[_FileSink] = None
+    finished = False
+    try:
+        async for chunk in stream:
+            parser.write(chunk)
+            # 解析回调是同步的，文件写入在每个数据块解析完后进行
+            for kind, value in events:
+                if kind == "file":
+                    if value.name != FILE_FIELD or sink is not None:
+                        raise UploadError(f"只接受一个名为 {FILE_FIELD} 的文件")
+                    sink = _FileSink(value.filename, max_size)
+                    await sink.open()
+                elif kind == "data":
+                    await sink.write(value)
+                else:
+                    await sink.finish()
+                    finished = True
+            events.clear()
+        parser.finalize()
+        if sink is None or not finished:
+            raise UploadError(f"缺少文件字段 {FILE_FIELD}")
+
+        digest = sink.digest.hexdigest()
+        target = storage_root() / blob_key(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(sink.path, target)
+    except BaseException as e:
+        # 包括客户端断开导致的取消
+        if sink is not None:
+            await sink.discard()
+        if isinstance(e, UploadError) or not isinstance(e, Exception):
+            raise
+        raise UploadError(f"解析上传请求失败: {e}") from e
+
+    return ReceivedUpload(
+        filename=sink.filename,
+        content_hash=digest,
+        file_key=blob_key(digest),
+        file_size=sink.size,
+        file_type=sink.file_type,
+        fields=fields,
+    )
+
+
+def upload_path(upload: ReceivedUpload) -> Path:
+    return storage_root() / upload.file_key
@@ -0,0 +1,192 @@
+"""
+证据使用情况的规范化存储
+
+证据在企划中的引用保存在 evidence_usages 表（按 (plan_id, section) 和 evidence_id 建索引），
+Evidence.usage_in_plan 是由表派生的 JSON 视图，接口读取单条证据时不需要联表：
+
+- 写入 usage_in_plan（创建或更新证据）时，在同一次 flush 中整体替换该证据的引用行，
+  再由引用行重新生成 usage_in_plan；
+- 直接增删改引用行时同样重新生成；
+- 反向查询（引用某证据的企划、某企划某章节引用的证据）只走索引，不解析 JSON。
+
+引用不存在的企划的项不写入引用行：接口在写入前由 check_usage_plans 校验并返回 400，
+其他写入路径在 flush 时跳过这些项（与 backfill_usages 相同）。
+
+表建立之前写入的 usage_in_plan 由 backfill_usages 补齐（启动时由持有租约的 worker 执行一次）。
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+import asyncio
+import logging
+
+from sqlalchemy import bindparam, event, exists, inspect as sa_inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.coordination import coordinator
+from app.core.database import SessionLocal
+from app.models.evidence import Evidence
+from app.models.evidence_usage import EvidenceUsage
+from app.models.plan import Plan
+
+logger = logging.getLogger(__name__)
+
+_evidences = Evidence.__table__
+_usages = EvidenceUsage.__table__
+_plans = Plan.__table__
+
+
+def usage_item(usage: Any) -> Dict[str, Any]:
+    """引用行（或有相同字段的行对象）转换为 usage_in_plan 中的一项"""
+    return {"plan_id": usage.plan_id, "section": usage.section, "context": usage.context}
+
+
+def _usage_fields(item: Any) -> Dict[str, Any]:
+    if not isinstance(item, Mapping):
+        item = item.model_dump() if hasattr(item, "model_dump") else vars(item)
+    return {"plan_id": item["plan_id"], "section": item["section"], "context": item.get("context")}
+
+
+def check_usage_plans(db: Session, items: Optional[Iterable[Any]]) -> None:
+    """usage_in_plan 引用了不存在（或已删除）的企划时抛出 ValueError"""
+    plan_ids = {_usage_fields(item)["plan_id"] for item in items or ()}
+    if not plan_ids:
+        return
+    existing = {id for id, in db.query(Plan.id).filter(Plan.id.in_(plan_ids))}
+    missing = sorted(plan_ids - existing)
+    if missing:
+        raise ValueError(f"引用的企划不存在: {', '.join(missing)}")
+
+
+def set_usages(evidence: Evidence, items: Optional[Iterable[Any]], plan_ids: Optional[Set[str]] = None) -> None:
+    """按 usage_in_plan 的内容整体替换证据的引用行；给出 plan_ids 时跳过引用其他企划的项"""
+    fields = [_usage_fields(item) for item in items or ()]
+    if plan_ids is not None:
+        fields = [item for item in fields if item["plan_id"] in plan_ids]
+    evidence.usages = [EvidenceUsage(position=position, **item) for position, item in enumerate(fields)]
+
+
+def derive_usage_view(evidence: Evidence) -> None:
+    usages = sorted(evidence.usages, key=lambda usage: usage.position or 0)
+    evidence.usage_in_plan = [usage_item(usage) for usage in usages] or None
+
+
+def refresh_usage_views(connection, evidence_ids: Iterable[str]) -> int:
+    """引用行被集合删除后，按剩余的行重新生成这些证据的 usage_in_plan，返回更新的证据数"""
+    ids = sorted({id for id in evidence_ids if id})
+    if not ids:
+        return 0
+    statement = (
+        update(_evidences)
+        .where(_evidences.c.id == bindparam("_id"))
+        .values(usage_in_plan=bindparam("_usage"))
+    )
+    count = 0
+    for start in range(0, len(ids), 500):
+        batch = ids[start:start + 500]
+        views: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in connection.execute(
+            select(_usages.c.evidence_id, _usages.c.plan_id, _usages.c.section, _usages.c.context)
+            .where(_usages.c.evidence_id.in_(batch))
+            .order_by(_usages.c.evidence_id, _usages.c.position, _usages.c.id)
+        ):
+            views[row.evidence_id].append(usage_item(row))
+        connection.execute(statement, [{"_id": id, "_usage": views.get(id) or None} for id in batch])
+        count += len(batch)
+    return count
+
+
+def backfill_usages(db: Session, batch_size: int = 500) -> int:
+    """为有 usage_in_plan 但还没有引用行的证据写入引用行（引用不存在的企划的项跳过），返回处理的证据数"""
+    count = 0
+    last_id = ""
+    while True:
+        rows = db.execute(
+            select(_evidences.c.id, _evidences.c.usage_in_plan)
+            .where(
+                _evidences.c.id > last_id,
+                _evidences.c.usage_in_plan.isnot(None),
+                ~exists().where(_usages.c.evidence_id == _evidences.c.id)
+            )
+            .order_by(_evidences.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return count
+        last_id = rows[-1].id
+        items = [
+            (id, position, item)
+            for id, usage in rows
+            for position, item in enumerate(usage or ())
+            if isinstance(item, Mapping) and item.get("plan_id") and item.get("section")
+        ]
+        plan_ids = {item["plan_id"] for _, _, item in items}
+        existing = set(db.execute(select(_plans.c.id).where(_plans.c.id.in_(plan_ids))).scalars()) if plan_ids else set()
+        values = [
+            {"evidence_id": id, "position": position, **_usage_fields(item)}
+            for id, position, item in items
+            if item["plan_id"] in existing
+        ]
+        if values:
+            db.execute(insert(_usages), values)
+        db.commit()
+        count += len(rows)
+        logger.info(f"Backfilled evidence usages for {count} evidences")
+
+
+async def run_usage_backfill() -> int:
+    """启动时补齐引用行；其他 worker 正在执行时跳过"""
+    async with coordinator.lease("evidence_usage_backfill", ttl=600.0) as acquired:
+        if not acquired:
+            return 0
+
+        def run() -> int:
+            db = SessionLocal()
+            try:
+                return backfill_usages(db)
+            finally:
+                db.close()
+
+        try:
+            return await asyncio.to_thread(run)
+        except Exception as e:
+            logger.error(f"Evidence usage backfill failed: {e}")
+            return 0
+
+
+def _known_plans(session: Session, plan_ids: Iterable[str]) -> Set[str]:
+    """已存在的企划（包括同一次 flush 中新建的），不经过 ORM 查询以免触发 autoflush"""
+    plan_ids = set(plan_ids)
+    known = {obj.id for obj in session.new if isinstance(obj, Plan) and obj.id in plan_ids}
+    pending = sorted(plan_ids - known)
+    if pending:
+        known.update(session.connection().execute(select(_plans.c.id).where(_plans.c.id.in_(pending))).scalars())
+    return known
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _sync_usages_on_flush(session, flush_context, instances) -> None:
+    """usage_in_plan 的写入转为引用行，引用行变化后重新生成 usage_in_plan"""
+    changed = {}
+    replaced = []
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Evidence):
+            attrs = sa_inspect(obj).attrs
+            if attrs.usage_in_plan.history.has_changes() and not attrs.usages.history.has_changes():
+                replaced.append(obj)
+                changed[id(obj)] = obj
+            elif attrs.usages.history.has_changes():
+                changed[id(obj)] = obj
+        elif isinstance(obj, EvidenceUsage) and obj.evidence is not None:
+            changed[id(obj.evidence)] = obj.evidence
+    if replaced:
+        plan_ids = _known_plans(session, (
+            _usage_fields(item)["plan_id"] for obj in replaced for item in obj.usage_in_plan or ()
+        ))
+        for obj in replaced:
+            set_usages(obj, obj.usage_in_plan, plan_ids)
+    for obj in session.deleted:
+        if isinstance(obj, EvidenceUsage) and obj.evidence is not None and obj.evidence not in session.deleted:
+            changed[id(obj.evidence)] = obj.evidence
+    for evidence in changed.values():
+        derive_usage_view(evidence)
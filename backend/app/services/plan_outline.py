@@ -0,0 +1,164 @@
+"""
+企划大纲物化
+
+大纲由企划的概览、范围、里程碑、任务、风险和预算章节生成，按各输出格式预先渲染并保存在
+plan_outlines 表中。企划的这些章节在会话 flush 时发生变化（新建或更新）会同步重新渲染，
+批量导入由 PlanService 在插入同一批企划时一并写入。读取大纲只需查询一行已渲染的文本，
+不需要加载和反序列化整个企划。
+"""
+
+from typing import Any, Dict, List, Mapping
+import json
+
+from sqlalchemy import event, inspect as sa_inspect
+
+from app.core.database import SessionLocal
+from app.models.plan import Plan
+from app.models.plan_outline import PlanOutline
+
+# 大纲依赖的企划章节，其余字段变化不触发重新渲染
+OUTLINE_SECTIONS = ("overview", "scope", "milestones", "tasks", "risks", "budget")
+
+
+def build_outline(sections: Mapping[str, Any]) -> Dict[str, Any]:
+    """由企划章节生成大纲树: {"title": str, "children": [...]}"""
+    def node(title: Any, children: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return {"title": str(title), "children": children or []}
+
+    overview = sections.get("overview") or {}
+    children = []
+
+    overview_items = []
+    if overview.get("summary"):
+        overview_items.append(node(overview["summary"]))
+    if overview.get("version"):
+        overview_items.append(node(f"版本 {overview['version']}"))
+    if overview_items:
+        children.append(node("概览", overview_items))
+
+    scope = sections.get("scope") or {}
+    scope_items = []
+    if scope.get("in"):
+        scope_items.append(node("包含", [node(item) for item in scope["in"]]))
+    if scope.get("out"):
+        scope_items.append(node("不包含", [node(item) for item in scope["out"]]))
+    if scope_items:
+        children.append(node("范围", scope_items))
+
+    milestones = sections.get("milestones") or []
+    if milestones:
+        children.append(node("里程碑", [
+            node(
+                f"{item.get('name', '')}（{item['due_date']}）" if item.get("due_date") else item.get("name", ""),
+                [node(deliverable) for deliverable in item.get("deliverables") or []]
+            )
+            for item in milestones
+        ]))
+
+    tasks = sections.get("tasks") or []
+    if tasks:
+        children.append(node("任务", [
+            node(f"{item.get('name', '')} - {item['assignee']}" if item.get("assignee") else item.get("name", ""))
+            for item in tasks
+        ]))
+
+    risks = sections.get("risks") or []
+    if risks:
+        children.append(node("风险", [
+            node(f"{item.get('description', '')}（概率 {item.get('probability', '-')}，影响 {item.get('impact', '-')}）")
+            for item in risks
+        ]))
+
+    budget = sections.get("budget") or {}
+    if budget:
+        children.append(node("预算", [node(f"总预算 {budget.get('total', 0)}")] + [
+            node(f"{item.get('category', '')}: {item.get('amount', 0)}")
+            for item in budget.get("breakdown") or []
+        ]))
+
+    return node(overview.get("title") or "未命名企划", children)
+
+
+def render_json(outline: Dict[str, Any]) -> str:
+    return json.dumps(outline, ensure_ascii=False, separators=(",", ":"))
+
+
+def render_markdown(outline: Dict[str, Any]) -> str:
+    lines = [f"# {outline['title']}"]
+    for section in outline["children"]:
+        lines.append("")
+        lines.append(f"## {section['title']}")
+        stack = [(child, 0) for child in reversed(section["children"])]
+        while stack:
+            item, depth = stack.pop()
+            lines.append(f"{'  ' * depth}- {item['title']}")
+            stack.extend((child, depth + 1) for child in reversed(item["children"]))
+    return "\n".join(lines) + "\n"
+
+
+def _mermaid_text(text: str) -> str:
+    # mindmap 节点文本中的括号会被解析为节点形状
+    return " ".join(text.translate(str.maketrans("()[]{}", "（）【】｛｝")).split())
+
+
+def render_mermaid(outline: Dict[str, Any]) -> str:
+    lines = ["mindmap", f"  root(({_mermaid_text(outline['title'])}))"]
+    stack = [(child, 2) for child in reversed(outline["children"])]
+    while stack:
+        item, depth = stack.pop()
+        lines.append(f"{'  ' * depth}{_mermaid_text(item['title'])}")
+        stack.extend((child, depth + 1) for child in reversed(item["children"]))
+    return "\n".join(lines) + "\n"
+
+
+# 输出格式 -> (媒体类型, 渲染函数)
+OUTLINE_FORMATS: Dict[str, tuple] = {
+    "json": ("application/json", render_json),
+    "markdown": ("text/markdown; charset=utf-8", render_markdown),
+    "mermaid": ("text/plain; charset=utf-8", render_mermaid),
+}
+
+
+def render_outlines(sections: Mapping[str, Any]) -> Dict[str, str]:
+    """按所有支持的格式渲染大纲"""
+    outline = build_outline(sections)
+    return {format_type: render(outline) for format_type, (_, render) in OUTLINE_FORMATS.items()}
+
+
+def plan_sections(plan: Plan) -> Dict[str, Any]:
+    return {name: getattr(plan, name) for name in OUTLINE_SECTIONS}
+
+
+def materialize(plan: Plan) -> None:
+    """重新渲染企划的大纲，新建或更新对应的 PlanOutline"""
+    existing = {outline.format_type: outline for outline in plan.outlines}
+    for format_type, content in render_outlines(plan_sections(plan)).items():
+        outline = existing.get(format_type)
+        if outline is None:
+            plan.outlines.append(PlanOutline(format_type=format_type, content=content))
+        elif outline.content != content:
+            outline.content = content
+
+
+def _sections_changed(plan: Plan) -> bool:
+    attrs = sa_inspect(plan).attrs
+    return any(attrs[name].history.has_changes() for name in OUTLINE_SECTIONS)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _materialize_on_flush(session, flush_context, instances) -> None:
+    """新建的企划以及章节有变化的企划在同一次 flush 中更新大纲"""
+    for obj in list(session.new):
+        if isinstance(obj, Plan):
+            materialize(obj)
+    for obj in list(session.dirty):
+        if isinstance(obj, Plan) and _sections_changed(obj):
+            materialize(obj)
+
+
+def outline_rows(plan_id: str, sections: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """批量插入用的大纲行"""
+    return [
+        {"plan_id": plan_id, "format_type": format_type, "content": content}
+        for format_type, content in render_outlines(sections).items()
+    ]
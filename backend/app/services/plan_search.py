@@ -0,0 +1,342 @@
+"""
+企划全文检索
+
+企划的概览、范围、里程碑、任务和风险章节各生成一条检索文档（plan_search_documents），保存章节原文
+和分词结果。分词在应用侧完成，两种数据库索引同一份以空格分隔的词：
+
+- SQLite：FTS5 外部内容表 plan_search_fts，由触发器随文档表同步，按 bm25 排序；
+- Postgres：to_tsvector('simple', tokens) 上的 GIN 表达式索引，按 ts_rank 排序。
+
+中文分词使用 jieba（可选依赖，cut_for_search 模式）；未安装时汉字按相邻二元组切分，单字查询按前缀匹配。
+文档记录所用的分词方式，分词方式变化后由 backfill_search 重建。
+
+企划的这些章节在会话 flush 时发生变化（新建或更新）会同步更新对应的文档，批量导入由 PlanService
+在插入同一批企划时一并写入，物理删除由后台清理任务一并完成。检索时查询词在同一章节内全部命中，
+结果按企划聚合分页，摘要片段由章节原文生成并以 <mark> 标出命中的词。
+"""
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+import asyncio
+import html
+import logging
+import re
+import unicodedata
+
+from sqlalchemy import bindparam, event, exists, inspect as sa_inspect, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.coordination import coordinator
+from app.core.database import SessionLocal
+from app.models.plan import Plan
+from app.models.plan_search import FTS_TABLE, PlanSearchDocument
+
+try:
+    import jieba
+except ImportError:  # pragma: no cover - 可选依赖
+    jieba = None
+
+logger = logging.getLogger(__name__)
+
+# 参与检索的企划章节，其余字段变化不触发重建文档
+SEARCH_SECTIONS = ("overview", "scope", "milestones", "tasks", "risks")
+
+TOKENIZER = "jieba" if jieba is not None else "bigram"
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff"
+_WORD = re.compile(f"[{_CJK}]+|[^\\W_{_CJK}]+")
+
+
+def _is_cjk(char: str) -> bool:
+    return "\u4e00" <= char <= "\u9fff" or "\u3400" <= char <= "\u4dbf"
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(unicodedata.normalize("NFKC", text).casefold())
+
+
+def _segment(word: str) -> List[str]:
+    if not _is_cjk(word[0]):
+        return [word]
+    if jieba is not None:
+        return [token for token in (t.strip() for t in jieba.cut_for_search(word)) if token]
+    if len(word) == 1:
+        return [word]
+    return [word[i:i + 2] for i in range(len(word) - 1)]
+
+
+def tokenize(text: str) -> List[str]:
+    """规范化（NFKC、大小写折叠）后分词，标点和符号视为分隔符"""
+    return [token for word in _words(text) for token in _segment(word)]
+
+
+def query_terms(query: str) -> List[Tuple[str, bool]]:
+    """查询词，返回 (词, 是否前缀匹配)；未安装 jieba 时单个汉字按前缀匹配二元组"""
+    terms = []
+    for word in _words(query):
+        prefix = jieba is None and len(word) == 1 and _is_cjk(word)
+        terms.extend((token, prefix) for token in _segment(word))
+    return list(dict.fromkeys(terms))
+
+
+def section_texts(fields: Mapping[str, Any]) -> Dict[str, str]:
+    """由企划章节生成各检索文档的原文（每项一行），没有内容的章节不生成文档"""
+    def items(name: str) -> List[Mapping[str, Any]]:
+        return [item for item in fields.get(name) or [] if isinstance(item, Mapping)]
+
+    overview = fields.get("overview") or {}
+    scope = fields.get("scope") or {}
+    parts = {
+        "overview": [overview.get("title"), overview.get("summary")],
+        "scope": list(scope.get("in") or []) + list(scope.get("out") or []),
+        "milestones": [
+            part for item in items("milestones")
+            for part in (item.get("name"), *(item.get("deliverables") or []))
+        ],
+        "tasks": [part for item in items("tasks") for part in (item.get("name"), item.get("description"))],
+        "risks": [part for item in items("risks") for part in (item.get("description"), item.get("mitigation"))],
+    }
+    texts = {}
+    for section, values in parts.items():
+        content = "\n".join(str(value) for value in values if value)
+        if content:
+            texts[section] = content
+    return texts
+
+
+def document_values(content: str) -> Dict[str, Any]:
+    return {"text": content, "tokens": " ".join(tokenize(content)), "tokenizer": TOKENIZER}
+
+
+def plan_fields(plan: Plan) -> Dict[str, Any]:
+    return {name: getattr(plan, name) for name in SEARCH_SECTIONS}
+
+
+def index_plan(plan: Plan) -> None:
+    """重建企划的检索文档，只更新原文或分词方式有变化的章节"""
+    existing = {document.section: document for document in plan.search_documents}
+    texts = section_texts(plan_fields(plan))
+    for section, document in existing.items():
+        if section not in texts:
+            plan.search_documents.remove(document)
+    for section, content in texts.items():
+        document = existing.get(section)
+        if document is None:
+            plan.search_documents.append(PlanSearchDocument(section=section, **document_values(content)))
+        elif document.text != content or document.tokenizer != TOKENIZER:
+            for key, value in document_values(content).items():
+                setattr(document, key, value)
+
+
+def _sections_changed(plan: Plan) -> bool:
+    attrs = sa_inspect(plan).attrs
+    return any(attrs[name].history.has_changes() for name in SEARCH_SECTIONS)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _index_on_flush(session, flush_context, instances) -> None:
+    """新建的企划以及章节有变化的企划在同一次 flush 中更新检索文档"""
+    for obj in list(session.new):
+        if isinstance(obj, Plan):
+            index_plan(obj)
+    for obj in list(session.dirty):
+        if isinstance(obj, Plan) and _sections_changed(obj):
+            index_plan(obj)
+
+
+def document_rows(plan_id: str, fields: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """批量插入用的检索文档行"""
+    return [
+        {"plan_id": plan_id, "section": section, **document_values(content)}
+        for section, content in section_texts(fields).items()
+    ]
+
+
+def backfill_search(db: Session, batch_size: int = 500) -> int:
+    """为没有检索文档或分词方式已更换的企划重建文档，返回处理的企划数"""
+    count = 0
+    last_id = ""
+    while True:
+        plans = (
+            db.query(Plan)
+            .filter(
+                Plan.id > last_id,
+                ~exists().where(
+                    PlanSearchDocument.plan_id == Plan.id,
+                    PlanSearchDocument.tokenizer == TOKENIZER
+                )
+            )
+            .order_by(Plan.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not plans:
+            return count
+        for plan in plans:
+            index_plan(plan)
+        last_id = plans[-1].id
+        db.commit()
+        count += len(plans)
+        logger.info(f"Backfilled search documents for {count} plans")
+
+
+async def run_search_backfill() -> int:
+    """启动时补齐检索文档；其他 worker 正在执行时跳过"""
+    async with coordinator.lease("plan_search_backfill", ttl=600.0) as acquired:
+        if not acquired:
+            return 0
+
+        def run() -> int:
+            db = SessionLocal()
+            try:
+                return backfill_search(db)
+            finally:
+                db.close()
+
+        try:
+            return await asyncio.to_thread(run)
+        except Exception as e:
+            logger.error(f"Plan search backfill failed: {e}")
+            return 0
+
+
+def _fts_match(terms: Sequence[Tuple[str, bool]]) -> str:
+    return " ".join(f'"{token}"' + ("*" if prefix else "") for token, prefix in terms)
+
+
+def _tsquery(terms: Sequence[Tuple[str, bool]]) -> str:
+    # 词只含字母、数字和汉字，不需要转义
+    return " & ".join(f"'{token}'" + (":*" if prefix else "") for token, prefix in terms)
+
+
+def _hits(dialect: str) -> Tuple[str, Callable[[Sequence[Tuple[str, bool]]], str]]:
+    """命中文档 (plan_id, section, text, score) 的查询（score 越大越相关）及查询参数的构造函数"""
+    if dialect == "postgresql":
+        return (
+            "SELECT d.plan_id, d.section, d.text, "
+            "ts_rank(to_tsvector('simple', d.tokens), q) AS score "
+            "FROM plan_search_documents d, to_tsquery('simple', :query) q "
+            "WHERE to_tsvector('simple', d.tokens) @@ q",
+            _tsquery,
+        )
+    if dialect == "sqlite":
+        return (
+            f"SELECT d.plan_id, d.section, d.text, -{FTS_TABLE}.rank AS score "
+            f"FROM {FTS_TABLE} JOIN plan_search_documents d ON d.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :query",
+            _fts_match,
+        )
+    raise ValueError(f"全文检索不支持数据库: {dialect}")
+
+
+def _fold(content: str) -> Tuple[str, List[int], List[int]]:
+    """
+    与分词相同的规范化（NFKC、大小写折叠），返回规范化文本及其每个字符对应的原文 [起始, 结束)
+
+    按基本字符连同其后的组合字符逐段规范化，全角字符、连字和 ß 等规范化后长度变化时仍能映射回原文。
+    """
+    folded: List[str] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    start = 0
+    while start < len(content):
+        end = start + 1
+        while end < len(content) and unicodedata.combining(content[end]):
+            end += 1
+        piece = unicodedata.normalize("NFKC", content[start:end]).casefold()
+        folded.append(piece)
+        starts.extend([start] * len(piece))
+        ends.extend([end] * len(piece))
+        start = end
+    return "".join(folded), starts, ends
+
+
+def highlight(content: str, terms: Sequence[Tuple[str, bool]], length: int) -> str:
+    """截取第一个命中附近 length 个字符，HTML 转义后以 <mark> 标出命中的词"""
+    folded, starts, ends = _fold(content)
+    spans = []
+    for token, _ in terms:
+        start = folded.find(token)
+        while start >= 0:
+            spans.append((starts[start], ends[start + len(token) - 1]))
+            start = folded.find(token, start + 1)
+    merged: List[List[int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    begin = max(0, merged[0][0] - length // 4) if merged else 0
+    finish = min(len(content), begin + length)
+    pieces = ["…"] if begin > 0 else []
+    position = begin
+    for start, end in merged:
+        if start >= finish:
+            break
+        start, end = max(start, position), min(end, finish)
+        pieces.append(html.escape(content[position:start]))
+        pieces.append(f"<mark>{html.escape(content[start:end])}</mark>")
+        position = end
+    pieces.append(html.escape(content[position:finish]))
+    if finish < len(content):
+        pieces.append("…")
+    return "".join(pieces).replace("\n", " ")
+
+
+def search_plans(
+    db: Session,
+    query: str,
+    page: int = 1,
+    size: int = 20,
+    status: Optional[str] = None
+) -> Dict[str, Any]:
+    """按相关性分页检索企划，每个企划附带命中章节的摘要片段"""
+    terms = query_terms(query)
+    if not terms:
+        raise ValueError("查询不能为空")
+    hits, build_query = _hits(db.get_bind().dialect.name)
+    params: Dict[str, Any] = {"query": build_query(terms)}
+    conditions = "p.deleted_at IS NULL"
+    if status is not None:
+        conditions += " AND p.status = :status"
+        params["status"] = status
+    ranked = f"WITH hits AS ({hits}) SELECT hits.plan_id, MAX(hits.score) AS score FROM hits " \
+             f"JOIN plans p ON p.id = hits.plan_id WHERE {conditions} GROUP BY hits.plan_id"
+
+    total = db.execute(text(f"SELECT COUNT(*) FROM ({ranked}) ranked"), params).scalar_one()
+    rows = db.execute(
+        text(f"{ranked} ORDER BY score DESC, hits.plan_id LIMIT :limit OFFSET :offset"),
+        {**params, "limit": size, "offset": (page - 1) * size}
+    ).all()
+    ids = [row.plan_id for row in rows]
+
+    snippets: Dict[str, List[Dict[str, str]]] = {id: [] for id in ids}
+    plans: Dict[str, Tuple[Any, str]] = {}
+    if ids:
+        for row in db.execute(
+            text(f"WITH hits AS ({hits}) SELECT section, plan_id, text FROM hits "
+                 "WHERE plan_id IN :ids ORDER BY plan_id, score DESC").bindparams(bindparam("ids", expanding=True)),
+            {**params, "ids": ids}
+        ):
+            if len(snippets[row.plan_id]) < settings.PLAN_SEARCH_MAX_SNIPPETS:
+                snippets[row.plan_id].append({
+                    "section": row.section,
+                    "snippet": highlight(row.text, terms, settings.PLAN_SEARCH_SNIPPET_LENGTH),
+                })
+        plans = {
+            id: (overview, plan_status)
+            for id, overview, plan_status in db.query(Plan.id, Plan.overview, Plan.status).filter(Plan.id.in_(ids))
+        }
+
+    items = []
+    for row in rows:
+        overview, plan_status = plans.get(row.plan_id, ({}, None))
+        items.append({
+            "plan_id": row.plan_id,
+            "title": (overview or {}).get("title"),
+            "status": plan_status,
+            "score": round(float(row.score), 6),
+            "snippets": snippets[row.plan_id],
+        })
+    return {"items": items, "total": total, "page": page, "size": size}
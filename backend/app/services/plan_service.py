@@ -0,0 +1,170 @@
+"""
+企划文档服务
+"""
+
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import insert, update
+from typing import Optional, Dict, Any, AsyncIterator, Iterator, List, Tuple
+from datetime import datetime
+from app.core.config import settings
+from app.core.coordination import coordinator
+from app.core.pubsub import FINISHED, PROGRESS, progress_hub
+from app.core.search_cache import CACHE_NAME as SEARCH_CACHE_NAME
+from app.models.evidence import Evidence
+from app.models.plan import Plan
+from app.models.plan_outline import PlanOutline
+from app.models.plan_search import PlanSearchDocument
+from app.schemas.plan import PlanCreate, PlanUpdate, PlanImport
+from app.services.base_service import BaseService
+from app.services.context_packer import SECTION_TOPICS, pack_context
+from app.services.plan_outline import OUTLINE_FORMATS, materialize, outline_rows
+from app.services.plan_search import document_rows, search_plans
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PlanService(BaseService[Plan, PlanCreate, PlanUpdate]):
+    """企划文档服务"""
+
+    # 一对多关系用 selectinload（IN 批量查询），多对一关系用 joinedload（同一条 SQL）
+    expandable = {
+        "requirement_snapshot": lambda: joinedload(Plan.requirement_snapshot),
+        "evidences": lambda: selectinload(Plan.evidences),
+    }
+
+    def __init__(self, db: Session):
+        super().__init__(Plan, db)
+
+    async def create_plan(
+        self,
+        plan_in: PlanCreate,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> Plan:
+        """创建企划文档"""
+        return await self.create(plan_in)
+
+    async def get_plan(self, plan_id: str, expand: Optional[str] = None) -> Optional[Plan]:
+        """获取企划文档详情"""
+        return await self.get(plan_id, options=self.build_expand_options(expand))
+
+    async def update_plan(self, plan_id: str, plan_update: PlanUpdate) -> Optional[Plan]:
+        """更新企划文档，状态或完成度变化时向订阅者推送进度，更新完成度时清除评分过期标记"""
+        plan = await self.update(plan_id, plan_update)
+        changes = plan_update.model_dump(include={"status", "completion_score"}, exclude_unset=True)
+        if plan is not None and "completion_score" in changes and plan.scores_stale:
+            # 完成度已按最新的证据评分重新计算
+            plan.scores_stale = False
+            self.db.commit()
+        if plan is not None and changes:
+            await progress_hub.publish(
+                "plan",
+                plan.id,
+                FINISHED if plan.status == "completed" else PROGRESS,
+                status=plan.status,
+                completion_score=plan.completion_score
+            )
+        return plan
+
+    async def list_plans(
+        self,
+        page: int = 1,
+        size: int = 20,
+        status: Optional[str] = None,
+        expand: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """获取企划文档列表"""
+        return await self.list(
+            page=page,
+            size=size,
+            filters={"status": status},
+            options=self.build_expand_options(expand)
+        )
+
+    async def delete_plan(self, plan_id: str) -> bool:
+        """删除企划文档（连同证据软删除，后台清理）"""
+        deleted = await self.delete(plan_id)
+        if deleted:
+            await coordinator.invalidate(SEARCH_CACHE_NAME)
+        return deleted
+
+    def _soft_delete_children(self, id: str, deleted_at: datetime) -> None:
+        evidences = Evidence.__table__
+        self.db.execute(
+            update(evidences)
+            .where(evidences.c.plan_id == id, evidences.c.deleted_at.is_(None))
+            .values(deleted_at=deleted_at)
+        )
+
+    def export_plans(self, status: Optional[str] = None) -> Iterator[Plan]:
+        """按游标导出企划文档（不含关联数据）"""
+        return self.iter_all(filters={"status": status})
+
+    async def import_plans(self, stream: AsyncIterator[bytes], on_conflict: str = "skip") -> Dict[str, Any]:
+        """从 NDJSON 流批量导入企划文档"""
+        return await self.import_ndjson(stream, PlanImport, on_conflict=on_conflict)
+
+    def _after_bulk_insert(self, rows: List[Dict[str, Any]]) -> None:
+        """批量导入的企划同时写入大纲和检索文档"""
+        outlines = [outline for row in rows for outline in outline_rows(row["id"], row)]
+        if outlines:
+            self.db.execute(insert(PlanOutline.__table__), outlines)
+        documents = [document for row in rows for document in document_rows(row["id"], row)]
+        if documents:
+            self.db.execute(insert(PlanSearchDocument.__table__), documents)
+
+    async def search_plans(
+        self,
+        query: str,
+        page: int = 1,
+        size: int = 20,
+        status: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """全文检索企划内容，按相关性分页，附带命中章节的摘要片段"""
+        return search_plans(self.db, query, page=page, size=size, status=status)
+
+    async def get_plan_outline(self, plan_id: str, format_type: str = "json") -> Optional[Tuple[str, Any]]:
+        """读取物化的大纲，返回 (内容, 更新时间)；企划不存在时返回 None"""
+        if format_type not in OUTLINE_FORMATS:
+            raise ValueError(f"不支持的大纲格式: {format_type}，可选值: {', '.join(OUTLINE_FORMATS)}")
+
+        row = (
+            self.db.query(PlanOutline.content, PlanOutline.updated_at)
+            .join(Plan, Plan.id == PlanOutline.plan_id)
+            .filter(PlanOutline.plan_id == plan_id, PlanOutline.format_type == format_type)
+            .first()
+        )
+        if row is not None:
+            return row.content, row.updated_at
+
+        # 物化之前创建的企划：首次读取时补齐
+        plan = await self.get(plan_id)
+        if plan is None:
+            return None
+        try:
+            materialize(plan)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to materialize outline for plan {plan_id}: {e}")
+            raise
+        outline = next(outline for outline in plan.outlines if outline.format_type == format_type)
+        return outline.content, outline.updated_at
+
+    async def pack_evidence_context(
+        self,
+        plan_id: str,
+        section: str,
+        budget: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """按章节的 token 预算挑选企划证据片段；企划不存在时返回 None"""
+        if section not in SECTION_TOPICS:
+            raise ValueError(f"不支持的章节: {section}，可选值: {', '.join(SECTION_TOPICS)}")
+        plan = await self.get(plan_id, options=[joinedload(Plan.requirement_snapshot)])
+        if plan is None:
+            return None
+        if budget is None:
+            budget = settings.CONTEXT_SECTION_BUDGETS.get(section, settings.CONTEXT_DEFAULT_BUDGET)
+        # 切分、向量计算和 MMR 选择是 CPU 密集的，放到工作线程中执行，不阻塞事件循环
+        return await asyncio.to_thread(pack_context, self.db, plan, section, budget)
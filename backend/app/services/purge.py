@@ -0,0 +1,216 @@
+"""
+软删除数据的后台清理
+
+删除接口只写入 deleted_at，这里分批物理删除超过 PURGE_GRACE_PERIOD 的行，不把对象加载到 ORM：
+
+1. 企划：每批取 PURGE_BATCH_SIZE 个企划ID，DELETE ... WHERE plan_id IN (...) 删除其证据、大纲、检索文档和
+   这些企划的证据引用，再删除企划本身；其他证据的 usage_in_plan 随之重新生成；
+2. 单独删除的证据：按ID分批删除（连同引用行）；
+3. 需求快照：企划清理完后删除向量和快照。
+
+每批一个短事务。批次提交后释放证据引用的资源：片段存储中的片段，以及不再被任何证据引用的
+按内容哈希存储的文件和提取文本。多 worker 部署时由持有 purge 租约的 worker 执行。
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+
+from sqlalchemy import delete, exists, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.coordination import coordinator
+from app.core.database import SessionLocal
+from app.core.metrics import registry
+from app.models.evidence import Evidence
+from app.models.evidence_usage import EvidenceUsage
+from app.models.plan import Plan
+from app.models.plan_outline import PlanOutline
+from app.models.plan_search import PlanSearchDocument
+from app.models.requirement import RequirementSnapshot
+from app.models.requirement_embedding import RequirementEmbedding
+from app.services.chunk_store import chunk_store
+from app.services.evidence_fetcher import blob_key, storage_root, text_path
+from app.services.evidence_usage import refresh_usage_views
+from app.services.similarity import similarity_index
+
+logger = logging.getLogger(__name__)
+
+purged_rows_total = registry.counter(
+    "purged_rows_total", "Soft-deleted rows physically deleted", ("table",)
+)
+
+_evidences = Evidence.__table__
+_usages = EvidenceUsage.__table__
+_plans = Plan.__table__
+_outlines = PlanOutline.__table__
+_search_documents = PlanSearchDocument.__table__
+_snapshots = RequirementSnapshot.__table__
+_embeddings = RequirementEmbedding.__table__
+
+
+def _deleted_ids(db: Session, table, cutoff: datetime, batch_size: int) -> List[str]:
+    return list(db.execute(
+        select(table.c.id)
+        .where(table.c.deleted_at.isnot(None), table.c.deleted_at <= cutoff)
+        .order_by(table.c.deleted_at)
+        .limit(batch_size)
+    ).scalars())
+
+
+def release_blobs(db: Session, content_hashes: Iterable[str]) -> int:
+    """删除不再被任何证据（包括尚未清理的软删除证据）引用的文件和提取文本，返回释放的数量"""
+    hashes = sorted({digest for digest in content_hashes if digest})
+    if not hashes:
+        return 0
+    referenced = set(db.execute(
+        select(_evidences.c.content_hash).where(_evidences.c.content_hash.in_(hashes)).distinct()
+    ).scalars())
+    released = 0
+    for digest in hashes:
+        if digest in referenced:
+            continue
+        for path in (storage_root() / blob_key(digest), text_path(digest)):
+            path.unlink(missing_ok=True)
+        released += 1
+    return released
+
+
+def _release(db: Session, evidences: Sequence[Tuple[str, Optional[str]]], counts: Dict[str, int]) -> None:
+    if not evidences:
+        return
+    chunk_store.delete_many(id for id, _ in evidences)
+    counts["blobs"] += release_blobs(db, (digest for _, digest in evidences))
+
+
+def _count(counts: Dict[str, int], table: str, rows: int) -> None:
+    counts[table] += rows
+    if rows:
+        purged_rows_total.inc(rows, table=table)
+
+
+def purge_plans(db: Session, cutoff: datetime, batch_size: int, counts: Dict[str, int]) -> None:
+    while True:
+        ids = _deleted_ids(db, _plans, cutoff, batch_size)
+        if not ids:
+            return
+        evidences = db.execute(
+            select(_evidences.c.id, _evidences.c.content_hash).where(_evidences.c.plan_id.in_(ids))
+        ).all()
+        owned = _evidences.select().with_only_columns(_evidences.c.id).where(_evidences.c.plan_id.in_(ids))
+        cited = set(db.execute(
+            select(_usages.c.evidence_id).where(_usages.c.plan_id.in_(ids)).distinct()
+        ).scalars()) - {id for id, _ in evidences}
+        db.execute(delete(_usages).where(or_(_usages.c.plan_id.in_(ids), _usages.c.evidence_id.in_(owned))))
+        refresh_usage_views(db.connection(), cited)
+        _count(counts, "evidences", db.execute(delete(_evidences).where(_evidences.c.plan_id.in_(ids))).rowcount)
+        db.execute(delete(_outlines).where(_outlines.c.plan_id.in_(ids)))
+        db.execute(delete(_search_documents).where(_search_documents.c.plan_id.in_(ids)))
+        _count(counts, "plans", db.execute(delete(_plans).where(_plans.c.id.in_(ids))).rowcount)
+        db.commit()
+        _release(db, evidences, counts)
+
+
+def purge_evidences(db: Session, cutoff: datetime, batch_size: int, counts: Dict[str, int]) -> None:
+    while True:
+        ids = _deleted_ids(db, _evidences, cutoff, batch_size)
+        if not ids:
+            return
+        evidences = db.execute(
+            select(_evidences.c.id, _evidences.c.content_hash).where(_evidences.c.id.in_(ids))
+        ).all()
+        db.execute(delete(_usages).where(_usages.c.evidence_id.in_(ids)))
+        _count(counts, "evidences", db.execute(delete(_evidences).where(_evidences.c.id.in_(ids))).rowcount)
+        db.commit()
+        _release(db, evidences, counts)
+
+
+def purge_snapshots(db: Session, cutoff: datetime, batch_size: int, counts: Dict[str, int]) -> None:
+    while True:
+        # 仍有企划（删除快照之后新建的，或尚未到清理时间的）的快照留到下一轮
+        ids = list(db.execute(
+            select(_snapshots.c.id)
+            .where(
+                _snapshots.c.deleted_at.isnot(None),
+                _snapshots.c.deleted_at <= cutoff,
+                ~exists().where(_plans.c.requirement_snapshot_id == _snapshots.c.id)
+            )
+            .order_by(_snapshots.c.deleted_at)
+            .limit(batch_size)
+        ).scalars())
+        if not ids:
+            return
+        db.execute(delete(_embeddings).where(_embeddings.c.snapshot_id.in_(ids)))
+        _count(counts, "requirement_snapshots", db.execute(delete(_snapshots).where(_snapshots.c.id.in_(ids))).rowcount)
+        db.commit()
+        for id in ids:
+            similarity_index.remove(id)
+
+
+def purge_deleted(db: Session, now: datetime, batch_size: int, grace_period: float = 0.0) -> Dict[str, int]:
+    """物理删除软删除超过 grace_period 秒的行，返回各表删除的行数和释放的文件数"""
+    cutoff = now - timedelta(seconds=grace_period)
+    counts = {"evidences": 0, "plans": 0, "requirement_snapshots": 0, "blobs": 0}
+    try:
+        purge_plans(db, cutoff, batch_size, counts)
+        purge_evidences(db, cutoff, batch_size, counts)
+        purge_snapshots(db, cutoff, batch_size, counts)
+    except Exception:
+        db.rollback()
+        raise
+    return counts
+
+
+class PurgeScheduler:
+    """周期性清理软删除的数据"""
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        grace_period: Optional[float] = None
+    ):
+        self.interval = settings.PURGE_INTERVAL if interval is None else interval
+        self.batch_size = settings.PURGE_BATCH_SIZE if batch_size is None else batch_size
+        self.grace_period = settings.PURGE_GRACE_PERIOD if grace_period is None else grace_period
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, int]:
+        """执行一轮清理；其他 worker 正在执行时跳过"""
+        async with coordinator.lease("purge", ttl=max(self.interval, 60.0)) as acquired:
+            if not acquired:
+                return {}
+            counts = await asyncio.to_thread(self._run_pass)
+        if any(counts.values()):
+            logger.info(f"Purged soft-deleted rows: {counts}")
+        return counts
+
+    def _run_pass(self) -> Dict[str, int]:
+        db = SessionLocal()
+        try:
+            return purge_deleted(db, datetime.now(timezone.utc), self.batch_size, self.grace_period)
+        finally:
+            db.close()
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Purge pass failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+purge_scheduler = PurgeScheduler()
@@ -0,0 +1,152 @@
+"""
+需求澄清服务
+"""
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any, AsyncIterator, Iterator, List
+from datetime import datetime
+from app.core.coordination import coordinator
+from app.core.search_cache import CACHE_NAME as SEARCH_CACHE_NAME
+from app.core.serialization import dump_row
+from app.models.evidence import Evidence
+from app.models.plan import Plan
+from app.models.requirement import RequirementSnapshot
+from app.models.requirement_embedding import RequirementEmbedding
+from app.schemas.plan import PlanResponse
+from app.schemas.requirement import (
+    RequirementSnapshotCreate,
+    RequirementSnapshotUpdate,
+    RequirementSnapshotImport,
+    RequirementSnapshotResponse
+)
+from app.services.base_service import BaseService
+from app.services.similarity import embedding_rows, requirement_text, similarity_index, snapshot_fields
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RequirementService(BaseService[RequirementSnapshot, RequirementSnapshotCreate, RequirementSnapshotUpdate]):
+    """需求澄清服务"""
+
+    def __init__(self, db: Session):
+        super().__init__(RequirementSnapshot, db)
+
+    async def create_requirement_snapshot(self, requirement_in: RequirementSnapshotCreate) -> RequirementSnapshot:
+        """创建需求快照"""
+        return await self.create(requirement_in)
+
+    async def get_requirement_snapshot(self, requirement_id: str) -> Optional[RequirementSnapshot]:
+        """获取需求快照详情"""
+        return await self.get(requirement_id)
+
+    async def update_requirement_snapshot(
+        self,
+        requirement_id: str,
+        requirement_update: RequirementSnapshotUpdate
+    ) -> Optional[RequirementSnapshot]:
+        """更新需求快照"""
+        return await self.update(requirement_id, requirement_update)
+
+    async def list_requirement_snapshots(self, page: int = 1, size: int = 20) -> Dict[str, Any]:
+        """获取需求快照列表"""
+        return await self.list(page=page, size=size)
+
+    async def delete_requirement_snapshot(self, requirement_id: str) -> bool:
+        """删除需求快照（连同企划和证据软删除，后台清理）"""
+        deleted = await self.delete(requirement_id)
+        if deleted:
+            similarity_index.remove(requirement_id)
+            await coordinator.invalidate(SEARCH_CACHE_NAME)
+        return deleted
+
+    def _soft_delete_children(self, id: str, deleted_at: datetime) -> None:
+        plans = Plan.__table__
+        evidences = Evidence.__table__
+        self.db.execute(
+            update(evidences)
+            .where(
+                evidences.c.plan_id.in_(select(plans.c.id).where(plans.c.requirement_snapshot_id == id)),
+                evidences.c.deleted_at.is_(None)
+            )
+            .values(deleted_at=deleted_at)
+        )
+        self.db.execute(
+            update(plans)
+            .where(plans.c.requirement_snapshot_id == id, plans.c.deleted_at.is_(None))
+            .values(deleted_at=deleted_at)
+        )
+
+    def export_requirement_snapshots(self) -> Iterator[RequirementSnapshot]:
+        """按游标导出全部需求快照"""
+        return self.iter_all()
+
+    async def import_requirement_snapshots(
+        self,
+        stream: AsyncIterator[bytes],
+        on_conflict: str = "skip"
+    ) -> Dict[str, Any]:
+        """从 NDJSON 流批量导入需求快照"""
+        return await self.import_ndjson(stream, RequirementSnapshotImport, on_conflict=on_conflict)
+
+    def _after_bulk_insert(self, rows: List[Dict[str, Any]]) -> None:
+        """批量导入的快照同时写入向量"""
+        if rows:
+            self.db.execute(insert(RequirementEmbedding.__table__), embedding_rows(rows))
+
+    async def find_similar(
+        self,
+        requirement_id: Optional[str] = None,
+        requirement_in: Optional[RequirementSnapshotCreate] = None,
+        k: int = 5,
+        min_score: float = 0.0,
+        plan_status: Optional[str] = "completed"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        查找相似的历史需求快照及其企划
+
+        按已保存快照的ID或未保存的需求内容查询；快照不存在时返回 None。
+        plan_status 为空时返回全部企划，否则只返回该状态的企划。
+        """
+        similarity_index.sync(self.db)
+        exclude = ()
+        if requirement_id is not None:
+            if not await self.get_version(requirement_id):
+                return None
+            vector = similarity_index.vector(requirement_id)
+            if vector is None:
+                snapshot = await self.get(requirement_id)
+                if snapshot is None:
+                    return None
+                vector = similarity_index.embedder.embed(requirement_text(snapshot_fields(snapshot)))
+            exclude = (requirement_id,)
+        else:
+            vector = similarity_index.embedder.embed(requirement_text(requirement_in.model_dump()))
+
+        hits = similarity_index.search(vector, k, exclude=exclude, min_score=min_score)
+        ids = [id for id, _ in hits]
+        snapshots = {
+            snapshot.id: snapshot
+            for snapshot in self.db.query(RequirementSnapshot).filter(RequirementSnapshot.id.in_(ids))
+        } if ids else {}
+        plans: Dict[str, List[Plan]] = {}
+        if snapshots:
+            query = self.db.query(Plan).filter(Plan.requirement_snapshot_id.in_(list(snapshots)))
+            if plan_status:
+                query = query.filter(Plan.status == plan_status)
+            for plan in query.order_by(Plan.completion_score.desc(), Plan.updated_at.desc()):
+                plans.setdefault(plan.requirement_snapshot_id, []).append(plan)
+
+        items = []
+        for id, score in hits:
+            snapshot = snapshots.get(id)
+            if snapshot is None:
+                # 快照已删除（向量随之级联删除），从索引中移除
+                similarity_index.remove(id)
+                continue
+            items.append({
+                "snapshot": dump_row(snapshot, RequirementSnapshotResponse),
+                "score": round(score, 4),
+                "plans": [dump_row(plan, PlanResponse) for plan in plans.get(id, [])],
+            })
+        return {"items": items, "model": similarity_index.embedder.name}
@@ -0,0 +1,343 @@
+"""
+多源联合搜索
+
+所有搜索源通过共享连接池的 httpx 客户端并发查询，总耗时取决于最慢的源而不是各源之和。
+
+- 全局期限：到期仍未返回的源被取消，其余源的结果照常返回并标记为部分结果；
+- 对冲请求：某个源在对冲延迟内未返回时再发起一次相同请求，先返回者生效，另一个被取消。
+  对冲延迟初始取 SEARCH_HEDGE_DELAY，积累足够样本后取该源近期延迟的 p95；
+- 合并排序：按规范化后的 URL 去重，多个源同时命中的结果按 noisy-OR 合并相关性。
+
+mock 源不访问网络，返回由查询确定的结果，用于离线开发和测试。
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import asyncio
+import hashlib
+import logging
+import random
+import time
+
+import httpx
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+search_source_duration_seconds = registry.histogram(
+    "search_source_duration_seconds", "Search source latency", ("source", "status")
+)
+search_hedges_total = registry.counter(
+    "search_hedges_total", "Hedged requests issued to slow search sources", ("source",)
+)
+
+# 计算 p95 对冲延迟所需的最少样本数
+HEDGE_MIN_SAMPLES = 20
+
+
+class SearchHit(BaseModel):
+    """单条搜索结果"""
+    title: str
+    url: str
+    snippet: str = ""
+    score: float = Field(default=0.0, ge=0.0, le=1.0, description="相关性 0-1")
+    sources: List[str] = Field(default_factory=list, description="命中该结果的搜索源")
+
+
+class FederatedSearchResult(BaseModel):
+    """联合搜索结果"""
+    hits: List[SearchHit]
+    sources: Dict[str, str] = Field(default_factory=dict, description="各源状态: ok, timeout, error")
+    partial: bool = False
+
+
+def _position_score(position: int, total: int) -> float:
+    """搜索引擎不返回分数时按排名折算：第一名 1.0，最后一名 0.5"""
+    if total <= 1:
+        return 1.0
+    return 1.0 - 0.5 * position / (total - 1)
+
+
+class SearchSource(ABC):
+    """搜索源基类"""
+
+    name = ""
+    # 未指定 sources 时是否参与搜索
+    default = True
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int) -> List[SearchHit]:
+        """通过共享的客户端查询，返回按相关性排序的结果"""
+
+
+class GoogleSearchSource(SearchSource):
+    """Google Programmable Search (Custom Search JSON API)"""
+
+    name = "google"
+    endpoint = "https://www.googleapis.com/customsearch/v1"
+
+    def available(self) -> bool:
+        return bool(settings.GOOGLE_SEARCH_API_KEY and settings.GOOGLE_SEARCH_ENGINE_ID)
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int) -> List[SearchHit]:
+        response = await client.get(self.endpoint, params={
+            "key": settings.GOOGLE_SEARCH_API_KEY,
+            "cx": settings.GOOGLE_SEARCH_ENGINE_ID,
+            "q": query,
+            "num": min(max_results, 10),
+        })
+        response.raise_for_status()
+        items = response.json().get("items", [])
+        return [
+            SearchHit(
+                title=item.get("title", ""),
+                url=item["link"],
+                snippet=item.get("snippet", ""),
+                score=_position_score(position, len(items)),
+                sources=[self.name]
+            )
+            for position, item in enumerate(items)
+            if item.get("link")
+        ]
+
+
+class BingSearchSource(SearchSource):
+    """Bing Web Search API"""
+
+    name = "bing"
+    endpoint = "https://api.bing.microsoft.com/v7.0/search"
+
+    def available(self) -> bool:
+        return bool(settings.BING_SEARCH_API_KEY)
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int) -> List[SearchHit]:
+        response = await client.get(
+            self.endpoint,
+            params={"q": query, "count": min(max_results, 50)},
+            headers={"Ocp-Apim-Subscription-Key": settings.BING_SEARCH_API_KEY}
+        )
+        response.raise_for_status()
+        items = response.json().get("webPages", {}).get("value", [])
+        return [
+            SearchHit(
+                title=item.get("name", ""),
+                url=item["url"],
+                snippet=item.get("snippet", ""),
+                score=_position_score(position, len(items)),
+                sources=[self.name]
+            )
+            for position, item in enumerate(items)
+            if item.get("url")
+        ]
+
+
+class MockSearchSource(SearchSource):
+    """离线 mock 源：结果由查询确定，可模拟延迟、抖动和失败"""
+
+    name = "mock"
+    default = False
+
+    def __init__(self, latency: float = 0.02, jitter: float = 0.0, failure_rate: float = 0.0, results: int = 10):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.results = results
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int) -> List[SearchHit]:
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("mock source failure")
+        count = min(max_results, self.results)
+        hits = []
+        for position in range(count):
+            digest = hashlib.blake2b(f"{query}:{position}".encode("utf-8"), digest_size=6).hexdigest()
+            hits.append(SearchHit(
+                title=f"{query} - 参考资料 {position + 1}",
+                url=f"https://example.com/mock/{digest}",
+                snippet=f"关于“{query}”的示例内容（mock 源第 {position + 1} 条）",
+                score=_position_score(position, count),
+                sources=[self.name]
+            ))
+        return hits
+
+
+def canonical_url(url: str) -> str:
+    """用于去重的 URL：忽略协议、www 前缀、末尾斜杠、片段和 utm_* 参数"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_")
+    ))
+    return urlunsplit(("", host, parts.path.rstrip("/"), query, ""))
+
+
+def merge_hits(results: Sequence[List[SearchHit]], max_results: int) -> List[SearchHit]:
+    """按 URL 合并各源结果，多源命中时相关性按 noisy-OR 合并，再按相关性排序"""
+    merged: Dict[str, SearchHit] = {}
+    for hits in results:
+        for hit in hits:
+            key = canonical_url(hit.url)
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = hit.model_copy()
+                continue
+            existing.score = 1.0 - (1.0 - existing.score) * (1.0 - hit.score)
+            existing.sources = existing.sources + [s for s in hit.sources if s not in existing.sources]
+            if len(hit.snippet) > len(existing.snippet):
+                existing.snippet = hit.snippet
+    ranked = sorted(merged.values(), key=lambda hit: (hit.score, len(hit.sources)), reverse=True)
+    return ranked[:max_results]
+
+
+class FederatedSearchEngine:
+    """并发查询多个搜索源的联合搜索引擎"""
+
+    def __init__(
+        self,
+        sources: Sequence[SearchSource],
+        deadline: Optional[float] = None,
+        hedge_delay: Optional[float] = None,
+        max_hedges: Optional[int] = None
+    ):
+        self.sources = {source.name: source for source in sources}
+        self.deadline = settings.SEARCH_DEADLINE if deadline is None else deadline
+        self.hedge_delay = settings.SEARCH_HEDGE_DELAY if hedge_delay is None else hedge_delay
+        self.max_hedges = settings.SEARCH_MAX_HEDGES if max_hedges is None else max_hedges
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """各源共享的连接池，首次使用时创建"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.deadline),
+                limits=httpx.Limits(
+                    max_connections=settings.SEARCH_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SEARCH_HTTP_MAX_CONNECTIONS
+                ),
+                follow_redirects=True
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def default_sources(self) -> List[str]:
+        """已配置且默认参与搜索的源"""
+        return [name for name, source in self.sources.items() if source.default and source.available()]
+
+    def _hedge_delay(self, name: str) -> float:
+        samples = self._latencies.get(name)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return self.hedge_delay
+        ordered = sorted(samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def _record_latency(self, name: str, seconds: float) -> None:
+        self._latencies.setdefault(name, deque(maxlen=200)).append(seconds)
+
+    async def _query_source(self, source: SearchSource, query: str, max_results: int) -> List[SearchHit]:
+        """查询单个源；超过对冲延迟或失败时再发起请求，先成功者生效"""
+        started = time.monotonic()
+        attempts = [asyncio.create_task(source.search(self.client, query, max_results))]
+        launched = 1
+        delay = self._hedge_delay(source.name)
+        error: Optional[BaseException] = None
+        try:
+            while attempts:
+                can_hedge = launched <= self.max_hedges
+                done, _ = await asyncio.wait(
+                    attempts,
+                    timeout=delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    search_hedges_total.inc(source=source.name)
+                    attempts.append(asyncio.create_task(source.search(self.client, query, max_results)))
+                    launched += 1
+                    continue
+                for task in done:
+                    attempts.remove(task)
+                    if task.exception() is None:
+                        elapsed = time.monotonic() - started
+                        self._record_latency(source.name, elapsed)
+                        search_source_duration_seconds.observe(elapsed, source=source.name, status="ok")
+                        return task.result()
+                    error = task.exception()
+                if not attempts and launched <= self.max_hedges:
+                    # 全部失败且还有对冲名额时立即重试
+                    attempts.append(asyncio.create_task(source.search(self.client, query, max_results)))
+                    launched += 1
+            raise error
+        except asyncio.CancelledError:
+            search_source_duration_seconds.observe(time.monotonic() - started, source=source.name, status="timeout")
+            raise
+        except Exception:
+            search_source_duration_seconds.observe(time.monotonic() - started, source=source.name, status="error")
+            raise
+        finally:
+            # 取消仍在进行的对冲请求，并等待它们结束，释放连接
+            for task in attempts:
+                task.cancel()
+            await asyncio.gather(*attempts, return_exceptions=True)
+
+    async def search(
+        self,
+        query: str,
+        sources: Sequence[str],
+        max_results: int,
+        deadline: Optional[float] = None
+    ) -> FederatedSearchResult:
+        """在期限内并发查询各源，返回合并排序后的结果"""
+        status: Dict[str, str] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in dict.fromkeys(sources):
+            source = self.sources.get(name)
+            if source is None or not source.available():
+                status[name] = "unavailable"
+                continue
+            tasks[name] = asyncio.create_task(self._query_source(source, query, max_results))
+
+        if tasks:
+            _, pending = await asyncio.wait(tasks.values(), timeout=self.deadline if deadline is None else deadline)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        results = []
+        for name, task in tasks.items():
+            if task.cancelled():
+                status[name] = "timeout"
+            elif task.exception() is not None:
+                logger.warning(f"Search source {name} failed: {task.exception()}")
+                status[name] = "error"
+            else:
+                status[name] = "ok"
+                results.append(task.result())
+
+        return FederatedSearchResult(
+            hits=merge_hits(results, max_results),
+            sources=status,
+            partial=any(value in ("timeout", "error") for value in status.values())
+        )
+
+
+search_engine = FederatedSearchEngine([
+    GoogleSearchSource(),
+    BingSearchSource(),
+    MockSearchSource(),
+])
@@ -0,0 +1,360 @@
+"""
+相似需求检索
+
+需求快照的问题陈述、目标、约束和受众拼接后生成归一化向量，保存在 requirement_embeddings 表中：
+快照在会话 flush 时新建或上述字段变化会同步重新计算，批量导入由 RequirementService 一并写入。
+
+每个进程在内存中维护一份向量索引，查询前按 updated_at 水位线只加载新增或变化的向量，
+多个 worker 各自增量同步，不需要额外的通知；软删除的快照按 deleted_at 水位线从索引中移除。相似度为余弦相似度（向量已归一化，即内积）；
+安装了 numpy 时整批矩阵运算，否则利用查询向量的稀疏性逐行计算。
+
+向量模型：
+- hashing（默认）：分词和汉字二元组经特征哈希映射到固定维度，无需下载模型，适合找出
+  措辞接近的同类需求；
+- sentence-transformers：语义向量，模型由 SIMILARITY_MODEL 指定，首次使用时加载。
+
+切换模型后旧向量不再参与检索，启动时由持有租约的 worker 按新模型补全（run_embedding_backfill）。
+"""
+
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import threading
+
+from sqlalchemy import event, func, inspect as sa_inspect, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.coordination import coordinator
+from app.core.database import SessionLocal
+from app.core.lazy import lazy_import, register_warmup
+from app.core.search_cache import normalize_query
+from app.models.requirement import RequirementSnapshot
+from app.models.requirement_embedding import RequirementEmbedding
+
+logger = logging.getLogger(__name__)
+
+# 只有使用 sentence-transformers 向量时才需要预热，由 SentenceTransformerEmbedder 注册模型加载
+sentence_transformers = lazy_import("sentence_transformers", warmup=False)
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - 可选依赖
+    numpy = None
+
+# 参与相似度计算的快照字段，其余字段变化不触发重新计算
+SIMILARITY_FIELDS = ("problem_statement", "objectives", "constraints", "audience")
+
+# 增量同步时回看的时间窗口，覆盖时间戳较早但提交较晚的写入
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def requirement_text(fields: Mapping[str, Any]) -> str:
+    """拼接参与相似度计算的字段"""
+    parts = [fields.get("problem_statement") or ""]
+    parts.extend(str(item) for item in fields.get("objectives") or [])
+    constraints = fields.get("constraints") or {}
+    for key in ("time", "budget"):
+        if constraints.get(key) is not None:
+            parts.append(f"{key} {constraints[key]}")
+    for key in ("compliance", "resources"):
+        parts.extend(str(item) for item in constraints.get(key) or [])
+    if fields.get("audience"):
+        parts.append(fields["audience"])
+    return "\n".join(part for part in parts if part)
+
+
+def snapshot_fields(snapshot: RequirementSnapshot) -> Dict[str, Any]:
+    return {name: getattr(snapshot, name) for name in SIMILARITY_FIELDS}
+
+
+def _is_cjk(char: str) -> bool:
+    return "\u4e00" <= char <= "\u9fff"
+
+
+class HashingEmbedder:
+    """特征哈希向量：词和汉字二元组按哈希值映射到维度，带符号累加后归一化"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        # 特征取自 normalize_query 的切分，切分规则变化时更换版本号，旧向量在启动时重算
+        self.name = f"hashing-v2-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for token in normalize_query(text).split():
+            features.append(token)
+            # 未安装 jieba 时整段汉字是一个词，二元组保证部分重合的表述仍然相近
+            if len(token) > 2 and _is_cjk(token[0]):
+                features.extend(token[i:i + 2] for i in range(len(token) - 1))
+        return features
+
+    def embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for feature, count in Counter(self._features(text)).items():
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += (1.0 + math.log(count)) * (1.0 if (h >> 63) & 1 else -1.0)
+        return _normalize(vector)
+
+
+class SentenceTransformerEmbedder:
+    """sentence-transformers 语义向量"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.name = f"st:{model_name}"
+        self._model = None
+        self._lock = threading.Lock()
+        register_warmup(self.load_model)
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def model(self):
+        return self.load_model()
+
+    def load_model(self):
+        """加载模型（预热阶段提前调用）"""
+        with self._lock:
+            if self._model is None:
+                self._model = sentence_transformers.SentenceTransformer(self.model_name)
+        return self._model
+
+    def embed(self, text: str) -> List[float]:
+        return self.model.encode(text, normalize_embeddings=True).tolist()
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(data: bytes) -> array:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector
+
+
+class SimilarityIndex:
+    """内存中的向量索引，按 updated_at 水位线增量同步"""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._rows: List[array] = []
+        self._matrix = None
+        self._watermark: Optional[datetime] = None
+        self._deleted_watermark: Optional[datetime] = None
+        # 上次同步时向量表的 (最大 updated_at, 行数) 和快照的最大 deleted_at，未变化时跳过加载
+        self._version: Tuple[Any, ...] = ()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def upsert(self, id: str, vector: array) -> None:
+        with self._lock:
+            position = self._positions.get(id)
+            if position is None:
+                position = len(self._ids)
+                self._positions[id] = position
+                self._ids.append(id)
+                self._rows.append(vector)
+            else:
+                self._rows[position] = vector
+            if numpy is not None:
+                self._store_row(position, vector)
+
+    def _store_row(self, position: int, vector: array) -> None:
+        if self._matrix is None or position >= self._matrix.shape[0]:
+            grown = numpy.zeros((max(1024, (position + 1) * 2), len(vector)), dtype=numpy.float32)
+            if self._matrix is not None:
+                grown[:self._matrix.shape[0]] = self._matrix
+            self._matrix = grown
+        self._matrix[position] = numpy.frombuffer(vector, dtype=numpy.float32)
+
+    def remove(self, id: str) -> None:
+        """删除向量，用最后一行填补空位"""
+        with self._lock:
+            position = self._positions.pop(id, None)
+            if position is None:
+                return
+            last_id, last_row = self._ids.pop(), self._rows.pop()
+            if position < len(self._ids):
+                self._ids[position] = last_id
+                self._rows[position] = last_row
+                self._positions[last_id] = position
+                if self._matrix is not None:
+                    self._matrix[position] = self._matrix[len(self._ids)]
+
+    def vector(self, id: str) -> Optional[array]:
+        position = self._positions.get(id)
+        return self._rows[position] if position is not None else None
+
+    def search(
+        self,
+        vector: Sequence[float],
+        k: int,
+        exclude: Iterable[str] = (),
+        min_score: float = 0.0
+    ) -> List[Tuple[str, float]]:
+        """返回与查询向量最相似的 k 个 (快照ID, 相似度)"""
+        excluded = set(exclude)
+        with self._lock:
+            size = len(self._ids)
+            if not size or k <= 0:
+                return []
+            candidates = min(size, k + len(excluded))
+            if numpy is not None and self._matrix is not None:
+                scores = self._matrix[:size] @ numpy.asarray(vector, dtype=numpy.float32)
+                top = numpy.argpartition(-scores, candidates - 1)[:candidates] if candidates < size else numpy.arange(size)
+                ranked = [(self._ids[i], float(scores[i])) for i in top]
+            else:
+                sparse = [(i, value) for i, value in enumerate(vector) if value]
+                ranked = heapq.nlargest(candidates, (
+                    (id, sum(row[i] * value for i, value in sparse))
+                    for id, row in zip(self._ids, self._rows)
+                ), key=lambda item: item[1])
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return [(id, score) for id, score in ranked if id not in excluded and score >= min_score][:k]
+
+    def sync(self, db: Session) -> int:
+        """加载水位线之后新增或变化的向量并移除软删除的快照，返回加载的数量"""
+        current = tuple(db.query(func.max(RequirementEmbedding.updated_at), func.count()).filter(
+            RequirementEmbedding.model == self.embedder.name
+        ).one())
+        deleted_at = db.query(func.max(RequirementSnapshot.deleted_at)).execution_options(include_deleted=True).scalar()
+        current += (deleted_at,)
+        if current == self._version:
+            return 0
+
+        if self._version and deleted_at is not None:
+            # 其他 worker 软删除的快照（向量在清理时才级联删除）
+            deleted = db.query(RequirementSnapshot.id).filter(RequirementSnapshot.deleted_at.isnot(None))
+            if self._deleted_watermark is not None:
+                deleted = deleted.filter(RequirementSnapshot.deleted_at >= self._deleted_watermark - SYNC_OVERLAP)
+            for id, in deleted.execution_options(include_deleted=True):
+                self.remove(id)
+        self._deleted_watermark = deleted_at
+
+        query = db.query(
+            RequirementEmbedding.snapshot_id, RequirementEmbedding.vector, RequirementEmbedding.updated_at,
+            RequirementSnapshot.deleted_at
+        ).join(RequirementSnapshot).filter(
+            RequirementEmbedding.model == self.embedder.name
+        ).execution_options(include_deleted=True)
+        if self._watermark is not None and self._watermark > datetime.min + SYNC_OVERLAP:
+            query = query.filter(RequirementEmbedding.updated_at >= self._watermark - SYNC_OVERLAP)
+        count = 0
+        watermark = self._watermark
+        for snapshot_id, data, updated_at, deleted in query.execution_options(stream_results=True).yield_per(1000):
+            if deleted is not None:
+                self.remove(snapshot_id)
+            else:
+                self.upsert(snapshot_id, unpack_vector(data))
+                count += 1
+            if updated_at is not None and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+        self._watermark = watermark or datetime.min
+        self._version = current
+        return count
+
+
+def embedding_values(fields: Mapping[str, Any]) -> Dict[str, Any]:
+    vector = embedder.embed(requirement_text(fields))
+    return {"model": embedder.name, "dim": len(vector), "vector": pack_vector(vector)}
+
+
+def embed_snapshot(snapshot: RequirementSnapshot) -> None:
+    """重新计算快照的向量，新建或更新对应的 RequirementEmbedding"""
+    values = embedding_values(snapshot_fields(snapshot))
+    if snapshot.embedding is None:
+        snapshot.embedding = RequirementEmbedding(**values)
+    elif snapshot.embedding.vector != values["vector"] or snapshot.embedding.model != values["model"]:
+        for key, value in values.items():
+            setattr(snapshot.embedding, key, value)
+
+
+def embedding_rows(rows: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """批量插入用的向量行"""
+    now = datetime.now(timezone.utc)
+    return [{"snapshot_id": row["id"], "updated_at": now, **embedding_values(row)} for row in rows]
+
+
+def backfill_embeddings(db: Session, batch_size: int = 500) -> int:
+    """为没有向量或向量模型已更换的快照计算向量"""
+    count = 0
+    while True:
+        snapshots = (
+            db.query(RequirementSnapshot)
+            .outerjoin(RequirementEmbedding)
+            .filter(or_(RequirementEmbedding.snapshot_id.is_(None), RequirementEmbedding.model != embedder.name))
+            .limit(batch_size)
+            .all()
+        )
+        if not snapshots:
+            return count
+        for snapshot in snapshots:
+            embed_snapshot(snapshot)
+        db.commit()
+        count += len(snapshots)
+        logger.info(f"Backfilled {count} requirement embeddings")
+
+
+async def run_embedding_backfill() -> int:
+    """启动时补全缺失或模型已更换的向量；其他 worker 正在执行时跳过"""
+    async with coordinator.lease("requirement_embedding_backfill", ttl=600.0) as acquired:
+        if not acquired:
+            return 0
+
+        def run() -> int:
+            db = SessionLocal()
+            try:
+                return backfill_embeddings(db)
+            finally:
+                db.close()
+
+        try:
+            return await asyncio.to_thread(run)
+        except Exception as e:
+            logger.error(f"Requirement embedding backfill failed: {e}")
+            return 0
+
+
+def _fields_changed(snapshot: RequirementSnapshot) -> bool:
+    attrs = sa_inspect(snapshot).attrs
+    return any(attrs[name].history.has_changes() for name in SIMILARITY_FIELDS)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _embed_on_flush(session, flush_context, instances) -> None:
+    """新建的快照以及相关字段有变化的快照在同一次 flush 中更新向量"""
+    for obj in list(session.new):
+        if isinstance(obj, RequirementSnapshot):
+            embed_snapshot(obj)
+    for obj in list(session.dirty):
+        if isinstance(obj, RequirementSnapshot) and _fields_changed(obj):
+            embed_snapshot(obj)
+
+
+def create_embedder():
+    if settings.SIMILARITY_EMBEDDER == "sentence-transformers":
+        return SentenceTransformerEmbedder(settings.SIMILARITY_MODEL)
+    return HashingEmbedder(settings.SIMILARITY_HASH_DIM)
+
+
+embedder = create_embedder()
+similarity_index = SimilarityIndex(embedder)
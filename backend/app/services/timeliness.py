@@ -0,0 +1,260 @@
+"""
+证据时效性评分的增量重算
+
+时效性评分随内容年龄按半衰期衰减：0.5 ** (年龄 / EVIDENCE_TIMELINESS_HALF_LIFE)，年龄从
+published_at（抓取时取 Last-Modified）起算，没有时从入库时间起算。
+
+保存的评分取最接近的 EVIDENCE_TIMELINESS_STEP 的整数倍，只有越过下一个台阶时才变化。每条证据记录
+评分下次变化的时间 timeliness_due_at（向上取整到 EVIDENCE_TIMELINESS_BUCKET，同一个桶内到期的
+证据在同一轮重算）。调度器按索引只读取到期的行，算出新评分和下次到期时间后按主键批量 UPDATE。
+
+评分确有变化时，相关企划标记为待重新计算完成度（scores_stale），依赖评分的缓存随之失效，
+下次刷新时间按新评分重新计算；
+手动设置过时效性评分的证据不再衰减（timeliness_due_at 为空），直到发布时间变化。
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import math
+
+from sqlalchemy import bindparam, event, inspect as sa_inspect, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.coordination import coordinator
+from app.core.database import SessionLocal
+from app.core.metrics import registry
+from app.core.search_cache import CACHE_NAME
+from app.models.evidence import Evidence
+from app.models.plan import Plan
+from app.services.evidence_fetcher import refresh_due_at
+
+logger = logging.getLogger(__name__)
+
+timeliness_rescored_total = registry.counter(
+    "timeliness_rescored_total", "Evidence timeliness re-scoring results", ("result",)
+)
+
+# 参与质量评分的字段，变化时相关企划需要重新计算完成度
+SCORE_FIELDS = ("relevance_score", "authority_score", "timeliness_score")
+
+_evidences = Evidence.__table__
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def timeliness(
+    published_at: Optional[datetime],
+    created_at: Optional[datetime],
+    now: datetime
+) -> Tuple[float, Optional[datetime]]:
+    """返回 (取整后的评分, 评分下次变化的时间)；评分已降到最低台阶时下次变化时间为 None"""
+    base = published_at or created_at
+    if base is None:
+        base = now
+    base = _aware(base)
+    half_life = settings.EVIDENCE_TIMELINESS_HALF_LIFE
+    step = settings.EVIDENCE_TIMELINESS_STEP
+    age = max((now - base).total_seconds(), 0.0)
+    level = round(0.5 ** (age / half_life) / step)
+    if level <= 0:
+        return 0.0, None
+    # 精确评分降到当前台阶与下一台阶中点的时刻即评分变化的时刻，向上取整到桶边界
+    crossing = base.timestamp() + half_life * math.log2(1.0 / ((level - 0.5) * step)) + 1.0
+    bucket = settings.EVIDENCE_TIMELINESS_BUCKET
+    due = math.ceil(crossing / bucket) * bucket
+    return round(min(level * step, 1.0), 6), datetime.fromtimestamp(due, timezone.utc)
+
+
+def score_evidence(evidence: Evidence, now: Optional[datetime] = None) -> None:
+    evidence.timeliness_score, evidence.timeliness_due_at = timeliness(
+        evidence.published_at, evidence.created_at, now or datetime.now(timezone.utc)
+    )
+
+
+def mark_plans_stale(connection, plan_ids: Iterable[str]) -> int:
+    """把企划标记为待重新计算完成度，已标记的不重复更新"""
+    ids = sorted({id for id in plan_ids if id})
+    if not ids:
+        return 0
+    count = 0
+    for start in range(0, len(ids), 500):
+        result = connection.execute(
+            update(Plan.__table__)
+            .where(Plan.__table__.c.id.in_(ids[start:start + 500]), Plan.__table__.c.scores_stale.isnot(True))
+            .values(scores_stale=True)
+        )
+        count += result.rowcount or 0
+    return count
+
+
+def rescore_due(db: Session, now: datetime, batch_size: int) -> Dict[str, int]:
+    """
+    重算 timeliness_due_at 已到期的证据，返回 {changed, unchanged, plans}
+
+    评分变化的行连同下次到期时间一起更新（updated_at 随之变化，ETag 和上下文缓存失效）；
+    评分未变的行只推迟到期时间，保留原 updated_at。
+    """
+    counts = {"changed": 0, "unchanged": 0, "plans": 0}
+    score_changed = (
+        update(_evidences)
+        .where(_evidences.c.id == bindparam("_id"))
+        .values(
+            timeliness_score=bindparam("_score"),
+            timeliness_due_at=bindparam("_due"),
+            refresh_due_at=bindparam("_refresh")
+        )
+    )
+    due_only = (
+        update(_evidences)
+        .where(_evidences.c.id == bindparam("_id"))
+        .values(timeliness_due_at=bindparam("_due"), updated_at=_evidences.c.updated_at)
+    )
+    while True:
+        rows = db.execute(
+            _evidences.select()
+            .with_only_columns(
+                _evidences.c.id, _evidences.c.plan_id, _evidences.c.published_at,
+                _evidences.c.created_at, _evidences.c.timeliness_score, _evidences.c.fetched_at
+            )
+            .where(_evidences.c.timeliness_due_at <= now)
+            .order_by(_evidences.c.timeliness_due_at)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        changed: List[Dict] = []
+        unchanged: List[Dict] = []
+        plan_ids = set()
+        for id, plan_id, published_at, created_at, current, fetched_at in rows:
+            score, due = timeliness(published_at, created_at, now)
+            params = {"_id": id, "_score": score, "_due": due}
+            if current is None or abs(score - current) > 1e-9:
+                changed.append({**params, "_refresh": refresh_due_at(fetched_at, score)})
+                plan_ids.add(plan_id)
+            else:
+                unchanged.append(params)
+        if changed:
+            db.execute(score_changed, changed)
+        if unchanged:
+            db.execute(due_only, unchanged)
+        counts["plans"] += mark_plans_stale(db.connection(), plan_ids)
+        db.commit()
+        counts["changed"] += len(changed)
+        counts["unchanged"] += len(unchanged)
+        if len(rows) < batch_size:
+            break
+    return counts
+
+
+def backfill_timeliness(db: Session, now: datetime, batch_size: int) -> int:
+    """为尚未评分（评分为空或 0 且没有到期时间）的证据计算评分和到期时间"""
+    count = 0
+    last_id = ""
+    while True:
+        evidences = (
+            db.query(Evidence)
+            .filter(
+                Evidence.id > last_id,
+                Evidence.timeliness_due_at.is_(None),
+                or_(Evidence.timeliness_score.is_(None), Evidence.timeliness_score == 0.0)
+            )
+            .order_by(Evidence.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not evidences:
+            return count
+        for evidence in evidences:
+            score_evidence(evidence, now)
+        last_id = evidences[-1].id
+        db.commit()
+        count += len(evidences)
+
+
+def _scores_changed(evidence: Evidence) -> bool:
+    attrs = sa_inspect(evidence).attrs
+    return any(attrs[name].history.has_changes() for name in SCORE_FIELDS)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _score_on_flush(session, flush_context, instances) -> None:
+    """新建的证据计算时效性评分；手动设置评分后停止衰减；评分变化时标记相关企划"""
+    stale = set()
+    now = datetime.now(timezone.utc)
+    for obj in list(session.new):
+        if isinstance(obj, Evidence) and not obj.timeliness_score:
+            score_evidence(obj, now)
+    for obj in list(session.dirty):
+        if not isinstance(obj, Evidence):
+            continue
+        attrs = sa_inspect(obj).attrs
+        if attrs.timeliness_score.history.has_changes() and not attrs.timeliness_due_at.history.has_changes():
+            obj.timeliness_due_at = None
+        elif attrs.published_at.history.has_changes():
+            score_evidence(obj, now)
+        if _scores_changed(obj):
+            stale.add(obj.plan_id)
+    if stale:
+        mark_plans_stale(session.connection(), stale)
+
+
+class TimelinessScheduler:
+    """周期性重算到期的时效性评分"""
+
+    def __init__(self, interval: Optional[float] = None, batch_size: Optional[int] = None):
+        self.interval = settings.EVIDENCE_TIMELINESS_INTERVAL if interval is None else interval
+        self.batch_size = settings.EVIDENCE_TIMELINESS_BATCH if batch_size is None else batch_size
+        self._backfilled = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, int]:
+        """执行一轮重算；其他 worker 正在执行时跳过"""
+        async with coordinator.lease("timeliness_rescore", ttl=max(self.interval, 60.0)) as acquired:
+            if not acquired:
+                return {}
+            counts = await asyncio.to_thread(self._run_pass)
+        for result in ("changed", "unchanged"):
+            if counts[result]:
+                timeliness_rescored_total.inc(counts[result], result=result)
+        if counts["changed"]:
+            # 本地检索结果包含评分
+            await coordinator.invalidate(CACHE_NAME)
+            logger.info(f"Timeliness re-scoring: {counts}")
+        return counts
+
+    def _run_pass(self) -> Dict[str, int]:
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            if not self._backfilled:
+                backfill_timeliness(db, now, self.batch_size)
+                self._backfilled = True
+            return rescore_due(db, now, self.batch_size)
+        finally:
+            db.close()
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Timeliness re-scoring failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+timeliness_scheduler = TimelinessScheduler()
@@ -0,0 +1,270 @@
+"""
+API 负载基准：在 SQLite 上驱动 FastAPI 应用，覆盖需求快照、企划、证据的增删改查
+
+按配置的数据量预先写入数据，再以指定并发对每个场景发起请求，报告吞吐量和
+p50/p95/p99 延迟，并与保存的基线对比以发现 BaseService 或模式层的性能回归。
+
+用法:
+    python -m benchmarks.bench_api --rows 10000 --concurrency 16 --requests 2000
+    python -m benchmarks.bench_api --rows 1000000 --scenarios plan.list,plan.get
+    python -m benchmarks.bench_api --save-baseline
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = BACKEND_DIR / "benchmarks" / "baselines" / "api.json"
+API_PREFIX = "/api/v1"
+SAMPLE_IDS = 10000  # 每张表保留用于读写请求的 ID 样本数量
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+class IdSample:
+    """蓄水池采样，数据量很大时只保留固定数量的 ID"""
+
+    def __init__(self, capacity: int, rng: random.Random):
+        self.capacity = capacity
+        self.rng = rng
+        self.ids: List[str] = []
+        self.seen = 0
+
+    def add(self, id: str) -> None:
+        self.seen += 1
+        if len(self.ids) < self.capacity:
+            self.ids.append(id)
+        else:
+            index = self.rng.randrange(self.seen)
+            if index < self.capacity:
+                self.ids[index] = id
+
+    def pick(self) -> str:
+        return self.rng.choice(self.ids)
+
+
+def seed(engine, rows: int, plan_tasks: int, rng: random.Random, chunk_size: int = 5000) -> Dict[str, IdSample]:
+    """用批量 INSERT 写入基准数据"""
+    from app.models import Evidence, Plan, RequirementSnapshot
+    from benchmarks.data import evidence_fields, plan_fields, requirement_fields
+
+    samples = {name: IdSample(SAMPLE_IDS, rng) for name in ("requirement", "plan", "evidence")}
+    snapshot_ids: List[str] = []
+    plan_ids: List[str] = []
+
+    def insert(table, make_row: Callable[[int], Dict[str, Any]], sample: IdSample, keep: List[str] = None):
+        for start in range(0, rows, chunk_size):
+            batch = []
+            for index in range(start, min(rows, start + chunk_size)):
+                row = make_row(index)
+                row["id"] = str(uuid.uuid4())
+                sample.add(row["id"])
+                if keep is not None:
+                    keep.append(row["id"])
+                batch.append(row)
+            with engine.begin() as conn:
+                conn.execute(table.insert(), batch)
+
+    insert(RequirementSnapshot.__table__, requirement_fields, samples["requirement"], snapshot_ids)
+    insert(
+        Plan.__table__,
+        lambda i: plan_fields(i, snapshot_ids[i], tasks=plan_tasks, milestones=5, risks=5),
+        samples["plan"],
+        plan_ids
+    )
+    snapshot_ids.clear()
+    insert(Evidence.__table__, lambda i: evidence_fields(i, rng.choice(plan_ids)), samples["evidence"])
+    return samples
+
+
+def build_scenarios(samples: Dict[str, IdSample], rows: int, size: int, max_page: int,
+                    plan_tasks: int, rng: random.Random) -> Dict[str, Callable]:
+    """场景名 -> 生成 (method, url, json) 的函数"""
+    from benchmarks.data import evidence_fields, plan_fields, requirement_fields
+
+    last_page = max(1, min(max_page, rows // size))
+
+    def page() -> Dict[str, int]:
+        return {"page": rng.randint(1, last_page), "size": size}
+
+    def plan_create():
+        body = plan_fields(rng.randrange(rows), samples["requirement"].pick(), tasks=plan_tasks, milestones=5, risks=5)
+        body.pop("status")
+        body.pop("completion_score")
+        return "POST", f"{API_PREFIX}/plan/", None, body
+
+    def evidence_create():
+        body = evidence_fields(rng.randrange(rows), samples["plan"].pick())
+        for key in ("relevance_score", "authority_score", "timeliness_score", "status"):
+            body.pop(key)
+        return "POST", f"{API_PREFIX}/evidence/", None, body
+
+    return {
+        "requirement.create": lambda: ("POST", f"{API_PREFIX}/requirement/", None, requirement_fields(rng.randrange(rows))),
+        "requirement.get": lambda: ("GET", f"{API_PREFIX}/requirement/{samples['requirement'].pick()}", None, None),
+        "requirement.list": lambda: ("GET", f"{API_PREFIX}/requirement/", page(), None),
+        "requirement.update": lambda: (
+            "PUT", f"{API_PREFIX}/requirement/{samples['requirement'].pick()}", None,
+            {"audience": f"受众 {rng.randrange(rows)}"}
+        ),
+        "plan.create": plan_create,
+        "plan.get": lambda: ("GET", f"{API_PREFIX}/plan/{samples['plan'].pick()}", None, None),
+        "plan.list": lambda: ("GET", f"{API_PREFIX}/plan/", page(), None),
+        "plan.update": lambda: (
+            "PUT", f"{API_PREFIX}/plan/{samples['plan'].pick()}", None,
+            {"completion_score": rng.randint(0, 100)}
+        ),
+        "evidence.create": evidence_create,
+        "evidence.get": lambda: ("GET", f"{API_PREFIX}/evidence/{samples['evidence'].pick()}", None, None),
+        "evidence.list": lambda: ("GET", f"{API_PREFIX}/evidence/", page(), None),
+        "evidence.update": lambda: (
+            "PUT", f"{API_PREFIX}/evidence/{samples['evidence'].pick()}", None,
+            {"relevance_score": round(rng.random(), 3)}
+        ),
+    }
+
+
+async def run_scenario(client, make_request: Callable, requests: int, concurrency: int) -> Dict[str, Any]:
+    """以固定并发执行一个场景，返回吞吐量和延迟分位数"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, url, params, body = make_request()
+            start = time.perf_counter()
+            response = await client.request(method, url, params=params, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """与基线对比吞吐量和 p95 延迟"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: 吞吐量 {result['throughput_rps']} < 基线 {base['throughput_rps']}")
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms > 基线 {base['p95_ms']}ms")
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: 错误数 {result['errors']} > 基线 {base.get('errors', 0)}")
+    return regressions
+
+
+async def run(args, db_path: str) -> Dict[str, Dict[str, Any]]:
+    # 应用在导入时根据环境变量创建数据库引擎，必须先设置环境变量再导入
+    os.environ.update(DATABASE_URL=f"sqlite:///{db_path}", DEBUG="false", LOG_FILE=f"{Path(db_path).parent}/app.log")
+    import httpx
+    from app.core.database import Base, engine
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    Base.metadata.create_all(bind=engine)
+
+    start = time.perf_counter()
+    samples = seed(engine, args.rows, args.plan_tasks, rng)
+    print(f"写入 {args.rows} 行 x 3 张表，耗时 {time.perf_counter() - start:.1f}s")
+
+    scenarios = build_scenarios(samples, args.rows, args.size, args.max_page, args.plan_tasks, rng)
+    selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"未知场景: {', '.join(unknown)}，可选: {', '.join(scenarios)}")
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'scenario':<20}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name in selected:
+            # 少量预热请求，不计入结果
+            await run_scenario(client, scenarios[name], min(20, args.requests), 1)
+            result = results[name] = await run_scenario(client, scenarios[name], args.requests, args.concurrency)
+            print(
+                f"{name:<20}{result['throughput_rps']:>10}{result['p50_ms']:>10}"
+                f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="每张表预先写入的行数（10k-1M）")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发请求数")
+    parser.add_argument("--requests", type=int, default=1000, help="每个场景的请求数")
+    parser.add_argument("--scenarios", default="", help="逗号分隔的场景名，默认全部")
+    parser.add_argument("--size", type=int, default=20, help="列表接口每页数量")
+    parser.add_argument("--max-page", type=int, default=50, help="列表接口随机访问的最大页码")
+    parser.add_argument("--plan-tasks", type=int, default=20, help="每个企划的任务数量")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--db", default="", help="SQLite 文件路径，默认使用临时文件")
+    parser.add_argument("--output", type=Path, help="将结果写入 JSON 文件")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="允许偏离基线的比例")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = args.db or f"{tmp_dir}/bench_api.db"
+        results = asyncio.run(run(args, db_path))
+
+    config = {key: getattr(args, key) for key in ("rows", "concurrency", "requests", "size", "max_page", "plan_tasks")}
+    report = {"config": config, "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+        print(f"基线已保存: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"未找到基线 {args.baseline}，使用 --save-baseline 生成")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("config") != config:
+        print(f"注意: 基线配置 {baseline.get('config')} 与本次配置不同，对比结果仅供参考")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("性能回归:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print("未发现性能回归")
+
+
+if __name__ == "__main__":
+    main()
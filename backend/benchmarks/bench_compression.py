@@ -0,0 +1,79 @@
+"""
+响应压缩基准：在代表性企划 JSON 上对比各编码、各级别的 CPU 耗时与节省的字节数
+
+用法:
+    python -m benchmarks.bench_compression --tasks 200 --evidences 30
+"""
+
+import argparse
+import gzip
+import statistics
+import time
+import uuid
+
+from app.core.compression import brotli, zstandard
+from app.core.serialization import dumps
+from benchmarks.data import evidence_fields, plan_fields
+
+
+def representative_payloads(tasks: int, evidences: int, plans: int):
+    """单个企划详情（含证据）和一页企划列表"""
+    def plan(index: int):
+        plan_id = str(uuid.uuid4())
+        data = plan_fields(index, str(uuid.uuid4()), tasks=tasks)
+        data.update(id=plan_id, created_at="2025-01-01T00:00:00Z", updated_at=None)
+        data["evidences"] = [
+            {**evidence_fields(index * evidences + k, plan_id), "id": str(uuid.uuid4())}
+            for k in range(evidences)
+        ]
+        return data
+
+    page = {"items": [plan(i) for i in range(plans)], "total": plans, "page": 1, "size": plans}
+    return {
+        "plan_detail": dumps(plan(0)),
+        "plan_page": dumps(page),
+    }
+
+
+def codecs():
+    yield "gzip-1", lambda data: gzip.compress(data, compresslevel=1, mtime=0)
+    yield "gzip-5", lambda data: gzip.compress(data, compresslevel=5, mtime=0)
+    yield "gzip-9", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield "br-1", lambda data: brotli.compress(data, quality=1)
+        yield "br-4", lambda data: brotli.compress(data, quality=4)
+        yield "br-11", lambda data: brotli.compress(data, quality=11)
+    if zstandard is not None:
+        yield "zstd-1", lambda data: zstandard.ZstdCompressor(level=1).compress(data)
+        yield "zstd-3", lambda data: zstandard.ZstdCompressor(level=3).compress(data)
+        yield "zstd-9", lambda data: zstandard.ZstdCompressor(level=9).compress(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=100, help="每个企划的任务数量（RACI 同量）")
+    parser.add_argument("--evidences", type=int, default=20, help="每个企划的证据数量")
+    parser.add_argument("--plans", type=int, default=20, help="列表页中的企划数量")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数")
+    args = parser.parse_args()
+
+    payloads = representative_payloads(args.tasks, args.evidences, args.plans)
+    for name, data in payloads.items():
+        print(f"\n{name}: {len(data) / 1024:.1f} KiB")
+        print(f"{'codec':<10}{'ms':>10}{'MiB/s':>10}{'KiB out':>10}{'ratio':>8}{'saved KiB/ms':>14}")
+        for codec, func in codecs():
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                out = func(data)
+                timings.append(time.perf_counter() - start)
+            seconds = statistics.median(timings)
+            saved_kib = (len(data) - len(out)) / 1024
+            print(
+                f"{codec:<10}{seconds * 1000:>10.2f}{len(data) / 1048576 / seconds:>10.1f}"
+                f"{len(out) / 1024:>10.1f}{len(data) / len(out):>8.1f}{saved_kib / (seconds * 1000):>14.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
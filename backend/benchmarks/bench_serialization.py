@@ -0,0 +1,97 @@
+"""
+列表响应序列化基准：默认路径（response_model 校验 + 标准 json）对比快速路径
+
+用法:
+    python -m benchmarks.bench_serialization --plans 100 --tasks 200 --evidences 10
+"""
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.core.database import Base
+from app.core.serialization import dumps, dump_page
+from app.models import Evidence, Plan, RequirementSnapshot
+from app.schemas.plan import PlanList, PlanResponse
+from app.services.plan_service import PlanService
+from benchmarks.data import evidence_fields, plan_fields, requirement_fields
+
+
+def default_path(page) -> bytes:
+    """与 FastAPI 的 response_model 处理一致：校验 -> 转为 JSON 兼容对象 -> json 编码"""
+    model = PlanList.model_validate(page)
+    content = jsonable_encoder(model)
+    return JSONResponse(content).body
+
+
+def fast_path(page) -> bytes:
+    return dumps(dump_page(page, PlanResponse))
+
+
+def seed(db, plans: int, tasks: int, evidences: int) -> None:
+    snapshot = RequirementSnapshot(**requirement_fields(0))
+    db.add(snapshot)
+    db.flush()
+    for i in range(plans):
+        plan = Plan(**plan_fields(i, snapshot.id, tasks=tasks))
+        db.add(plan)
+        db.flush()
+        db.add_all(Evidence(**evidence_fields(i * evidences + k, plan.id)) for k in range(evidences))
+    db.commit()
+
+
+def measure(func, page, repeat: int):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(func(page))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), min(timings), size
+
+
+async def load_page(db, plans: int, expand: str):
+    return await PlanService(db).list_plans(page=1, size=plans, expand=expand or None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=100, help="每页企划数量")
+    parser.add_argument("--tasks", type=int, default=200, help="每个企划的任务数量（RACI 同量）")
+    parser.add_argument("--evidences", type=int, default=10, help="每个企划的证据数量")
+    parser.add_argument("--expand", default="evidences", help="展开的关联关系")
+    parser.add_argument("--repeat", type=int, default=20, help="重复次数")
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, args.plans, args.tasks, args.evidences)
+
+    page = asyncio.run(load_page(db, args.plans, args.expand))
+
+    # 预热，同时确认两条路径输出的数据一致
+    assert json.loads(default_path(page)) == json.loads(fast_path(page)), "快速路径输出与默认路径不一致"
+
+    print(f"plans={args.plans} tasks={args.tasks} evidences={args.evidences} expand={args.expand!r}")
+    results = {}
+    for name, func in (("default", default_path), ("fast", fast_path)):
+        median, best, size = measure(func, page, args.repeat)
+        results[name] = median
+        print(f"{name:>8}: median {median:8.2f} ms   min {best:8.2f} ms   body {size / 1024:8.1f} KiB")
+    print(f" speedup: {results['default'] / results['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+启动耗时基准：应用导入耗时与进程启动到首个响应的耗时
+
+用法:
+    python -m benchmarks.bench_startup                  # 与基线对比，超出容差时退出码为 1
+    python -m benchmarks.bench_startup --save-baseline  # 记录当前结果为基线
+"""
+
+from pathlib import Path
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = BACKEND_DIR / "benchmarks" / "baselines" / "startup.json"
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def _env(tmp_dir: str) -> dict:
+    """隔离的运行环境：临时 SQLite 数据库和日志文件"""
+    env = dict(os.environ)
+    env.update(
+        PYTHONPATH=str(BACKEND_DIR),
+        DATABASE_URL=f"sqlite:///{tmp_dir}/bench.db",
+        LOG_FILE=f"{tmp_dir}/app.log",
+        DEBUG="false",
+    )
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env: dict) -> float:
+    """在新进程中导入 app.main 的耗时（毫秒）"""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_response(env: dict, timeout: float = 60.0) -> float:
+    """从启动 uvicorn 进程到 /health 首次返回 200 的耗时（毫秒）"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"服务在 {timeout}s 内未就绪")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="每项测量的次数，取中位数")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许超出基线的比例")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = _env(tmp_dir)
+        results = {
+            "import_ms": round(statistics.median(measure_import(env) for _ in range(args.runs)), 1),
+            "first_response_ms": round(statistics.median(measure_first_response(env) for _ in range(args.runs)), 1),
+        }
+
+    for name, value in results.items():
+        print(f"{name:>18}: {value:8.1f}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"基线已保存: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"未找到基线 {args.baseline}，使用 --save-baseline 生成")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    regressions = []
+    for name, value in results.items():
+        limit = baseline.get(name, value) * (1 + args.tolerance)
+        if value > limit:
+            regressions.append(f"{name}: {value:.1f} > {limit:.1f} (基线 {baseline[name]:.1f})")
+
+    if regressions:
+        print("启动耗时回归:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print("未发现启动耗时回归")
+
+
+if __name__ == "__main__":
+    main()
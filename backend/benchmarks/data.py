@@ -0,0 +1,114 @@
+"""
+基准测试数据生成
+"""
+
+from typing import Any, Dict, Optional
+
+
+def requirement_fields(index: int) -> Dict[str, Any]:
+    """生成需求快照字段"""
+    return {
+        "problem_statement": f"如何在第{index}季度提升企业内部知识管理效率，降低重复建设成本",
+        "objectives": [f"目标{index}-{k}: 建立统一的知识库与检索入口" for k in range(5)],
+        "constraints": {
+            "time": "6个月",
+            "budget": 500000.0,
+            "compliance": ["数据安全法", "个人信息保护法"],
+            "resources": ["产品经理 x1", "后端工程师 x3", "前端工程师 x2"],
+        },
+        "audience": "企业管理层与业务部门负责人",
+        "quality_metrics": ["检索准确率 > 90%", "平均响应时间 < 500ms"],
+        "deliverable_formats": ["pdf", "docx"],
+        "user_preferences": {"style": "专业", "detail_level": "详细", "risk_tolerance": "中等"},
+    }
+
+
+def plan_fields(
+    index: int,
+    requirement_snapshot_id: str,
+    tasks: int = 50,
+    milestones: int = 10,
+    risks: int = 20
+) -> Dict[str, Any]:
+    """生成企划字段，tasks/milestones/risks 控制企划体量"""
+    return {
+        "requirement_snapshot_id": requirement_snapshot_id,
+        "overview": {
+            "title": f"企划 {index}: 企业知识管理平台建设方案",
+            "summary": "构建覆盖采集、治理、检索与运营的一体化知识管理平台。" * 4,
+            "version": "1.0",
+        },
+        "scope": {
+            "in": ["知识采集", "知识治理", "智能检索", "运营分析"],
+            "out": ["硬件采购", "外部客户门户"],
+        },
+        "milestones": [
+            {
+                "id": f"m{k}",
+                "name": f"里程碑 {k}: 阶段性交付",
+                "due_date": f"2025-{k % 12 + 1:02d}-28",
+                "deliverables": [f"交付物 {k}-{d}" for d in range(3)],
+            }
+            for k in range(milestones)
+        ],
+        "tasks": [
+            {
+                "id": f"t{k}",
+                "name": f"任务 {k}: 模块设计与实现",
+                "description": "完成需求分析、方案设计、开发实现与联调测试，并输出对应文档。",
+                "assignee": f"成员{k % 6}",
+                "estimated_hours": 16.0 + k % 5 * 8,
+            }
+            for k in range(tasks)
+        ],
+        "raci": [
+            {
+                "task": f"t{k}",
+                "responsible": [f"成员{k % 6}"],
+                "accountable": "项目经理",
+                "consulted": ["架构师", "安全负责人"],
+                "informed": ["业务部门"],
+            }
+            for k in range(tasks)
+        ],
+        "risks": [
+            {
+                "id": f"r{k}",
+                "description": f"风险 {k}: 关键依赖交付延期导致整体进度受影响",
+                "probability": ["低", "中", "高"][k % 3],
+                "impact": ["低", "中", "高"][(k + 1) % 3],
+                "mitigation": "提前识别依赖并建立周度跟踪机制，预留缓冲时间。",
+            }
+            for k in range(risks)
+        ],
+        "budget": {
+            "total": 500000.0,
+            "breakdown": [
+                {"category": "人力", "amount": 350000.0, "description": "研发团队人力成本"},
+                {"category": "基础设施", "amount": 100000.0, "description": "云资源与中间件"},
+                {"category": "其他", "amount": 50000.0, "description": "培训与推广"},
+            ],
+        },
+        "references": [f"https://example.com/reference/{k}" for k in range(10)],
+        "evidence_links": [f"https://example.com/evidence/{k}" for k in range(10)],
+        "status": "completed",
+        "completion_score": 85,
+    }
+
+
+def evidence_fields(index: int, plan_id: Optional[str] = None) -> Dict[str, Any]:
+    """生成证据字段"""
+    return {
+        "plan_id": plan_id,
+        "title": f"证据 {index}: 行业知识管理实践研究报告",
+        "url": f"https://example.com/report/{index}.pdf",
+        "summary": "报告总结了国内外企业知识管理平台建设的典型模式与关键成功因素。",
+        "file_type": ".pdf",
+        "file_size": 1024 * (index % 500 + 1),
+        "license": "CC BY 4.0",
+        "relevance_score": 0.8,
+        "authority_score": 0.7,
+        "timeliness_score": 0.6,
+        "usage_in_plan": [{"plan_id": plan_id, "section": "risks", "context": "风险识别依据"}] if plan_id else None,
+        "status": "processed",
+    }
@@ -0,0 +1,65 @@
+"""
+测试环境：临时目录中的 SQLite 数据库和文件存储，关闭后台调度任务
+
+环境变量须在导入任何 app 模块之前设置（配置和数据库引擎在导入时创建）。
+"""
+
+import os
+import tempfile
+
+_ROOT = tempfile.mkdtemp(prefix="planning-agent-test-")
+os.environ.update(
+    DEBUG="false",
+    DATABASE_URL=f"sqlite:///{_ROOT}/test.db",
+    UPLOAD_DIR=f"{_ROOT}/uploads",
+    CHUNK_STORE_DIR=f"{_ROOT}/uploads/chunks",
+    LOG_FILE=f"{_ROOT}/app.log",
+    COORDINATION_DB_PATH=f"{_ROOT}/coordination.db",
+    PURGE_ENABLED="false",
+    EVIDENCE_REFRESH_ENABLED="false",
+    EVIDENCE_TIMELINESS_ENABLED="false",
+    WARMUP_ON_STARTUP="false",
+)
+
+import pytest  # noqa: E402
+from sqlalchemy import event, func, select  # noqa: E402
+from sqlalchemy.sql.dml import UpdateBase  # noqa: E402
+
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+import app.models  # noqa: E402,F401
+
+
+@pytest.fixture
+def db():
+    """每个测试使用新建的表，结束后删除"""
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def rollback_after_write():
+    """模拟并发请求：对指定的表执行 INSERT、UPDATE 或 DELETE 后，另一个会话立即查询并回滚"""
+    other = SessionLocal()
+    listeners = []
+
+    def install(table):
+        def after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+            if isinstance(clauseelement, UpdateBase) and clauseelement.table is table:
+                other.execute(select(func.count()).select_from(table))
+                other.rollback()
+
+        event.listen(engine, "after_execute", after_execute)
+        listeners.append(after_execute)
+        return other
+
+    try:
+        yield install
+    finally:
+        for listener in listeners:
+            event.remove(engine, "after_execute", listener)
+        other.close()
@@ -0,0 +1,57 @@
+"""
+NDJSON 批量导入
+"""
+
+import asyncio
+import json
+
+from app.core.database import SessionLocal
+from app.models.requirement import RequirementSnapshot
+from app.schemas.requirement import RequirementSnapshotImport
+from app.services.requirement_service import RequirementService
+
+
+def ndjson(*rows):
+    async def stream():
+        for row in rows:
+            # 按任意位置切分，覆盖跨块的行
+            line = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+            yield line[:5]
+            yield line[5:]
+    return stream()
+
+
+def row(id, **fields):
+    return {"id": id, "problem_statement": f"问题 {id}", "objectives": ["目标"], **fields}
+
+
+def test_import_batches_and_skips_conflicts(db):
+    service = RequirementService(db)
+    result = asyncio.run(service.import_ndjson(
+        ndjson(row("a"), row("b"), {"id": "bad"}, row("a"), row("c")), RequirementSnapshotImport, batch_size=2
+    ))
+    assert result["imported"] == 3
+    assert result["skipped"] == 1
+    assert result["failed"] == 1
+    assert result["errors"][0]["line"] == 3
+    assert {id for id, in db.query(RequirementSnapshot.id)} == {"a", "b", "c"}
+
+
+def test_import_is_isolated_from_other_sessions(db):
+    """批量插入在工作线程中执行，其他会话（其他请求）在插入和提交之间回滚不影响这一批"""
+    other = SessionLocal()
+
+    class Service(RequirementService):
+        def _after_bulk_insert(self, rows):
+            super()._after_bulk_insert(rows)
+            other.query(RequirementSnapshot).count()
+            other.rollback()
+
+    try:
+        result = asyncio.run(Service(db).import_ndjson(
+            ndjson(row("a"), row("b"), row("c")), RequirementSnapshotImport, batch_size=2
+        ))
+        assert result["imported"] == 3
+        assert other.query(RequirementSnapshot).count() == 3
+    finally:
+        other.close()
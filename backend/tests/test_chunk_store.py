@@ -0,0 +1,197 @@
+"""
+证据片段存储与切分
+"""
+
+import pytest
+
+from app.services.chunk_store import RECORD, ChunkStore, split_spans, token_counter
+
+
+def pages(*texts):
+    return [(text, 1, 0, len(text)) for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkStore(str(tmp_path))
+
+
+def texts(store, evidence_id):
+    return [chunk.text for chunk in store.chunks(evidence_id)]
+
+
+def test_write_and_read(store):
+    assert store.write("e1", [("第一段", 1, 0, 3), ("second", 2, 5, 11)]) == 2
+    chunks = store.chunks("e1")
+    assert [(c.seq, c.page, c.start, c.end, c.text) for c in chunks] == [
+        (0, 1, 0, 3, "第一段"),
+        (1, 2, 5, 11, "second"),
+    ]
+    assert bytes(store.view("e1", 1)) == b"second"
+    assert store.view("e1", 2) is None
+    assert store.chunks("missing") == []
+
+
+def test_fetch_keeps_requested_order(store):
+    store.write("a", pages("a0", "a1"))
+    store.write("b", pages("b0"))
+    assert [(c.evidence_id, c.text) for c in store.fetch(["b", "missing", "a"])] == [
+        ("b", "b0"), ("a", "a0"), ("a", "a1"),
+    ]
+
+
+def test_rewrite_replaces_chunks(store):
+    store.write("e1", pages("old0", "old1", "old2"))
+    store.write("e2", pages("other"))
+    store.write("e1", pages("new0"))
+    assert texts(store, "e1") == ["new0"]
+    assert texts(store, "e2") == ["other"]
+    stats = store.stats()
+    assert stats["chunks"] == 2
+    assert stats["garbage"] == 3
+
+
+def test_empty_write_deletes(store):
+    store.write("e1", pages("x"))
+    assert store.write("e1", []) == 0
+    assert store.count("e1") == 0
+
+
+def test_delete(store):
+    store.write("e1", pages("x", "y"))
+    store.write("e2", pages("z"))
+    assert store.delete_many(["e1", "missing"]) == 1
+    assert store.delete_many(["e1"]) == 0
+    assert texts(store, "e1") == []
+    assert texts(store, "e2") == ["z"]
+    # 删除后重新写入
+    store.write("e1", pages("again"))
+    assert texts(store, "e1") == ["again"]
+
+
+def test_compact_drops_garbage(store, tmp_path):
+    store.write("e1", pages("old"))
+    store.write("e1", pages("new0", "new1"))
+    store.write("e2", pages("gone"))
+    store.delete("e2")
+    assert store.compact(min_garbage_ratio=0.9) is False
+
+    assert store.compact() is True
+    stats = store.stats()
+    assert stats["generation"] == 1
+    assert stats["garbage"] == 0
+    assert stats["records"] == 2
+    assert texts(store, "e1") == ["new0", "new1"]
+    assert texts(store, "e2") == []
+    assert (tmp_path / "chunks-1.dat").read_bytes() == b"new0new1"
+    assert store.compact() is False
+
+    # 新的一代继续追加，再次压缩时删除上一代的文件
+    store.write("e2", pages("back"))
+    store.write("e1", pages("newer"))
+    assert store.compact() is True
+    assert not (tmp_path / "chunks-0.dat").exists()
+    assert texts(store, "e1") == ["newer"]
+    assert texts(store, "e2") == ["back"]
+
+
+def test_second_instance_reloads_incrementally(tmp_path):
+    writer = ChunkStore(str(tmp_path))
+    reader = ChunkStore(str(tmp_path))
+    writer.write("e1", pages("one"))
+    assert texts(reader, "e1") == ["one"]
+
+    writer.write("e2", pages("two"))
+    writer.write("e1", pages("uno", "dos"))
+    assert texts(reader, "e1") == ["uno", "dos"]
+    assert texts(reader, "e2") == ["two"]
+
+    writer.delete("e2")
+    assert texts(reader, "e2") == []
+
+    # 其他进程压缩后代号变化，重新加载新的一代
+    writer.compact()
+    assert reader.stats()["generation"] == 1
+    assert texts(reader, "e1") == ["uno", "dos"]
+
+    # 读取方也可以写入，证据序号与写入方一致
+    reader.write("e3", pages("three"))
+    assert texts(writer, "e3") == ["three"]
+    assert texts(writer, "e1") == ["uno", "dos"]
+
+
+def test_truncated_index_record_is_ignored_and_repaired(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.write("e1", pages("kept"))
+    index = tmp_path / "chunks-0.idx"
+    # 模拟写入中断：只写入了半条索引记录
+    with open(index, "ab") as handle:
+        handle.write(RECORD.pack(0, 4, 0, 0, 1, 0, 4)[:RECORD.size // 2])
+
+    reopened = ChunkStore(str(tmp_path))
+    assert texts(reopened, "e1") == ["kept"]
+
+    reopened.write("e2", pages("after"))
+    assert index.stat().st_size % RECORD.size == 0
+    fresh = ChunkStore(str(tmp_path))
+    assert texts(fresh, "e1") == ["kept"]
+    assert texts(fresh, "e2") == ["after"]
+
+
+def test_truncated_evidence_id_line_is_repaired(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.write("e1", pages("one"))
+    with open(tmp_path / "evidence_ids.txt", "ab") as handle:
+        handle.write(b"half-writ")
+
+    reopened = ChunkStore(str(tmp_path))
+    reopened.write("e2", pages("two"))
+    fresh = ChunkStore(str(tmp_path))
+    assert texts(fresh, "e1") == ["one"]
+    assert texts(fresh, "e2") == ["two"]
+    assert (tmp_path / "evidence_ids.txt").read_text().splitlines() == ["e1", "e2"]
+
+
+def test_orphan_payload_is_skipped(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.write("e1", pages("one"))
+    # 文本已写入但索引未写入
+    with open(tmp_path / "chunks-0.dat", "ab") as handle:
+        handle.write("孤立".encode("utf-8"))
+
+    reopened = ChunkStore(str(tmp_path))
+    reopened.write("e2", pages("two"))
+    assert texts(ChunkStore(str(tmp_path)), "e2") == ["two"]
+
+
+def assert_spans(text, spans, max_tokens):
+    assert spans == sorted(spans)
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert end <= start
+    for start, end in spans:
+        assert start < end
+        assert text[start:end] == text[start:end].strip()
+        assert token_counter.count(text[start:end]) <= max_tokens
+    # 片段之外只有空白
+    covered = "".join(text[start:end] for start, end in spans)
+    assert "".join(covered.split()) == "".join(text.split())
+
+
+def test_split_spans_merges_short_lines():
+    text = "第一行\n\n  第二行  \nthird line"
+    spans = split_spans(text, 100)
+    assert spans == [(0, len(text))]
+    assert_spans(text, spans, 100)
+
+
+def test_split_spans_respects_limit():
+    text = "\n".join(
+        ["短段落。"] + ["这是一个比较长的句子，用来测试按句子切分。" * 3] * 4 + ["word " * 200, "没有标点" * 80]
+    )
+    for max_tokens in (5, 20, 60):
+        assert_spans(text, split_spans(text, max_tokens), max_tokens)
+
+
+def test_split_spans_empty():
+    assert split_spans("", 10) == []
+    assert split_spans(" \n\t\n", 10) == []
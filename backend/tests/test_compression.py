@@ -0,0 +1,107 @@
+"""
+响应压缩：Accept-Encoding 协商
+"""
+
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, compress, negotiate, stream_compressor
+
+SUPPORTED = ["zstd", "br", "gzip"]
+BODY = b'{"items": "' + b"planning " * 500 + b'"}'
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("GZIP; q=0.8, identity", "gzip"),
+    ("br;q=0, gzip;q=0.1", "gzip"),
+    ("*", "zstd"),
+    ("*;q=0.5, zstd;q=0", "br"),
+    ("gzip;q=0", None),
+    ("gzip;q=abc", None),
+    ("identity, deflate", None),
+    (" , ", None),
+])
+def test_negotiate_by_q_value_then_server_priority(accept, expected):
+    assert negotiate(accept, SUPPORTED) == expected
+
+
+def test_negotiate_only_offers_supported():
+    assert negotiate("zstd, br;q=0.9, gzip;q=0.1", ["gzip"]) == "gzip"
+
+
+@pytest.mark.parametrize("encoding, module", [("gzip", None), ("br", "brotli"), ("zstd", "zstandard")])
+def test_compress_round_trip(encoding, module):
+    if module is not None:
+        pytest.importorskip(module)
+    whole = compress(encoding, BODY)
+    stream = stream_compressor(encoding)
+    streamed = stream.compress(BODY[:1000]) + stream.compress(BODY[1000:]) + stream.finish()
+    if encoding == "gzip":
+        assert gzip.decompress(whole) == gzip.decompress(streamed) == BODY
+    elif encoding == "br":
+        import brotli
+        assert brotli.decompress(whole) == brotli.decompress(streamed) == BODY
+    else:
+        import zstandard
+        decompressor = zstandard.ZstdDecompressor()
+        assert decompressor.decompress(whole) == decompressor.decompressobj().decompress(streamed) == BODY
+
+
+def asgi_app(status=200, body=BODY, content_type=b"application/json", chunks=1, headers=()):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), *headers],
+        })
+        size = -(-len(body) // chunks) if body else 0
+        parts = [body[i:i + size] for i in range(0, len(body), size)] if size else [b""]
+        for i, part in enumerate(parts):
+            await send({"type": "http.response.body", "body": part, "more_body": i < len(parts) - 1})
+    return app
+
+
+def client(app, **options):
+    return TestClient(CompressionMiddleware(app, minimum_size=500, offload_size=10_000, encodings=["gzip"], **options))
+
+
+def test_compresses_whole_body_and_weakens_etag():
+    response = client(asgi_app(headers=[(b"etag", b'"v1"'), (b"vary", b"Origin")])).get(
+        "/", headers={"Accept-Encoding": "br;q=1, gzip;q=0.5"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.content == BODY
+
+
+def test_streams_chunked_responses():
+    response = client(asgi_app(chunks=4)).get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("app, accept", [
+    (asgi_app(), "gzip;q=0, identity"),
+    (asgi_app(body=b'{"small": true}'), "gzip"),
+    (asgi_app(content_type=b"application/pdf"), "gzip"),
+    (asgi_app(status=304, body=b""), "gzip"),
+])
+def test_passes_through(app, accept):
+    response = client(app).get("/", headers={"Accept-Encoding": accept})
+    assert "content-encoding" not in response.headers
+
+
+def test_offloads_large_bodies():
+    response = TestClient(CompressionMiddleware(asgi_app(), minimum_size=10, offload_size=100, encodings=["gzip"])).get(
+        "/", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == BODY
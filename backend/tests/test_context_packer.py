@@ -0,0 +1,94 @@
+"""
+证据上下文打包的 MMR 选择
+"""
+
+import asyncio
+import math
+
+import pytest
+
+from app.models.evidence import Evidence
+from app.models.plan import Plan
+from app.models.requirement import RequirementSnapshot
+from app.services import context_packer
+from app.services.context_packer import mmr_select
+from app.services.plan_service import PlanService
+
+
+@pytest.fixture(params=["python", "numpy"])
+def backend(request, monkeypatch):
+    """分别覆盖纯 Python 实现和 numpy 实现"""
+    if request.param == "numpy":
+        monkeypatch.setattr(context_packer, "numpy", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(context_packer, "numpy", None)
+    return request.param
+
+
+def unit(*values):
+    norm = math.sqrt(sum(value * value for value in values))
+    return [value / norm for value in values]
+
+
+QUERY = unit(1, 0, 0)
+
+
+def test_selects_by_relevance_within_budget(backend):
+    vectors = [unit(0.6, 0.8, 0), unit(1, 0, 0), unit(0.8, 0, 0.6)]
+    selected, gains = mmr_select(vectors, QUERY, [1, 1, 1], [10, 10, 10], budget=20, mmr_lambda=1.0)
+    assert selected == [1, 2]
+    assert gains == pytest.approx([0.6, 1.0, 0.8], abs=1e-6)
+
+
+def test_quality_weights_similarity(backend):
+    vectors = [unit(1, 0, 0), unit(0.9, 0.1, 0)]
+    selected, gains = mmr_select(vectors, QUERY, [0.25, 1.0], [10, 10], budget=10, mmr_lambda=1.0)
+    assert selected == [1]
+    assert gains[0] == pytest.approx(0.25, abs=1e-6)
+
+
+def test_skips_chunks_that_do_not_fit(backend):
+    vectors = [unit(1, 0, 0), unit(0.9, 0.1, 0), unit(0.5, 0.5, 0.5)]
+    selected, _ = mmr_select(vectors, QUERY, [1, 1, 1], [80, 30, 15], budget=50, mmr_lambda=1.0)
+    assert selected == [1, 2]
+
+
+def test_excludes_irrelevant_chunks(backend):
+    vectors = [unit(0, 1, 0), unit(-1, 0.2, 0), unit(0.1, 1, 0)]
+    selected, _ = mmr_select(vectors, QUERY, [1, 1, 1], [1, 1, 1], budget=100, mmr_lambda=0.7)
+    assert selected == [2]
+
+
+def test_prefers_diverse_chunks(backend):
+    # 前两个片段几乎相同，多样性权重足够时第三个片段先于重复的片段
+    vectors = [unit(1, 0.05, 0), unit(1, 0.06, 0), unit(0.8, 0, 0.6)]
+    selected, _ = mmr_select(vectors, QUERY, [1, 1, 1], [1, 1, 1], budget=100, mmr_lambda=0.3)
+    assert selected[:2] == [0, 2]
+    relevance_only, _ = mmr_select(vectors, QUERY, [1, 1, 1], [1, 1, 1], budget=100, mmr_lambda=1.0)
+    assert relevance_only == [0, 1, 2]
+
+
+def test_drops_near_duplicates(backend):
+    vectors = [unit(1, 0.05, 0), unit(1, 0.06, 0), unit(0.7, 0, 0.7)]
+    selected, _ = mmr_select(
+        vectors, QUERY, [1, 1, 1], [1, 1, 1], budget=100, mmr_lambda=1.0, duplicate_threshold=0.9
+    )
+    assert selected == [0, 2]
+
+
+def test_empty_input(backend):
+    assert mmr_select([], QUERY, [], [], budget=100, mmr_lambda=0.7) == ([], [])
+
+
+def test_pack_evidence_context(db):
+    db.add(RequirementSnapshot(id="s1", problem_statement="项目风险评估", objectives=["识别风险"], constraints={}, audience="团队"))
+    db.add(Plan(id="p1", requirement_snapshot_id="s1", overview={"title": "风险管理"}, scope={}))
+    db.add(Evidence(id="e1", plan_id="p1", title="合规风险清单", url="http://example.com/1", summary="风险 应对措施"))
+    db.commit()
+    service = PlanService(db)
+
+    result = asyncio.run(service.pack_evidence_context("p1", "risks", budget=200))
+    assert result["cached"] is False
+    assert [chunk["evidence_id"] for chunk in result["chunks"]] == ["e1"]
+    assert asyncio.run(service.pack_evidence_context("p1", "risks", budget=200))["cached"] is True
+    assert asyncio.run(service.pack_evidence_context("missing", "risks")) is None
@@ -0,0 +1,72 @@
+"""
+ETag 与条件请求
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.etag import etag_matches, make_etag, page_etag
+from app.models.requirement import RequirementSnapshot
+
+
+def test_make_etag():
+    assert make_etag("a", 1) == make_etag("a", 1)
+    assert make_etag("a", 1) != make_etag("a", 2)
+    assert make_etag("a", weak=True) == "W/" + make_etag("a")
+    assert page_etag(("p", 1), 2, [["a", 1]]) == page_etag(("p", 1), 2, [("a", 1)])
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", W/"abc"', True),
+    ('"abcd"', False),
+    ("abc", False),
+])
+def test_etag_matches_uses_weak_comparison(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+    assert etag_matches(header, 'W/"abc"') is expected
+
+
+@pytest.fixture
+def client(db):
+    from app.main import app as api
+
+    db.add(RequirementSnapshot(id="s1", problem_statement="问题", objectives=["目标"], constraints={}, audience="用户"))
+    db.commit()
+    return TestClient(api)
+
+
+def test_get_returns_304_until_resource_changes(client):
+    first = client.get("/api/v1/requirement/s1")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+
+    cached = client.get("/api/v1/requirement/s1", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+    assert client.get("/api/v1/requirement/s1", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    assert client.put("/api/v1/requirement/s1", json={"audience": "管理层"}).status_code == 200
+    changed = client.get("/api/v1/requirement/s1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["audience"] == "管理层"
+
+
+def test_get_missing_with_if_none_match_is_404(client):
+    assert client.get("/api/v1/requirement/missing", headers={"If-None-Match": "*"}).status_code == 404
+
+
+def test_list_uses_weak_etag(client):
+    first = client.get("/api/v1/requirement/", params={"size": 10})
+    etag = first.headers["etag"]
+    assert etag.startswith("W/")
+    assert client.get("/api/v1/requirement/", params={"size": 10}, headers={"If-None-Match": etag}).status_code == 304
+    # 分页参数不同的列表 ETag 不同
+    assert client.get("/api/v1/requirement/", params={"size": 5}, headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,54 @@
+"""
+证据内容处理
+"""
+
+import asyncio
+import hashlib
+
+from app.core.database import SessionLocal
+from app.models.evidence import Evidence
+from app.services import evidence_fetcher
+from app.services.evidence_fetcher import EvidenceFetcher, blob_key, extract_evidence_text, storage_root
+
+
+def stored_evidence(db, content: bytes) -> Evidence:
+    digest = hashlib.sha256(content).hexdigest()
+    path = storage_root() / blob_key(digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    evidence = Evidence(
+        id="e1", title="上传", url="upload://e1", content_hash=digest, file_key=blob_key(digest),
+        file_type=".txt", file_size=len(content), status="downloaded"
+    )
+    db.add(evidence)
+    db.commit()
+    return evidence
+
+
+def test_process_extracts_summary(db):
+    stored_evidence(db, "正文内容".encode("utf-8"))
+    asyncio.run(EvidenceFetcher().process("e1"))
+    db.expire_all()
+    evidence = db.get(Evidence, "e1")
+    assert evidence.status == "processed"
+    assert evidence.summary == "正文内容"
+
+
+def test_process_is_isolated_from_other_sessions(db, monkeypatch):
+    """内容处理在工作线程中执行，其他会话（请求）在写入和提交之间回滚不影响处理结果"""
+    stored_evidence(db, "正文内容".encode("utf-8"))
+    other = SessionLocal()
+
+    def interleave(session, evidence, path):
+        session.flush()
+        other.query(Evidence).count()
+        other.rollback()
+
+    monkeypatch.setattr(evidence_fetcher, "CONTENT_PROCESSORS", [extract_evidence_text, interleave])
+    try:
+        asyncio.run(EvidenceFetcher().process("e1"))
+        evidence = other.get(Evidence, "e1")
+        assert evidence.status == "processed"
+        assert evidence.summary == "正文内容"
+    finally:
+        other.close()
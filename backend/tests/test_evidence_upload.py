@@ -0,0 +1,169 @@
+"""
+证据文件的流式上传
+"""
+
+import asyncio
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.evidence import Evidence
+from app.services.evidence_fetcher import blob_key, storage_root
+from app.services.evidence_upload import (
+    SNIFF_SIZE,
+    UnsupportedFileType,
+    UploadError,
+    UploadTooLarge,
+    receive_upload,
+    sniff_file_type,
+)
+
+BOUNDARY = "test-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def multipart(*parts):
+    """parts 为 (字段名, 文件名或 None, 内容)"""
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename is not None else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode("utf-8") + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode("utf-8")
+
+
+class Stream:
+    """按固定大小分块的请求体，记录读取的块数"""
+
+    def __init__(self, body, chunk_size=1000, fail_after=None):
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+        self.fail_after = fail_after
+        self.read = 0
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            if self.fail_after is not None and self.read >= self.fail_after:
+                raise ConnectionResetError("client disconnected")
+            self.read += 1
+            yield chunk
+
+
+def receive(body, **kwargs):
+    stream = kwargs.pop("stream", None) or Stream(body)
+    return asyncio.run(receive_upload(CONTENT_TYPE, stream, **kwargs))
+
+
+def temp_files():
+    temp_dir = storage_root() / "tmp"
+    return set(temp_dir.iterdir()) if temp_dir.exists() else set()
+
+
+@pytest.fixture
+def no_leftovers():
+    """测试结束时上传的临时文件都已删除"""
+    before = temp_files()
+    yield
+    assert temp_files() == before
+
+
+def test_sniff_file_type():
+    assert sniff_file_type(b"%PDF-1.7\n") == ".pdf"
+    assert sniff_file_type(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1\x00") == ".doc"
+    assert sniff_file_type(b"PK\x03\x04\x14\x00") == ".docx"
+    assert sniff_file_type(b"\xef\xbb\xbf  <!DOCTYPE html><html>") == ".html"
+    assert sniff_file_type(b"# title", "notes.md") == ".md"
+    assert sniff_file_type(b"plain text", "report.exe") == ".txt"
+    assert sniff_file_type("中文".encode("utf-8")[:-1]) == ".txt"
+    assert sniff_file_type(b"\x7fELF\x02\x01\x01\x00") is None
+    assert sniff_file_type(b"\xff\xfe\xfa" + b"a" * 20) is None
+
+
+def test_receive_stores_file_by_content_hash(no_leftovers):
+    content = b"%PDF-1.4\n" + b"x" * 3000
+    upload = receive(multipart(("title", None, "标题".encode("utf-8")), ("file", "a.pdf", content)))
+    digest = hashlib.sha256(content).hexdigest()
+    assert (upload.filename, upload.content_hash, upload.file_size, upload.file_type) == ("a.pdf", digest, len(content), ".pdf")
+    assert upload.fields == {"title": "标题"}
+    assert (storage_root() / blob_key(digest)).read_bytes() == content
+
+
+def test_rejects_declared_oversize_without_reading():
+    stream = Stream(b"ignored")
+    with pytest.raises(UploadTooLarge) as info:
+        receive(b"", stream=stream, content_length=10 ** 9, max_size=1000)
+    assert info.value.status_code == 413
+    assert stream.read == 0
+
+
+def test_aborts_streamed_oversize(no_leftovers):
+    body = multipart(("file", "big.txt", b"a" * 50_000))
+    stream = Stream(body)
+    with pytest.raises(UploadTooLarge):
+        receive(body, stream=stream, max_size=10_000)
+    assert stream.read < len(stream.chunks)
+
+
+def test_rejects_by_magic_bytes_after_sniff_window(no_leftovers):
+    body = multipart(("file", "fake.pdf", b"\x7fELF" + b"\x00" * (SNIFF_SIZE * 4)))
+    stream = Stream(body)
+    with pytest.raises(UnsupportedFileType) as info:
+        receive(body, stream=stream)
+    assert info.value.status_code == 415
+    assert stream.read < len(stream.chunks)
+
+
+def test_rejects_small_file_with_unknown_type(no_leftovers):
+    with pytest.raises(UnsupportedFileType):
+        receive(multipart(("file", "a.bin", b"\x00\x01\x02")))
+
+
+@pytest.mark.parametrize("parts", [
+    [("title", None, b"no file")],
+    [("document", "a.txt", b"text")],
+    [("file", "a.txt", b"one"), ("file", "b.txt", b"two")],
+    [("file", "empty.txt", b"")],
+])
+def test_rejects_missing_duplicate_or_empty_file(parts, no_leftovers):
+    with pytest.raises(UploadError) as info:
+        receive(multipart(*parts))
+    assert info.value.status_code == 400
+
+
+def test_rejects_non_multipart_body():
+    with pytest.raises(UploadError):
+        asyncio.run(receive_upload("application/json", Stream(b"{}")))
+
+
+def test_discards_temp_file_when_client_disconnects(no_leftovers):
+    body = multipart(("file", "a.txt", b"a" * 20_000))
+    with pytest.raises(UploadError):
+        receive(body, stream=Stream(body, fail_after=3))
+
+
+def test_upload_endpoint_records_size_and_type(db):
+    from app.main import app as api
+
+    content = "正文内容\n".encode("utf-8") * 100
+    response = TestClient(api).post(
+        "/api/v1/evidence/upload",
+        content=multipart(("plan_id", None, b""), ("file", "notes.txt", content)),
+        headers={"Content-Type": CONTENT_TYPE},
+    )
+    assert response.status_code == 201
+    body = response.json()
+    assert (body["title"], body["file_size"], body["file_type"]) == ("notes.txt", len(content), ".txt")
+
+    evidence = db.get(Evidence, body["id"])
+    assert evidence.content_hash == hashlib.sha256(content).hexdigest()
+    assert (evidence.file_size, evidence.file_type) == (len(content), ".txt")
+
+
+def test_upload_endpoint_maps_errors_to_status(db):
+    from app.main import app as api
+
+    response = TestClient(api).post(
+        "/api/v1/evidence/upload",
+        content=multipart(("file", "a.bin", b"\x00\x01\x02")),
+        headers={"Content-Type": CONTENT_TYPE},
+    )
+    assert response.status_code == 415
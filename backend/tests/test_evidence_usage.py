@@ -0,0 +1,40 @@
+"""
+证据引用行的补齐
+"""
+
+import asyncio
+
+from app.models.evidence import Evidence
+from app.models.evidence_usage import EvidenceUsage
+from app.models.plan import Plan
+from app.services.evidence_usage import run_usage_backfill
+
+
+def legacy_rows(db):
+    """表建立之前写入的 usage_in_plan：直接插入，不经过 flush 时的同步"""
+    db.execute(Plan.__table__.insert(), [{"id": "p1", "requirement_snapshot_id": "s1", "overview": {}, "scope": {}}])
+    db.execute(Evidence.__table__.insert(), [{
+        "id": "e1", "title": "证据", "url": "http://example.com/1",
+        "usage_in_plan": [
+            {"plan_id": "p1", "section": "风险", "context": "引用"},
+            {"plan_id": "missing", "section": "概览"},
+        ],
+    }])
+    db.commit()
+
+
+def test_backfill_skips_unknown_plans(db):
+    legacy_rows(db)
+    assert asyncio.run(run_usage_backfill()) == 1
+    usages = db.query(EvidenceUsage).all()
+    assert [(usage.evidence_id, usage.plan_id, usage.section, usage.position) for usage in usages] == [
+        ("e1", "p1", "风险", 0)
+    ]
+
+
+def test_backfill_is_isolated_from_other_sessions(db, rollback_after_write):
+    """补齐在工作线程中执行，其他会话（请求）在插入和提交之间回滚不影响这一批"""
+    legacy_rows(db)
+    other = rollback_after_write(EvidenceUsage.__table__)
+    assert asyncio.run(run_usage_backfill()) == 1
+    assert other.query(EvidenceUsage).count() == 1
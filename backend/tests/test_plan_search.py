@@ -0,0 +1,37 @@
+"""
+企划全文检索：摘要片段和检索文档的补齐
+"""
+
+import asyncio
+
+from app.models.plan import Plan
+from app.models.plan_search import PlanSearchDocument
+from app.services.plan_search import highlight, query_terms, run_search_backfill
+
+
+def test_highlight_marks_terms_and_escapes():
+    assert highlight("Use <b>API</b> docs", query_terms("api"), 100) == "Use &lt;b&gt;<mark>API</mark>&lt;/b&gt; docs"
+
+
+def test_highlight_matches_fullwidth_and_casefolded_text():
+    assert highlight("移动ＡＰＰ", query_terms("app"), 100) == "移动<mark>ＡＰＰ</mark>"
+    assert highlight("Die Straße ist lang", query_terms("STRASSE"), 100) == "Die <mark>Straße</mark> ist lang"
+    assert highlight("un café noir", query_terms("café"), 100) == "un <mark>café</mark> noir"
+
+
+def test_highlight_window_starts_near_first_match():
+    snippet = highlight("x" * 200 + " ＴＡＩＬ end", query_terms("tail"), 40)
+    assert snippet.startswith("…")
+    assert "<mark>ＴＡＩＬ</mark>" in snippet
+    assert highlight("no match here", query_terms("zzz"), 5) == "no ma…"
+
+
+def test_search_backfill_is_isolated_from_other_sessions(db, rollback_after_write):
+    """补齐在工作线程中执行，其他会话（请求）在插入和提交之间回滚不影响这一批"""
+    db.execute(Plan.__table__.insert(), [
+        {"id": "p1", "requirement_snapshot_id": "s1", "overview": {"title": "移动应用"}, "scope": {}}
+    ])
+    db.commit()
+    other = rollback_after_write(PlanSearchDocument.__table__)
+    assert asyncio.run(run_search_backfill()) == 1
+    assert other.query(PlanSearchDocument).filter_by(plan_id="p1").count() == 1
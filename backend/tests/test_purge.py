@@ -0,0 +1,102 @@
+"""
+软删除数据的后台清理
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.models.evidence import Evidence
+from app.models.evidence_usage import EvidenceUsage
+from app.models.plan import Plan
+from app.models.plan_outline import PlanOutline
+from app.models.plan_search import PlanSearchDocument
+from app.models.requirement import RequirementSnapshot
+from app.models.requirement_embedding import RequirementEmbedding
+from app.services import plan_outline  # noqa: F401  企划 flush 时生成大纲
+from app.services.chunk_store import chunk_store
+from app.services.evidence_fetcher import blob_key, storage_root, text_path
+from app.services.purge import PurgeScheduler, purge_deleted
+from app.services.similarity import similarity_index
+
+
+def stored(digest):
+    """按内容哈希存储的文件和提取文本"""
+    paths = (storage_root() / blob_key(digest), text_path(digest))
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(digest, encoding="utf-8")
+    return paths
+
+
+def setup_rows(db, deleted_at):
+    """
+    快照 s1 及其企划 p1 已删除；p1 的证据 e1、e2 随之删除，e2 与存活企划 p2 的证据 e3 内容相同；
+    e3 被 p1 引用；p2 中单独删除的证据 e4
+    """
+    db.add(RequirementSnapshot(id="s1", problem_statement="旧需求", objectives=["目标"], constraints={}, audience="用户"))
+    db.add(RequirementSnapshot(id="s2", problem_statement="新需求", objectives=["目标"], constraints={}, audience="用户"))
+    db.add(Plan(id="p1", requirement_snapshot_id="s1", overview={"title": "旧企划"}, scope={}))
+    db.add(Plan(id="p2", requirement_snapshot_id="s2", overview={"title": "新企划"}, scope={}))
+    db.add(Evidence(id="e1", plan_id="p1", title="e1", url="http://example.com/1", content_hash="a" * 64))
+    db.add(Evidence(id="e2", plan_id="p1", title="e2", url="http://example.com/2", content_hash="b" * 64))
+    db.add(Evidence(
+        id="e3", plan_id="p2", title="e3", url="http://example.com/3", content_hash="b" * 64,
+        usage_in_plan=[{"plan_id": "p1", "section": "风险"}, {"plan_id": "p2", "section": "概览"}]
+    ))
+    db.add(Evidence(id="e4", plan_id="p2", title="e4", url="http://example.com/4", content_hash="c" * 64))
+    db.commit()
+    for id in ("e1", "e2", "e3", "e4"):
+        chunk_store.write(id, [(f"{id} 片段", 1, 0, 5)])
+    for model, ids in ((RequirementSnapshot, ["s1"]), (Plan, ["p1"]), (Evidence, ["e1", "e2", "e4"])):
+        db.query(model).filter(model.id.in_(ids)).update({"deleted_at": deleted_at}, synchronize_session=False)
+    db.commit()
+
+
+def remaining(db, model, **filters):
+    return sorted(row.id for row in db.query(model).filter_by(**filters).execution_options(include_deleted=True))
+
+
+def test_purge_cascades_and_releases_unreferenced_blobs(db):
+    now = datetime.now(timezone.utc)
+    setup_rows(db, now - timedelta(hours=1))
+    blob_a, blob_b, blob_c = stored("a" * 64), stored("b" * 64), stored("c" * 64)
+    assert db.query(PlanOutline).filter_by(plan_id="p1").count() > 0
+
+    counts = purge_deleted(db, now, batch_size=1)
+    assert counts == {"evidences": 3, "plans": 1, "requirement_snapshots": 1, "blobs": 2}
+
+    db.expire_all()
+    assert remaining(db, Evidence) == ["e3"]
+    assert remaining(db, Plan) == ["p2"]
+    assert remaining(db, RequirementSnapshot) == ["s2"]
+    assert db.query(PlanOutline).filter_by(plan_id="p1").count() == 0
+    assert db.query(PlanSearchDocument).filter_by(plan_id="p1").count() == 0
+    assert db.query(RequirementEmbedding).filter_by(snapshot_id="s1").count() == 0
+    assert similarity_index.vector("s1") is None
+    # 删除企划的引用从存活证据的引用行和 usage_in_plan 中移除
+    assert [usage.plan_id for usage in db.query(EvidenceUsage)] == ["p2"]
+    assert db.get(Evidence, "e3").usage_in_plan == [{"plan_id": "p2", "section": "概览", "context": None}]
+
+    # 仍被 e3 引用的内容保留，其余文件和提取文本删除
+    assert not any(path.exists() for path in blob_a + blob_c)
+    assert all(path.exists() for path in blob_b)
+    assert [chunk_store.chunks(id) for id in ("e1", "e2", "e4")] == [[], [], []]
+    assert [chunk.text for chunk in chunk_store.chunks("e3")] == ["e3 片段"]
+
+
+def test_purge_waits_for_grace_period(db):
+    now = datetime.now(timezone.utc)
+    setup_rows(db, now - timedelta(minutes=5))
+    counts = purge_deleted(db, now, batch_size=10, grace_period=3600)
+    assert counts == {"evidences": 0, "plans": 0, "requirement_snapshots": 0, "blobs": 0}
+    assert remaining(db, Evidence) == ["e1", "e2", "e3", "e4"]
+
+
+def test_purge_pass_is_isolated_from_other_sessions(db, rollback_after_write):
+    """清理在工作线程中执行，其他会话（请求）在删除和提交之间回滚不影响这一批"""
+    setup_rows(db, datetime.now(timezone.utc) - timedelta(hours=1))
+    other = rollback_after_write(Plan.__table__)
+    counts = asyncio.run(PurgeScheduler(batch_size=10, grace_period=0).run_once())
+    assert counts["plans"] == 1
+    assert remaining(other, Plan) == ["p2"]
+    assert remaining(other, Evidence) == ["e3"]
@@ -0,0 +1,128 @@
+"""
+准入控制：令牌桶限流和并发上限
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.coordination import SQLiteCoordinator
+from app.core.rate_limit import (
+    AdmissionControlMiddleware,
+    AdmissionRejected,
+    ConcurrencyLimiter,
+    InMemoryTokenBuckets,
+    SQLiteTokenBuckets,
+    classify,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """只替换令牌桶读取的时钟，不影响事件循环"""
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_token_bucket_allows_burst_then_refills(clock):
+    buckets = InMemoryTokenBuckets()
+    consume = lambda: asyncio.run(buckets.consume("search:a", rate=2.0, burst=3))  # noqa: E731
+    assert [consume()[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = consume()
+    assert not allowed
+    assert retry_after == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert consume() == (True, 0.0)
+    # 其他客户端的桶互不影响
+    assert asyncio.run(buckets.consume("search:b", rate=2.0, burst=3)) == (True, 0.0)
+
+
+def test_token_bucket_evicts_full_buckets(clock):
+    buckets = InMemoryTokenBuckets(max_keys=2)
+    for key in ("a", "b"):
+        asyncio.run(buckets.consume(key, rate=1.0, burst=1))
+    clock.now += 10
+    asyncio.run(buckets.consume("c", rate=1.0, burst=1))
+    assert set(buckets._buckets) == {"c"}
+
+
+def test_sqlite_token_buckets_share_state(tmp_path):
+    path = str(tmp_path / "coordination.db")
+    first, second = SQLiteTokenBuckets(SQLiteCoordinator(path)), SQLiteTokenBuckets(SQLiteCoordinator(path))
+    assert asyncio.run(first.consume("search:a", rate=0.001, burst=1))[0] is True
+    allowed, retry_after = asyncio.run(second.consume("search:a", rate=0.001, burst=1))
+    assert not allowed
+    assert retry_after > 900
+
+
+def test_concurrency_limiter_queues_and_rejects():
+    async def run():
+        limiter = ConcurrencyLimiter("generate", max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await limiter.acquire()
+        limiter.release()
+        await waiter  # 名额转交给排队的请求
+        with pytest.raises(AdmissionRejected) as timeout:
+            await limiter.acquire()
+        return full.value, timeout.value
+
+    full, timeout = asyncio.run(run())
+    assert (full.status_code, full.reason) == (503, "queue_full")
+    assert (timeout.status_code, timeout.reason) == (503, "queue_timeout")
+
+
+def test_classify():
+    assert classify("POST", "/api/v1/plan/p1/generate") == "generate"
+    assert classify("POST", "/api/v1/evidence/search/") == "search"
+    assert classify("GET", "/api/v1/evidence/search") is None
+    assert classify("POST", "/api/v1/plan/") is None
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def test_middleware_returns_429_with_retry_after(clock):
+    middleware = AdmissionControlMiddleware(
+        ok_app, limits={"search": {"rate": 0.25, "burst": 1}}, buckets=InMemoryTokenBuckets()
+    )
+    client = TestClient(middleware)
+    assert client.post("/api/v1/evidence/search").status_code == 200
+    # 不受限的路由不消耗令牌
+    assert client.get("/api/v1/evidence/search").status_code == 200
+
+    response = client.post("/api/v1/evidence/search")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "4"
+    assert response.json()["status_code"] == 429
+
+    clock.now += 4
+    assert client.post("/api/v1/evidence/search").status_code == 200
+
+
+def test_middleware_limits_by_client_header(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_CLIENT_HEADER", "X-API-Key")
+    middleware = AdmissionControlMiddleware(
+        ok_app, limits={"search": {"rate": 1, "burst": 1}}, buckets=InMemoryTokenBuckets()
+    )
+    client = TestClient(middleware)
+    assert client.post("/api/v1/evidence/search", headers={"X-API-Key": "a"}).status_code == 200
+    assert client.post("/api/v1/evidence/search", headers={"X-API-Key": "b"}).status_code == 200
+    assert client.post("/api/v1/evidence/search", headers={"X-API-Key": "a"}).status_code == 429
@@ -0,0 +1,56 @@
+"""
+多源联合搜索的对冲请求
+"""
+
+import asyncio
+
+from app.services.search_engine import FederatedSearchEngine, SearchHit, SearchSource
+
+
+class SlowFirstSource(SearchSource):
+    """第一次请求挂起，之后的请求立即返回"""
+
+    name = "slow"
+
+    def __init__(self):
+        self.calls = []
+
+    async def search(self, client, query, max_results):
+        self.calls.append(asyncio.current_task())
+        if len(self.calls) == 1:
+            await asyncio.sleep(60)
+        return [SearchHit(title=query, url="http://example.com/")]
+
+
+def test_hedge_wins_and_slow_attempt_is_finished():
+    source = SlowFirstSource()
+    engine = FederatedSearchEngine([source], deadline=5.0, hedge_delay=0.01, max_hedges=1)
+
+    async def run():
+        try:
+            hits = await engine._query_source(source, "q", 5)
+            # 返回时落后的请求已被取消并结束，不会在后台继续占用连接
+            assert all(task.done() for task in source.calls)
+            return hits
+        finally:
+            await engine.aclose()
+
+    hits = asyncio.run(run())
+    assert [hit.url for hit in hits] == ["http://example.com/"]
+    assert len(source.calls) == 2
+    assert source.calls[0].cancelled()
+
+
+def test_search_merges_source_results():
+    engine = FederatedSearchEngine([SlowFirstSource()], deadline=5.0, hedge_delay=0.01, max_hedges=1)
+
+    async def run():
+        try:
+            return await engine.search("q", ["slow", "missing"], 5)
+        finally:
+            await engine.aclose()
+
+    result = asyncio.run(run())
+    assert [hit.url for hit in result.hits] == ["http://example.com/"]
+    assert result.sources == {"missing": "unavailable", "slow": "ok"}
+    assert result.partial is False
@@ -0,0 +1,40 @@
+"""
+相似需求检索的内存索引
+"""
+
+import asyncio
+from datetime import datetime, timezone
+
+from app.models.requirement import RequirementSnapshot
+from app.models.requirement_embedding import RequirementEmbedding
+from app.services.similarity import SimilarityIndex, embedder, run_embedding_backfill
+
+
+def snapshot(id, statement):
+    return {"id": id, "problem_statement": statement, "objectives": ["目标"], "constraints": {}, "audience": "用户"}
+
+
+def test_backfill_embeds_snapshots_without_vectors(db):
+    db.execute(RequirementSnapshot.__table__.insert(), [snapshot("a", "移动应用开发"), snapshot("b", "数据平台建设")])
+    db.commit()
+    assert asyncio.run(run_embedding_backfill()) == 2
+    assert db.query(RequirementEmbedding).filter_by(model=embedder.name).count() == 2
+
+
+def test_sync_drops_soft_deleted_snapshots(db):
+    db.add_all(RequirementSnapshot(**snapshot(id, f"移动应用开发 {id}")) for id in ("a", "b", "c"))
+    db.commit()
+    index = SimilarityIndex(embedder)
+    assert index.sync(db) == 3
+
+    # 其他 worker 软删除了快照 b：向量行不变，只有快照的 deleted_at 变化
+    db.query(RequirementSnapshot).filter_by(id="b").update({"deleted_at": datetime.now(timezone.utc)})
+    db.commit()
+    index.sync(db)
+    hits = index.search(embedder.embed("移动应用开发"), k=3)
+    assert sorted(id for id, _ in hits) == ["a", "c"]
+
+    # 新的索引首次同步时不加载已软删除的快照
+    fresh = SimilarityIndex(embedder)
+    assert fresh.sync(db) == 2
+    assert fresh.vector("b") is None
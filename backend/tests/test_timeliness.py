@@ -0,0 +1,60 @@
+"""
+时效性评分的增量重算
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from app.core.database import SessionLocal
+from app.models.evidence import Evidence
+from app.models.plan import Plan
+from app.services import timeliness
+from app.services.timeliness import rescore_due
+
+
+def setup_rows(db, now):
+    db.add(Plan(id="p1", requirement_snapshot_id="s1", overview={"title": "企划"}, scope={}, scores_stale=False))
+    db.add(Evidence(
+        id="e1", plan_id="p1", title="旧闻", url="http://example.com/1",
+        published_at=now - timedelta(days=720), timeliness_score=1.0, timeliness_due_at=now - timedelta(hours=1)
+    ))
+    db.add(Evidence(
+        id="e2", plan_id="p1", title="未到期", url="http://example.com/2",
+        timeliness_score=0.5, timeliness_due_at=now + timedelta(days=1)
+    ))
+    db.commit()
+
+
+def test_rescore_due_updates_only_due_rows(db):
+    now = datetime.now(timezone.utc)
+    setup_rows(db, now)
+    counts = rescore_due(db, now, batch_size=10)
+    assert counts == {"changed": 1, "unchanged": 0, "plans": 1}
+
+    db.expire_all()
+    rescored = db.get(Evidence, "e1")
+    assert rescored.timeliness_score < 1.0
+    assert rescored.timeliness_due_at is None or rescored.timeliness_due_at.replace(tzinfo=timezone.utc) > now
+    assert db.get(Evidence, "e2").timeliness_score == 0.5
+    assert db.get(Plan, "p1").scores_stale is True
+
+
+def test_rescore_is_isolated_from_other_sessions(db, monkeypatch):
+    """重算在工作线程中执行，其他会话（请求）在更新和提交之间回滚不影响这一轮"""
+    now = datetime.now(timezone.utc)
+    setup_rows(db, now)
+    other = SessionLocal()
+    mark_plans_stale = timeliness.mark_plans_stale
+
+    def mark_and_interleave(connection, plan_ids):
+        count = mark_plans_stale(connection, plan_ids)
+        other.query(Evidence).count()
+        other.rollback()
+        return count
+
+    monkeypatch.setattr(timeliness, "mark_plans_stale", mark_and_interleave)
+    try:
+        assert rescore_due(db, now, batch_size=10)["changed"] == 1
+        assert other.get(Evidence, "e1").timeliness_score < 1.0
+        assert other.get(Plan, "p1").scores_stale is True
+    finally:
+        other.close()